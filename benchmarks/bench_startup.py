@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# benchmarks/bench_startup.py
+# Cold-start timings for each entry point, measured in fresh interpreters.
+#
+# Usage: python benchmarks/bench_startup.py [--runs 5]
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> (working directory, python snippet run after the timer starts)
+TARGETS = {
+    'scanner_core': (ROOT, "import scanner_core.metrics, scanner_core.cache"),
+    'cup_handle_scanner_2 (import)': (ROOT, "import cup_handle_scanner_2"),
+    'python_backend app (import)': (os.path.join(ROOT, 'cup_scanner', 'python_backend'), "import app"),
+    'dcf_calc.py (usage path)': (os.path.join(ROOT, 'cup_scanner', 'backend'),
+                                 "import sys; sys.argv = ['dcf_calc.py']\n"
+                                 "import os; path = os.path.abspath('dcf_calc.py')\n"
+                                 "try:\n    exec(compile(open(path).read(), path, 'exec'), {'__name__': '__main__', '__file__': path})\n"
+                                 "except SystemExit:\n    pass"),
+    'heavy stack (reference)': (ROOT, "import pandas, scipy.signal, scipy.stats, matplotlib.pyplot, yfinance"),
+}
+
+TIMER = (
+    "import time, sys\n"
+    "_t0 = time.perf_counter()\n"
+    "{snippet}\n"
+    "sys.stderr.write('BENCH %.6f\\n' % (time.perf_counter() - _t0))\n"
+)
+
+
+def time_once(cwd, snippet):
+    proc = subprocess.run(
+        [sys.executable, '-c', TIMER.format(snippet=snippet)],
+        cwd=cwd, capture_output=True, text=True,
+        env={**os.environ, 'PYTHONPATH': ROOT, 'PYTHONDONTWRITEBYTECODE': '0'},
+    )
+    for line in proc.stderr.splitlines():
+        if line.startswith('BENCH '):
+            return float(line.split()[1])
+    last = proc.stderr.strip().splitlines()[-1:] or ['no output']
+    raise RuntimeError(last[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'target':<34} {'median':>9} {'min':>9}")
+    failed = []
+    for name, (cwd, snippet) in TARGETS.items():
+        try:
+            time_once(cwd, snippet)  # warm the bytecode cache
+            samples = [time_once(cwd, snippet) for _ in range(args.runs)]
+        except Exception as e:
+            print(f"{name:<34} {'FAILED':>9}  ({e})")
+            failed.append(name)
+            continue
+        print(f"{name:<34} {statistics.median(samples) * 1000:>7.1f}ms {min(samples) * 1000:>7.1f}ms")
+    if failed:
+        # A target that can't run is a broken benchmark, not a number to leave out
+        sys.exit(f"{len(failed)} target(s) failed: {', '.join(failed)}")
+
+
+if __name__ == '__main__':
+    main()
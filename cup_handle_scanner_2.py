@@ -2,150 +2,106 @@
 # cup_handle_scanner_2.py
 # Enhanced Cup & Handle Scanner with Advanced Pattern Detection
 # Requirements: pip install flask yfinance pandas pandas_ta requests beautifulsoup4 scipy matplotlib
-
-from flask import Flask, render_template_string, request, Response
-import yfinance as yf
+#
+# yfinance, pandas_ta, scipy and matplotlib are imported inside the functions that
+# use them, so processes that only serve cached pages/JSON start quickly.
+# wsgi.py preloads them once in the gunicorn master for full scanner workers.
+#
+# Pattern detection, indicators, breakout scoring, DCF and the scan pipeline itself live
+# in scanner_core and are shared with cup_scanner/python_backend/app.py,
+# cup_scanner/backend/dcf_calc.py and the headless CLI (python -m scanner_core scan).
+
+from flask import Flask, render_template, request, Response, stream_with_context
+from jinja2 import DictLoader
 import pandas as pd
-import pandas_ta as ta
 import requests
-from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
-from scipy.signal import argrelextrema
-from scipy.stats import linregress
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')  # Non-interactive backend
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 from io import BytesIO
 import base64
+import gzip
 import json
+import os
 import re
+import time
+
+from scanner_core import metrics
+from scanner_core.breakout import check_breakout_criteria
+from scanner_core.cache import DiskCache, ScanStore, disk_cached, file_lock
+from scanner_core.dcf import (calculate_dcf_value, dcf_monte_carlo, dcf_sensitivity, format_market_cap,
+                              get_fundamentals)
+from scanner_core.detectors import detect_ascending_triangle, detect_bull_flag, detect_cup_and_handle
+from scanner_core.events import EVENT_TYPES, EventLog
+from scanner_core.export import EXPORT_FORMATS, export_stream
+from scanner_core.indicators import sma_crossovers
+from scanner_core.metadata import get_metadata
+from scanner_core.metrics import stage_timer, timed
+from scanner_core.prescreen import prescreen_config_from_env
+from scanner_core.prices import PRICE_CACHE_TTL
+from scanner_core.providers import provider_call
+from scanner_core.scan import record_scan, scan_for_patterns
+from scanner_core.schedule import Scheduler, parse_schedule, quiet_max_age
+from scanner_core.serialize import SCAN_FIELDS, scan_columns
+from scanner_core.universe import (MARKET_NAMES, SP500_TICKERS, load_screener_snapshot, load_sp500_snapshot,
+                                   market_tickers)
 
 app = Flask(__name__)
 
+# Shared on-disk caches (scanner_core/cache.py): every gunicorn worker sees the same warm data
+SCAN_CACHE_TTL = int(os.environ.get('SCAN_CACHE_TTL', 15 * 60))
+# Relative strength pre-filter (0 = off): skip symbols rated below this before pattern detection
+SCAN_MIN_RS = int(os.environ.get('SCAN_MIN_RS', 0))
+# Vectorized pre-screen stages (SCAN_PRESCREEN=0 disables, JSON overrides thresholds)
+SCAN_PRESCREEN = prescreen_config_from_env()
+# Hold scan prices in one float32 panel instead of a DataFrame per symbol (large universes)
+SCAN_COMPACT_PANEL = os.environ.get('SCAN_COMPACT_PANEL', '0') == '1'
+# Detector worker processes per scan (>1 maps one shared panel file read-only in each)
+SCAN_WORKERS = int(os.environ.get('SCAN_WORKERS', 1))
+scan_store = ScanStore(ttl=SCAN_CACHE_TTL)
+chart_cache = DiskCache('charts', ttl=15 * 60)
+chart_history_cache = DiskCache('chart_history', ttl=PRICE_CACHE_TTL)
+# What changed between consecutive scans of a market (served by /api/events)
+scan_events = EventLog('scan_events')
+# Off-hours warm-up: "HH:MM=market,...;..." in US/Eastern, weekdays (e.g. "16:30=sp500,nasdaq;08:00=all")
+SCANNER_SCHEDULE = parse_schedule(os.environ.get('SCANNER_SCHEDULE', ''))
+# Charts pre-rendered per market by a scheduled warm-up (top hits by rank)
+SCHEDULE_WARM_CHARTS = int(os.environ.get('SCHEDULE_WARM_CHARTS', 10))
+
 # ════════════════════════════════════════════════════════════════
 # TICKER FETCHING FUNCTIONS
 # ════════════════════════════════════════════════════════════════
 
-# Hardcoded S&P 500 list (reliable fallback, updated Jan 2026)
-SP500_TICKERS = [
-    "AAPL", "ABBV", "ABT", "ACN", "ADBE", "ADI", "ADM", "ADP", "ADSK", "AEE", "AEP", "AES", "AFL", "AIG", "AIZ",
-    "AJG", "AKAM", "ALB", "ALGN", "ALL", "ALLE", "AMAT", "AMCR", "AMD", "AME", "AMGN", "AMP", "AMT", "AMZN",
-    "ANET", "ANSS", "AON", "AOS", "APA", "APD", "APH", "APTV", "ARE", "ATO", "AVB", "AVGO", "AVY", "AWK", "AXON",
-    "AXP", "AZO", "BA", "BAC", "BALL", "BAX", "BBWI", "BBY", "BDX", "BEN", "BF.B", "BG", "BIIB", "BIO", "BK",
-    "BKNG", "BKR", "BLDR", "BLK", "BMY", "BR", "BRK.B", "BRO", "BSX", "BWA", "BX", "BXP", "C", "CAG", "CAH",
-    "CARR", "CAT", "CB", "CBOE", "CBRE", "CCI", "CCL", "CDNS", "CDW", "CE", "CEG", "CF", "CFG", "CHD", "CHRW",
-    "CHTR", "CI", "CINF", "CL", "CLX", "CMA", "CMCSA", "CME", "CMG", "CMI", "CMS", "CNC", "CNP", "COF", "COO",
-    "COP", "COR", "COST", "CPAY", "CPB", "CPRT", "CPT", "CRL", "CRM", "CSCO", "CSGP", "CSX", "CTAS", "CTLT",
-    "CTRA", "CTSH", "CTVA", "CVS", "CVX", "CZR", "D", "DAL", "DD", "DE", "DECK", "DFS", "DG", "DGX", "DHI",
-    "DHR", "DIS", "DLR", "DLTR", "DOC", "DOV", "DOW", "DPZ", "DRI", "DTE", "DUK", "DVA", "DVN", "DXCM", "EA",
-    "EBAY", "ECL", "ED", "EFX", "EG", "EIX", "EL", "ELV", "EMN", "EMR", "ENPH", "EOG", "EPAM", "EQIX", "EQR",
-    "EQT", "ES", "ESS", "ETN", "ETR", "ETSY", "EVRG", "EW", "EXC", "EXPD", "EXPE", "EXR", "F", "FANG", "FAST",
-    "FCX", "FDS", "FDX", "FE", "FFIV", "FI", "FICO", "FIS", "FITB", "FLT", "FMC", "FOX", "FOXA", "FRT", "FSLR",
-    "FTNT", "FTV", "GD", "GDDY", "GE", "GEHC", "GEN", "GEV", "GILD", "GIS", "GL", "GLW", "GM", "GNRC", "GOOG",
-    "GOOGL", "GPC", "GPN", "GRMN", "GS", "GWW", "HAL", "HAS", "HBAN", "HCA", "HD", "HES", "HIG", "HII", "HLT",
-    "HOLX", "HON", "HPE", "HPQ", "HRL", "HSIC", "HST", "HSY", "HUBB", "HUM", "HWM", "IBM", "ICE", "IDXX", "IEX",
-    "IFF", "ILMN", "INCY", "INTC", "INTU", "INVH", "IP", "IPG", "IQV", "IR", "IRM", "ISRG", "IT", "ITW", "IVZ",
-    "J", "JBHT", "JBL", "JCI", "JKHY", "JNJ", "JNPR", "JPM", "K", "KDP", "KEY", "KEYS", "KHC", "KIM", "KKR",
-    "KLAC", "KMB", "KMI", "KMX", "KO", "KR", "KVUE", "L", "LDOS", "LEN", "LH", "LHX", "LIN", "LKQ", "LLY",
-    "LMT", "LNT", "LOW", "LRCX", "LULU", "LUV", "LVS", "LW", "LYB", "LYV", "MA", "MAA", "MAR", "MAS", "MCD",
-    "MCHP", "MCK", "MCO", "MDLZ", "MDT", "MET", "META", "MGM", "MHK", "MKC", "MKTX", "MLM", "MMC", "MMM", "MNST",
-    "MO", "MOH", "MOS", "MPC", "MPWR", "MRK", "MRNA", "MRO", "MS", "MSCI", "MSFT", "MSI", "MTB", "MTCH", "MTD",
-    "MU", "NCLH", "NDAQ", "NDSN", "NEE", "NEM", "NFLX", "NI", "NKE", "NOC", "NOW", "NRG", "NSC", "NTAP", "NTRS",
-    "NUE", "NVDA", "NVR", "NWS", "NWSA", "NXPI", "O", "ODFL", "OKE", "OMC", "ON", "ORCL", "ORLY", "OTIS", "OXY",
-    "PANW", "PARA", "PAYC", "PAYX", "PCAR", "PCG", "PEG", "PEP", "PFE", "PFG", "PG", "PGR", "PH", "PHM", "PKG",
-    "PLD", "PLTR", "PM", "PNC", "PNR", "PNW", "PODD", "POOL", "PPG", "PPL", "PRU", "PSA", "PSX", "PTC", "PWR",
-    "PYPL", "QCOM", "QRVO", "RCL", "REG", "REGN", "RF", "RJF", "RL", "RMD", "ROK", "ROL", "ROP", "ROST", "RSG",
-    "RTX", "RVTY", "SBAC", "SBUX", "SCHW", "SHW", "SJM", "SLB", "SMCI", "SNA", "SNPS", "SO", "SOLV", "SPG",
-    "SPGI", "SRE", "STE", "STLD", "STT", "STX", "STZ", "SWK", "SWKS", "SYF", "SYK", "SYY", "T", "TAP", "TDG",
-    "TDY", "TECH", "TEL", "TER", "TFC", "TFX", "TGT", "TJX", "TMO", "TMUS", "TPR", "TRGP", "TRMB", "TROW",
-    "TRV", "TSCO", "TSLA", "TSN", "TT", "TTWO", "TXN", "TXT", "TYL", "UAL", "UBER", "UDR", "UHS", "ULTA", "UNH",
-    "UNP", "UPS", "URI", "USB", "V", "VICI", "VLO", "VLTO", "VMC", "VRSK", "VRSN", "VRTX", "VST", "VTR", "VTRS",
-    "VZ", "WAB", "WAT", "WBA", "WBD", "WDC", "WEC", "WELL", "WFC", "WM", "WMB", "WMT", "WRB", "WST", "WTW", "WY",
-    "WYNN", "XEL", "XOM", "XYL", "YUM", "ZBH", "ZBRA", "ZTS"
-]
+# Every market is built from screener / S&P 500 snapshots cached on disk for a day
+# (scanner_core/universe.py), so a scan no longer waits on the NASDAQ and GitHub APIs.
+# SP500_TICKERS (hardcoded, in universe.py) stands in until a snapshot has been saved.
 
+@timed('ticker_list')
 def get_sp500_tickers():
-    """Get S&P 500 tickers - try GitHub CSV first, fallback to hardcoded list."""
-    # Try datahub.io maintained list
-    try:
-        url = "https://raw.githubusercontent.com/datasets/s-and-p-500-companies/main/data/constituents.csv"
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            import io
-            df = pd.read_csv(io.StringIO(response.text))
-            tickers = df['Symbol'].tolist()
-            print(f"Fetched {len(tickers)} S&P 500 tickers from GitHub")
-            return tickers
-    except Exception as e:
-        print(f"GitHub S&P 500 fetch failed: {e}")
-    
-    # Fallback to hardcoded list
-    print(f"Using hardcoded S&P 500 list ({len(SP500_TICKERS)} tickers)")
-    return SP500_TICKERS.copy()
+    """S&P 500 tickers from the cached constituents list, or the hardcoded list."""
+    tickers = market_tickers('sp500', fallback=SP500_TICKERS)
+    print(f"S&P 500 universe: {len(tickers)} tickers")
+    return tickers
 
 
+@timed('ticker_list')
 def get_nasdaq_tickers(min_market_cap=1_000_000_000):
-    try:
-        url = "https://api.nasdaq.com/api/screener/stocks?tableonly=true&limit=5000&exchange=NASDAQ"
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        response = requests.get(url, headers=headers, timeout=30)
-        data = response.json()
-
-        tickers = []
-        if 'data' in data and 'table' in data['data'] and 'rows' in data['data']['table']:
-            for row in data['data']['table']['rows']:
-                symbol = row.get('symbol', '')
-                market_cap_str = row.get('marketCap', '0')
-                try:
-                    market_cap = int(market_cap_str.replace(',', '')) if market_cap_str else 0
-                except:
-                    market_cap = 0
-                if (symbol and '^' not in symbol and '/' not in symbol
-                    and len(symbol) <= 5 and market_cap >= min_market_cap):
-                    tickers.append(symbol)
-
-        print(f"Fetched {len(tickers)} NASDAQ tickers with market cap >= ${min_market_cap/1e9:.0f}B")
-        return tickers if tickers else get_sp500_tickers()
-    except Exception as e:
-        print(f"Error fetching NASDAQ list: {e}")
-        return get_sp500_tickers()
+    tickers = market_tickers('nasdaq', min_market_cap, fallback=SP500_TICKERS)
+    print(f"NASDAQ universe: {len(tickers)} tickers with market cap >= ${min_market_cap/1e9:.0f}B")
+    return tickers
 
 
+@timed('ticker_list')
 def get_nyse_tickers(min_market_cap=1_000_000_000):
-    try:
-        url = "https://api.nasdaq.com/api/screener/stocks?tableonly=true&limit=5000&exchange=NYSE"
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        response = requests.get(url, headers=headers, timeout=30)
-        data = response.json()
-
-        tickers = []
-        if 'data' in data and 'table' in data['data'] and 'rows' in data['data']['table']:
-            for row in data['data']['table']['rows']:
-                symbol = row.get('symbol', '')
-                market_cap_str = row.get('marketCap', '0')
-                try:
-                    market_cap = int(market_cap_str.replace(',', '')) if market_cap_str else 0
-                except:
-                    market_cap = 0
-                if (symbol and '^' not in symbol and '/' not in symbol
-                    and len(symbol) <= 5 and market_cap >= min_market_cap):
-                    tickers.append(symbol)
-
-        print(f"Fetched {len(tickers)} NYSE tickers with market cap >= ${min_market_cap/1e9:.0f}B")
-        return tickers
-    except Exception as e:
-        print(f"Error fetching NYSE list: {e}")
-        return []
+    tickers = market_tickers('nyse', min_market_cap, fallback=SP500_TICKERS)
+    print(f"NYSE universe: {len(tickers)} tickers with market cap >= ${min_market_cap/1e9:.0f}B")
+    return tickers
 
 
+@timed('ticker_list')
 def get_all_us_tickers(min_market_cap=1_000_000_000):
-    nasdaq = get_nasdaq_tickers(min_market_cap)
-    nyse = get_nyse_tickers(min_market_cap)
-    all_tickers = list(set(nasdaq + nyse))
-    print(f"Total US tickers (${min_market_cap/1e9:.0f}B+ market cap): {len(all_tickers)}")
-    return all_tickers
+    tickers = market_tickers('all', min_market_cap, fallback=SP500_TICKERS)
+    print(f"Total US tickers (${min_market_cap/1e9:.0f}B+ market cap): {len(tickers)}")
+    return tickers
 
 
 # ════════════════════════════════════════════════════════════════
@@ -153,10 +109,37 @@ def get_all_us_tickers(min_market_cap=1_000_000_000):
 # ════════════════════════════════════════════════════════════════
 
 def get_company_info(symbol):
-    """Get detailed company information."""
+    """
+    Company information for the chart page: ticker.info (disk-cached for a day)
+    with its gaps filled from the screener metadata table (scanner_core/metadata.py).
+
+    The page renders fields the screener doesn't have (description, P/E, beta,
+    52-week range), so ticker.info is still fetched here; scans and the scan
+    table read name/sector/industry from the metadata table instead.
+    """
+    known = get_metadata().get(symbol) or {}
+    if 'market_cap' in known:
+        known['market_cap_fmt'] = format_market_cap(known['market_cap'])
+    if 'last_price' in known:
+        known['current_price'] = known.pop('last_price')
+
+    info = get_yahoo_company_info(symbol)
+    for field, value in known.items():
+        if info.get(field) in (None, '', 0, 'N/A') or (field == 'name' and info.get('name') == symbol):
+            info[field] = value
+    return info
+
+
+@disk_cached('company_info', ttl=24 * 3600, key=lambda symbol: symbol,
+             when=lambda info: 'fifty_two_week_high' in info, stale_on_error=True)
+@timed('company_info')
+def get_yahoo_company_info(symbol):
+    """Get detailed company information from ticker.info."""
+    import yfinance as yf
     try:
         ticker = yf.Ticker(symbol)
-        info = ticker.info
+        with provider_call('yahoo'):
+            info = ticker.info
         
         return {
             'name': info.get('longName', info.get('shortName', symbol)),
@@ -195,20 +178,6 @@ def get_company_info(symbol):
         }
 
 
-def format_market_cap(value):
-    """Format market cap in human readable form."""
-    if not value or value == 0:
-        return 'N/A'
-    if value >= 1e12:
-        return f"${value/1e12:.2f}T"
-    elif value >= 1e9:
-        return f"${value/1e9:.2f}B"
-    elif value >= 1e6:
-        return f"${value/1e6:.2f}M"
-    else:
-        return f"${value:,.0f}"
-
-
 # ════════════════════════════════════════════════════════════════
 # OPTIONS STRATEGY: BULL CALL SPREAD
 # ════════════════════════════════════════════════════════════════
@@ -241,6 +210,7 @@ def calculate_approx_delta(strike, current_price, days_to_exp, is_call=True):
     return round(delta, 2)
 
 
+@timed('options')
 def suggest_bull_call_spread(symbol, current_price, analysis=None, budget=375):
     """
     Suggest a bull call spread for bullish patterns.
@@ -251,12 +221,14 @@ def suggest_bull_call_spread(symbol, current_price, analysis=None, budget=375):
     
     Returns dict with trade details or error info.
     """
+    import yfinance as yf
     try:
         ticker = yf.Ticker(symbol)
         
         # Get available expirations
         try:
-            expirations = ticker.options
+            with provider_call('yahoo'):
+                expirations = ticker.options
         except Exception as e:
             return {'status': 'error', 'message': f'No options available for {symbol}: {e}'}
         
@@ -301,7 +273,8 @@ def suggest_bull_call_spread(symbol, current_price, analysis=None, budget=375):
         
         # Get call chain
         try:
-            chain = ticker.option_chain(exp_date_str).calls
+            with provider_call('yahoo'):
+                chain = ticker.option_chain(exp_date_str).calls
         except Exception as e:
             return {'status': 'error', 'message': f'Error fetching options chain: {e}'}
         
@@ -523,8 +496,15 @@ def suggest_bull_call_spread(symbol, current_price, analysis=None, budget=375):
 # SOCIAL MEDIA SENTIMENT
 # ════════════════════════════════════════════════════════════════
 
+@disk_cached('sentiment', ttl=30 * 60, key=lambda symbol: symbol, when=lambda sentiment: not sentiment['errors'])
+@timed('sentiment')
 def get_social_sentiment(symbol):
-    """Get social media mentions and sentiment from various sources."""
+    """
+    Get social media mentions and sentiment from various sources.
+    Sources that failed (timeout, HTTP error, open breaker) are listed in
+    'errors', and such a result is not cached.
+    """
+    import yfinance as yf
     sentiment = {
         'reddit_mentions': 0,
         'reddit_sentiment': 'N/A',
@@ -532,6 +512,7 @@ def get_social_sentiment(symbol):
         'twitter_sentiment': 'N/A',
         'stocktwits_sentiment': 'N/A',
         'news_sentiment': 'N/A',
+        'errors': [],
     }
     
     # Try to get Reddit mentions from pushshift or similar
@@ -539,8 +520,12 @@ def get_social_sentiment(symbol):
         # Search Reddit via web
         reddit_url = f"https://www.reddit.com/search.json?q={symbol}%20stock&sort=new&limit=25&t=week"
         headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        response = requests.get(reddit_url, headers=headers, timeout=10)
-        if response.status_code == 200:
+        with provider_call('reddit') as call:
+            response = requests.get(reddit_url, headers=headers, timeout=10)
+            call.check_status(response.status_code)
+        if response.status_code != 200:
+            sentiment['errors'].append('reddit')
+        else:
             data = response.json()
             posts = data.get('data', {}).get('children', [])
             sentiment['reddit_mentions'] = len(posts)
@@ -558,13 +543,18 @@ def get_social_sentiment(symbol):
                 else:
                     sentiment['reddit_sentiment'] = 'Bearish 📉'
     except Exception as e:
+        sentiment['errors'].append('reddit')
         print(f"Reddit fetch error: {e}")
     
     # Try StockTwits
     try:
         st_url = f"https://api.stocktwits.com/api/2/streams/symbol/{symbol}.json"
-        response = requests.get(st_url, timeout=10)
-        if response.status_code == 200:
+        with provider_call('stocktwits') as call:
+            response = requests.get(st_url, timeout=10)
+            call.check_status(response.status_code)
+        if response.status_code != 200:
+            sentiment['errors'].append('stocktwits')
+        else:
             data = response.json()
             messages = data.get('messages', [])
             if messages:
@@ -582,12 +572,14 @@ def get_social_sentiment(symbol):
                     else:
                         sentiment['stocktwits_sentiment'] = f'Bearish ({bull_pct:.0f}% 🔴)'
     except Exception as e:
+        sentiment['errors'].append('stocktwits')
         print(f"StockTwits fetch error: {e}")
     
     # Get news sentiment from Yahoo Finance
     try:
         ticker = yf.Ticker(symbol)
-        news = ticker.news
+        with provider_call('yahoo'):
+            news = ticker.news
         if news:
             sentiment['news_count'] = len(news)
             # Check for positive/negative keywords in titles
@@ -608,637 +600,27 @@ def get_social_sentiment(symbol):
             else:
                 sentiment['news_sentiment'] = 'Neutral 📰'
     except Exception as e:
+        sentiment['errors'].append('news')
         print(f"News fetch error: {e}")
     
     return sentiment
 
 
-# ════════════════════════════════════════════════════════════════
-# DCF VALUATION
-# ════════════════════════════════════════════════════════════════
-
-def calculate_dcf_value(symbol):
-    """
-    Calculate intrinsic value using DCF model.
-    Returns dict with dcf details or None if can't calculate.
-    """
-    try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
-        
-        # Get free cash flow
-        cashflow = ticker.cashflow
-        if cashflow is None or cashflow.empty:
-            return {'status': 'no_data', 'dcf_value': None, 'margin': None}
-        
-        # Find Free Cash Flow
-        fcf = None
-        fcf_history = []
-        
-        for row_name in ['Free Cash Flow', 'FreeCashFlow']:
-            if row_name in cashflow.index:
-                fcf_row = cashflow.loc[row_name]
-                fcf = fcf_row.iloc[0] if len(fcf_row) > 0 else None
-                fcf_history = fcf_row.tolist()[:4]  # Last 4 years
-                break
-        
-        if fcf is None:
-            # Try to calculate: Operating Cash Flow - CapEx
-            ocf = None
-            capex = None
-            for row_name in ['Operating Cash Flow', 'Total Cash From Operating Activities']:
-                if row_name in cashflow.index:
-                    ocf = cashflow.loc[row_name].iloc[0]
-                    break
-            for row_name in ['Capital Expenditure', 'Capital Expenditures']:
-                if row_name in cashflow.index:
-                    capex = abs(cashflow.loc[row_name].iloc[0])
-                    break
-            if ocf is not None and capex is not None:
-                fcf = ocf - capex
-            else:
-                return {'status': 'no_fcf', 'dcf_value': None, 'margin': None}
-        
-        if fcf is None or fcf <= 0:
-            return {'status': 'negative_fcf', 'dcf_value': '-FCF', 'margin': None, 'fcf': fcf}
-        
-        # Get shares outstanding
-        shares = info.get('sharesOutstanding', None)
-        if not shares:
-            return {'status': 'no_shares', 'dcf_value': None, 'margin': None}
-        
-        # DCF parameters
-        growth_rate = 0.10  # 10% growth for 5 years
-        terminal_growth = 0.03  # 3% terminal growth
-        discount_rate = 0.10  # 10% discount rate
-        years = 5
-        
-        # Project future cash flows
-        projected_fcf = []
-        current_fcf = fcf
-        for year in range(1, years + 1):
-            current_fcf = current_fcf * (1 + growth_rate)
-            discounted = current_fcf / ((1 + discount_rate) ** year)
-            projected_fcf.append(discounted)
-        
-        # Terminal value
-        terminal_fcf = current_fcf * (1 + terminal_growth)
-        terminal_value = terminal_fcf / (discount_rate - terminal_growth)
-        discounted_terminal = terminal_value / ((1 + discount_rate) ** years)
-        
-        # Total intrinsic value
-        total_value = sum(projected_fcf) + discounted_terminal
-        intrinsic_per_share = total_value / shares
-        
-        # Get current price
-        current_price = info.get('currentPrice', info.get('regularMarketPrice', None))
-        if not current_price:
-            return {
-                'status': 'success',
-                'dcf_value': round(intrinsic_per_share, 2),
-                'margin': None,
-                'fcf': fcf,
-                'shares': shares,
-                'growth_rate': growth_rate,
-                'discount_rate': discount_rate,
-            }
-        
-        # Margin of safety
-        margin_of_safety = ((intrinsic_per_share - current_price) / current_price) * 100
-        
-        return {
-            'status': 'success',
-            'dcf_value': round(intrinsic_per_share, 2),
-            'margin': round(margin_of_safety, 1),
-            'fcf': fcf,
-            'fcf_fmt': format_market_cap(fcf),
-            'shares': shares,
-            'current_price': current_price,
-            'growth_rate': growth_rate * 100,
-            'discount_rate': discount_rate * 100,
-            'terminal_growth': terminal_growth * 100,
-            'fcf_history': fcf_history,
-        }
-        
-    except Exception as e:
-        print(f"DCF calculation error for {symbol}: {e}")
-        return {'status': 'error', 'dcf_value': None, 'margin': None, 'error': str(e)}
-
-
-# ════════════════════════════════════════════════════════════════
-# PATTERN DETECTION: CUP & HANDLE
-# ════════════════════════════════════════════════════════════════
-
-def detect_cup_and_handle(df, min_cup_days=20, max_cup_days=130):
-    """
-    Detect cup and handle pattern with U-shape and symmetry scoring.
-    """
-    if len(df) < max_cup_days + 30:
-        return None
-
-    closes = df['Close'].values
-    highs = df['High'].values
-    lows = df['Low'].values
-    volumes = df['Volume'].values
-
-    order = 10
-    local_max_idx = argrelextrema(closes, np.greater_equal, order=order)[0]
-    local_min_idx = argrelextrema(closes, np.less_equal, order=order)[0]
-
-    if len(local_max_idx) < 2 or len(local_min_idx) < 1:
-        return None
-
-    lookback = min(len(closes), max_cup_days + 50)
-    recent_max = [i for i in local_max_idx if i >= len(closes) - lookback]
-    recent_min = [i for i in local_min_idx if i >= len(closes) - lookback]
-
-    if len(recent_max) < 2 or len(recent_min) < 1:
-        return None
-
-    best_pattern = None
-    best_score = 0
-
-    for i, left_rim_idx in enumerate(recent_max[:-1]):
-        for right_rim_idx in recent_max[i+1:]:
-            cup_length = right_rim_idx - left_rim_idx
-
-            if cup_length < min_cup_days or cup_length > max_cup_days:
-                continue
-
-            bottom_candidates = [m for m in recent_min if left_rim_idx < m < right_rim_idx]
-            if not bottom_candidates:
-                continue
-
-            bottom_idx = min(bottom_candidates, key=lambda x: closes[x])
-
-            left_rim_price = closes[left_rim_idx]
-            right_rim_price = closes[right_rim_idx]
-            bottom_price = closes[bottom_idx]
-
-            avg_rim = (left_rim_price + right_rim_price) / 2
-            cup_depth_pct = (avg_rim - bottom_price) / avg_rim * 100
-
-            if cup_depth_pct < 12 or cup_depth_pct > 35:
-                continue
-
-            rim_diff = abs(left_rim_price - right_rim_price) / avg_rim * 100
-            if rim_diff > 5:
-                continue
-
-            # Calculate U-shape score
-            cup_prices = closes[left_rim_idx:right_rim_idx+1]
-            cup_mid = len(cup_prices) // 2
-            left_half = cup_prices[:cup_mid]
-            right_half = cup_prices[cup_mid:]
-            
-            if len(left_half) > 2 and len(right_half) > 2:
-                left_slope = float(abs(np.polyfit(range(len(left_half)), left_half.flatten(), 1)[0]))
-                right_slope = float(abs(np.polyfit(range(len(right_half)), right_half.flatten(), 1)[0]))
-                u_shape_score = 1 / (1 + (left_slope + right_slope) * 10)
-            else:
-                u_shape_score = 0.5
-            
-            # Symmetry
-            left_days = bottom_idx - left_rim_idx
-            right_days = right_rim_idx - bottom_idx
-            symmetry = 1 - abs(left_days - right_days) / cup_length
-            symmetry_pct = symmetry * 100
-
-            # Handle check
-            handle_start = right_rim_idx
-            handle_data = closes[handle_start:]
-            handle_volumes = volumes[handle_start:] if handle_start < len(volumes) else []
-
-            if len(handle_data) < 5:
-                continue
-
-            handle_low = min(handle_data)
-            handle_high = max(handle_data)
-            handle_decline = (right_rim_price - handle_low) / right_rim_price * 100
-
-            if handle_decline < 2 or handle_decline > 15:
-                continue
-
-            # Handle volume contraction check
-            cup_avg_vol = np.mean(volumes[left_rim_idx:right_rim_idx])
-            handle_avg_vol = np.mean(handle_volumes) if len(handle_volumes) > 0 else cup_avg_vol
-            handle_vol_contraction = handle_avg_vol < cup_avg_vol * 0.8
-
-            score = 100 - abs(cup_depth_pct - 25) - rim_diff - abs(handle_decline - 8)
-            score += u_shape_score * 10 + symmetry * 10
-
-            if score > best_score:
-                best_score = score
-                best_pattern = {
-                    'left_rim_idx': int(left_rim_idx),
-                    'right_rim_idx': int(right_rim_idx),
-                    'bottom_idx': int(bottom_idx),
-                    'left_rim_price': float(np.asarray(left_rim_price).flatten()[0]) if hasattr(left_rim_price, '__iter__') else float(left_rim_price),
-                    'right_rim_price': float(np.asarray(right_rim_price).flatten()[0]) if hasattr(right_rim_price, '__iter__') else float(right_rim_price),
-                    'bottom_price': float(np.asarray(bottom_price).flatten()[0]) if hasattr(bottom_price, '__iter__') else float(bottom_price),
-                    'cup_depth_pct': float(np.asarray(cup_depth_pct).flatten()[0]) if hasattr(cup_depth_pct, '__iter__') else float(cup_depth_pct),
-                    'cup_length_days': int(cup_length),
-                    'handle_low': float(np.asarray(handle_low).flatten()[0]) if hasattr(handle_low, '__iter__') else float(handle_low),
-                    'handle_high': float(np.asarray(handle_high).flatten()[0]) if hasattr(handle_high, '__iter__') else float(handle_high),
-                    'handle_decline_pct': float(np.asarray(handle_decline).flatten()[0]) if hasattr(handle_decline, '__iter__') else float(handle_decline),
-                    'handle_days': len(handle_data),
-                    'u_shape_score': round(float(u_shape_score), 3),
-                    'symmetry_pct': round(float(symmetry_pct), 1),
-                    'handle_vol_contraction': bool(handle_vol_contraction),
-                    'score': float(np.asarray(score).flatten()[0]) if hasattr(score, '__iter__') else float(score)
-                }
-
-    return best_pattern
-
-
-# ════════════════════════════════════════════════════════════════
-# PATTERN DETECTION: ASCENDING TRIANGLE
-# ════════════════════════════════════════════════════════════════
-
-def detect_ascending_triangle(df, lookback=60):
-    """
-    Detect ascending triangle: flat resistance + rising support.
-    Returns dict with resistance, support slope, target if found.
-    """
-    if len(df) < lookback:
-        return None
-    
-    recent = df.tail(lookback)
-    highs = recent['High'].values
-    lows = recent['Low'].values
-    closes = recent['Close'].values
-    indices = np.arange(len(recent))
-    
-    # Find resistance (multiple touches at similar high)
-    order = 5
-    local_highs_idx = argrelextrema(highs, np.greater_equal, order=order)[0]
-    
-    if len(local_highs_idx) < 3:
-        return None
-    
-    high_prices = highs[local_highs_idx]
-    resistance = np.mean(high_prices[-5:])
-    
-    # Check if highs are flat (within 3% of each other)
-    high_range = (max(high_prices[-5:]) - min(high_prices[-5:])) / resistance * 100
-    if high_range > 3:
-        return None
-    
-    # Check for rising lows (ascending support)
-    local_lows_idx = argrelextrema(lows, np.less_equal, order=order)[0]
-    if len(local_lows_idx) < 3:
-        return None
-    
-    low_prices = lows[local_lows_idx]
-    
-    # Linear regression on lows
-    if len(local_lows_idx) >= 3:
-        slope, intercept, r_value, _, _ = linregress(local_lows_idx, low_prices)
-        
-        # Slope should be positive (rising lows) with decent fit
-        if slope > 0 and r_value > 0.5:
-            # Calculate target (height of triangle added to breakout)
-            triangle_height = resistance - low_prices[0]
-            target = resistance + triangle_height
-            
-            return {
-                'resistance': round(resistance, 2),
-                'support_slope': round(slope, 4),
-                'target': round(target, 2),
-                'r_squared': round(r_value ** 2, 3),
-                'touches': len(local_highs_idx),
-                'local_highs_idx': local_highs_idx.tolist(),
-                'local_lows_idx': local_lows_idx.tolist(),
-            }
-    
-    return None
-
-
-# ════════════════════════════════════════════════════════════════
-# PATTERN DETECTION: BULL FLAG / PENNANT
-# ════════════════════════════════════════════════════════════════
-
-def detect_bull_flag(df, lookback=40):
-    """
-    Detect bull flag: strong pole (surge) + consolidation.
-    Returns dict with pole gain, flag details if found.
-    """
-    if len(df) < lookback:
-        return None
-    
-    recent = df.tail(lookback)
-    closes = recent['Close'].values
-    highs = recent['High'].values
-    lows = recent['Low'].values
-    
-    # Find the pole: sharp rise in first portion
-    pole_period = lookback // 2
-    pole_data = closes[:pole_period]
-    
-    if len(pole_data) < 5:
-        return None
-    
-    pole_low_idx = np.argmin(pole_data[:len(pole_data)//2])
-    pole_low = pole_data[pole_low_idx]
-    pole_high_idx = np.argmax(pole_data)
-    pole_high = pole_data[pole_high_idx]
-    
-    # Pole should go up (low before high)
-    if pole_low_idx >= pole_high_idx:
-        return None
-    
-    pole_gain = (pole_high - pole_low) / pole_low * 100
-    
-    # Pole should be significant (at least 10% gain)
-    if pole_gain < 10:
-        return None
-    
-    # Flag portion: consolidation
-    flag_data = closes[pole_period:]
-    flag_highs = highs[pole_period:]
-    flag_lows = lows[pole_period:]
-    
-    if len(flag_data) < 5:
-        return None
-    
-    flag_high = max(flag_highs)
-    flag_low = min(flag_lows)
-    flag_range = (flag_high - flag_low) / pole_high * 100
-    
-    # Flag should be tight (less than 15% range)
-    if flag_range > 15:
-        return None
-    
-    # Flag should not give back more than 50% of pole gains
-    flag_pullback = (pole_high - flag_low) / (pole_high - pole_low) * 100
-    if flag_pullback > 50:
-        return None
-    
-    # Calculate flag slope (should be slightly down or flat)
-    flag_indices = np.arange(len(flag_data))
-    slope, _, _, _, _ = linregress(flag_indices, flag_data)
-    
-    # Target: pole height added to breakout
-    target = flag_high + (pole_high - pole_low)
-    
-    return {
-        'pole_gain': round(pole_gain, 1),
-        'pole_low': round(pole_low, 2),
-        'pole_high': round(pole_high, 2),
-        'pole_days': pole_high_idx - pole_low_idx,
-        'flag_high': round(flag_high, 2),
-        'flag_low': round(flag_low, 2),
-        'flag_range_pct': round(flag_range, 1),
-        'flag_days': len(flag_data),
-        'flag_slope': round(slope, 4),
-        'target': round(target, 2),
-        'pole_start_idx': pole_low_idx,
-        'pole_end_idx': pole_high_idx,
-    }
-
-
-# ════════════════════════════════════════════════════════════════
-# GOLDEN CROSS DETECTION
-# ════════════════════════════════════════════════════════════════
-
-def detect_golden_cross(df, lookback_days=20):
-    """
-    Detect golden cross (50 SMA crosses above 200 SMA) within lookback period.
-    Also detects death cross (50 crosses below 200).
-    Returns dict with cross info or None.
-    """
-    if len(df) < 200:
-        return None
-    
-    df_calc = df.copy()
-    df_calc['SMA50'] = df_calc['Close'].rolling(50).mean()
-    df_calc['SMA200'] = df_calc['Close'].rolling(200).mean()
-    
-    # Get recent data where both SMAs exist
-    df_valid = df_calc.dropna(subset=['SMA50', 'SMA200']).tail(lookback_days + 1)
-    
-    if len(df_valid) < 2:
-        return None
-    
-    # Check for crossovers in the lookback period
-    golden_cross_date = None
-    death_cross_date = None
-    
-    for i in range(1, len(df_valid)):
-        prev_row = df_valid.iloc[i-1]
-        curr_row = df_valid.iloc[i]
-        
-        # Golden cross: 50 crosses above 200
-        if prev_row['SMA50'] <= prev_row['SMA200'] and curr_row['SMA50'] > curr_row['SMA200']:
-            golden_cross_date = df_valid.index[i]
-        
-        # Death cross: 50 crosses below 200
-        if prev_row['SMA50'] >= prev_row['SMA200'] and curr_row['SMA50'] < curr_row['SMA200']:
-            death_cross_date = df_valid.index[i]
-    
-    # Current state
-    last = df_valid.iloc[-1]
-    sma50_above_200 = last['SMA50'] > last['SMA200']
-    
-    # Days since cross
-    days_since_golden = None
-    days_since_death = None
-    
-    if golden_cross_date is not None:
-        days_since_golden = (df_valid.index[-1] - golden_cross_date).days
-    if death_cross_date is not None:
-        days_since_death = (df_valid.index[-1] - death_cross_date).days
-    
-    return {
-        'golden_cross': golden_cross_date is not None,
-        'golden_cross_date': golden_cross_date,
-        'days_since_golden': days_since_golden,
-        'death_cross': death_cross_date is not None,
-        'death_cross_date': death_cross_date,
-        'days_since_death': days_since_death,
-        'sma50_above_200': sma50_above_200,
-    }
-
-
-# ════════════════════════════════════════════════════════════════
-# BREAKOUT ANALYSIS
-# ════════════════════════════════════════════════════════════════
-
-def check_breakout_criteria(df, pattern, asc_triangle=None, bull_flag=None):
-    """
-    Validate breakout with comprehensive criteria.
-    """
-    if pattern is None:
-        return None
-
-    last = df.iloc[-1]
-    prev = df.iloc[-2] if len(df) > 1 else last
-
-    resistance = pattern['right_rim_price']
-    buy_point = resistance * 1.001
-    current_price = last['Close']
-
-    # Calculate indicators
-    df_calc = df.copy()
-    df_calc['SMA50'] = df_calc['Close'].rolling(50).mean()
-    df_calc['SMA200'] = df_calc['Close'].rolling(200).mean()
-    df_calc['RSI'] = ta.rsi(df_calc['Close'], length=14)
-    
-    # ADX
-    adx_data = ta.adx(df_calc['High'], df_calc['Low'], df_calc['Close'], length=14)
-    if adx_data is not None and 'ADX_14' in adx_data.columns:
-        df_calc['ADX'] = adx_data['ADX_14']
-    else:
-        df_calc['ADX'] = None
-
-    # MACD
-    macd = ta.macd(df_calc['Close'], fast=12, slow=26, signal=9)
-    if macd is not None:
-        df_calc['MACD'] = macd['MACD_12_26_9']
-        df_calc['MACD_signal'] = macd['MACDs_12_26_9']
-    else:
-        df_calc['MACD'] = None
-        df_calc['MACD_signal'] = None
-
-    last = df_calc.iloc[-1]
-    prev = df_calc.iloc[-2] if len(df_calc) > 1 else last
-
-    # Get values
-    sma50 = last['SMA50'] if not pd.isna(last.get('SMA50')) else None
-    sma200 = last['SMA200'] if not pd.isna(last.get('SMA200')) else None
-    rsi = last['RSI'] if not pd.isna(last.get('RSI')) else None
-    adx = last['ADX'] if not pd.isna(last.get('ADX')) else None
-    macd_val = last['MACD'] if not pd.isna(last.get('MACD')) else None
-    macd_sig = last['MACD_signal'] if not pd.isna(last.get('MACD_signal')) else None
-
-    # Volume analysis
-    handle_start = pattern['right_rim_idx']
-    avg_20_vol = df['Volume'].rolling(20).mean().iloc[-1]
-    current_vol = last['Volume']
-    vol_ratio = current_vol / avg_20_vol if avg_20_vol > 0 else 1
-    
-    # Volume requirement: 2x average for breakout
-    volume_requirement = 2.0
-    volume_spike = vol_ratio >= volume_requirement
-
-    # Handle volume contraction
-    handle_vol_contraction = pattern.get('handle_vol_contraction', False)
-
-    # Calculate stop loss and target
-    handle_low = pattern['handle_low']
-    stop_loss = handle_low * 0.97
-    
-    cup_height = pattern['right_rim_price'] - pattern['bottom_price']
-    target = buy_point + cup_height
-    
-    risk = buy_point - stop_loss
-    reward = target - buy_point
-    rr_ratio = reward / risk if risk > 0 else 0
-
-    # Criteria checks with detailed info
-    criteria = {
-        'breakout_confirmed': {
-            'passed': current_price > buy_point,
-            'value': f"${current_price:.2f}",
-            'requirement': f">${buy_point:.2f}",
-        },
-        'above_sma50': {
-            'passed': current_price > sma50 if sma50 else False,
-            'value': f"${sma50:.2f}" if sma50 else 'N/A',
-        },
-        'above_sma200': {
-            'passed': current_price > sma200 if sma200 else False,
-            'value': f"${sma200:.2f}" if sma200 else 'N/A',
-        },
-        'volume_spike': {
-            'passed': volume_spike,
-            'value': f"{vol_ratio:.2f}x",
-            'requirement': f"(req: {volume_requirement}x)",
-        },
-        'handle_vol_contraction': {
-            'passed': handle_vol_contraction,
-            'value': 'Yes' if handle_vol_contraction else 'No',
-        },
-        'macd_bullish': {
-            'passed': (macd_val > macd_sig) if (macd_val and macd_sig) else False,
-            'value': f"{macd_val:.3f}" if macd_val else 'N/A',
-        },
-        'adx_strong': {
-            'passed': adx > 25 if adx else False,
-            'value': f"{adx:.1f}" if adx else 'N/A',
-            'requirement': '(>25)',
-        },
-        'rsi_healthy': {
-            'passed': 50 <= rsi <= 70 if rsi else False,
-            'value': f"{rsi:.1f}" if rsi else 'N/A',
-            'requirement': '(50-70)',
-        },
-    }
-
-    # Detect golden cross
-    golden_cross_info = detect_golden_cross(df, lookback_days=20)
-    
-    # Signal score
-    signal_score = sum([
-        criteria['breakout_confirmed']['passed'] * 25,
-        criteria['above_sma50']['passed'] * 15,
-        criteria['above_sma200']['passed'] * 15,
-        criteria['rsi_healthy']['passed'] * 10,
-        criteria['volume_spike']['passed'] * 15,
-        criteria['macd_bullish']['passed'] * 10,
-        criteria['adx_strong']['passed'] * 5,
-        criteria['handle_vol_contraction']['passed'] * 5,
-    ])
-    
-    # Bonus for recent golden cross
-    if golden_cross_info and golden_cross_info['golden_cross']:
-        signal_score += 5
-
-    # Status
-    if criteria['breakout_confirmed']['passed'] and criteria['above_sma50']['passed'] and criteria['above_sma200']['passed']:
-        if signal_score >= 75:
-            status = "STRONG BUY"
-        elif signal_score >= 55:
-            status = "BUY"
-        else:
-            status = "WATCH"
-    elif not criteria['breakout_confirmed']['passed'] and current_price > resistance * 0.97:
-        status = "FORMING - NEAR BREAKOUT"
-    elif not criteria['breakout_confirmed']['passed']:
-        status = "FORMING"
-    else:
-        status = "WATCH"
-
-    return {
-        'buy_point': round(buy_point, 2),
-        'current_price': round(current_price, 2),
-        'resistance': round(resistance, 2),
-        'sma50': round(sma50, 2) if sma50 else None,
-        'sma200': round(sma200, 2) if sma200 else None,
-        'rsi': round(rsi, 1) if rsi else None,
-        'adx': round(adx, 1) if adx else None,
-        'volume_ratio': round(vol_ratio, 2),
-        'stop_loss': round(stop_loss, 2),
-        'target': round(target, 2),
-        'rr_ratio': round(rr_ratio, 2),
-        'criteria': criteria,
-        'signal_score': signal_score,
-        'status': status,
-        'pattern': pattern,
-        'golden_cross': golden_cross_info,
-    }
-
-
 # ════════════════════════════════════════════════════════════════
 # UNIFIED CHART GENERATION
 # ════════════════════════════════════════════════════════════════
 
+@timed('chart_render')
 def generate_unified_chart(symbol, df, pattern, asc_triangle, bull_flag, buy_point, show_smas=None):
     """Generate single chart with all patterns overlaid + volume.
     
     Args:
         show_smas: List of SMA periods to display, e.g. [50, 200] or None for all
     """
+    import matplotlib
+    matplotlib.use('Agg')  # Non-interactive backend
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
     
     # Default: show 50 and 200. Use show_smas=[] to hide all, or specific list
     if show_smas is None:
@@ -1302,24 +684,21 @@ def generate_unified_chart(symbol, df, pattern, asc_triangle, bull_flag, buy_poi
             sma50 = None
             sma200 = None
         
-        # Find golden/death crosses
+        # Find golden/death crosses (one vectorized sign-change pass, shared with the detector)
         if sma50 is not None and sma200 is not None:
-            for i in range(1, len(df)):
-                if pd.notna(sma50.iloc[i]) and pd.notna(sma200.iloc[i]) and pd.notna(sma50.iloc[i-1]) and pd.notna(sma200.iloc[i-1]):
-                    # Golden cross
-                    if sma50.iloc[i-1] <= sma200.iloc[i-1] and sma50.iloc[i] > sma200.iloc[i]:
-                        ax1.axvline(x=df.index[i], color='gold', linestyle='--', linewidth=1.5, alpha=0.8)
-                        ax1.scatter([df.index[i]], [sma50.iloc[i]], color='gold', s=150, marker='*', 
-                                   zorder=10, edgecolors='white', linewidths=1)
-                        ax1.annotate('Golden Cross', xy=(df.index[i], sma50.iloc[i]), 
-                                   xytext=(10, 20), textcoords='offset points',
-                                   fontsize=9, color='gold', fontweight='bold',
-                                   arrowprops=dict(arrowstyle='->', color='gold', lw=1))
-                    # Death cross
-                    elif sma50.iloc[i-1] >= sma200.iloc[i-1] and sma50.iloc[i] < sma200.iloc[i]:
-                        ax1.axvline(x=df.index[i], color='red', linestyle='--', linewidth=1.5, alpha=0.6)
-                        ax1.scatter([df.index[i]], [sma50.iloc[i]], color='red', s=100, marker='x', 
-                                   zorder=10, linewidths=2)
+            golden, death = sma_crossovers(sma50, sma200)
+            for i in np.flatnonzero(golden):
+                ax1.axvline(x=df.index[i], color='gold', linestyle='--', linewidth=1.5, alpha=0.8)
+                ax1.scatter([df.index[i]], [sma50.iloc[i]], color='gold', s=150, marker='*', 
+                           zorder=10, edgecolors='white', linewidths=1)
+                ax1.annotate('Golden Cross', xy=(df.index[i], sma50.iloc[i]), 
+                           xytext=(10, 20), textcoords='offset points',
+                           fontsize=9, color='gold', fontweight='bold',
+                           arrowprops=dict(arrowstyle='->', color='gold', lw=1))
+            for i in np.flatnonzero(death):
+                ax1.axvline(x=df.index[i], color='red', linestyle='--', linewidth=1.5, alpha=0.6)
+                ax1.scatter([df.index[i]], [sma50.iloc[i]], color='red', s=100, marker='x', 
+                           zorder=10, linewidths=2)
     
     # Draw Cup & Handle pattern
     if pattern:
@@ -1446,111 +825,10 @@ def generate_unified_chart(symbol, df, pattern, asc_triangle, bull_flag, buy_poi
 
 
 # ════════════════════════════════════════════════════════════════
-# MAIN SCANNER (BATCH DOWNLOAD FOR SPEED)
+# TEMPLATES (compiled once through the app's Jinja loader and cached)
 # ════════════════════════════════════════════════════════════════
 
-def scan_for_patterns(tickers=None, progress_callback=None):
-    if tickers is None:
-        tickers = get_sp500_tickers()
-
-    results = []
-    total = len(tickers)
-    
-    # Batch download all data at once - MUCH faster than individual calls
-    print(f"Batch downloading {len(tickers)} stocks...")
-    
-    # Download in chunks to avoid timeout
-    chunk_size = 100
-    all_data = {}
-    
-    for i in range(0, len(tickers), chunk_size):
-        chunk = tickers[i:i+chunk_size]
-        chunk_str = ' '.join(chunk)
-        try:
-            data = yf.download(chunk_str, period="1y", group_by='ticker', 
-                              progress=False, threads=True)
-            
-            # Handle single vs multiple tickers
-            if len(chunk) == 1:
-                all_data[chunk[0]] = data
-            else:
-                for symbol in chunk:
-                    if symbol in data.columns.get_level_values(0):
-                        all_data[symbol] = data[symbol].dropna()
-        except Exception as e:
-            print(f"Chunk download error: {e}")
-        
-        if progress_callback:
-            progress_callback(min(i + chunk_size, total), total, f"Downloaded {min(i + chunk_size, total)}/{total}")
-    
-    print(f"Download complete. Analyzing {len(all_data)} stocks...")
-    
-    # Now analyze each stock
-    for idx, (symbol, df) in enumerate(all_data.items()):
-        if progress_callback and idx % 50 == 0:
-            progress_callback(idx, len(all_data), symbol)
-
-        try:
-            if df.empty or len(df) < 150:
-                continue
-
-            # Detect all patterns
-            cup_pattern = detect_cup_and_handle(df)
-            
-            if cup_pattern is None:
-                continue
-
-            asc_triangle = detect_ascending_triangle(df)
-            bull_flag = detect_bull_flag(df)
-            
-            # Count patterns
-            pattern_count = 1
-            if asc_triangle:
-                pattern_count += 1
-            if bull_flag:
-                pattern_count += 1
-
-            # Check breakout criteria
-            analysis = check_breakout_criteria(df.copy(), cup_pattern, asc_triangle, bull_flag)
-
-            if analysis:
-                analysis['symbol'] = symbol
-                analysis['cup_depth'] = round(cup_pattern['cup_depth_pct'], 1)
-                analysis['cup_days'] = cup_pattern['cup_length_days']
-                analysis['handle_pullback'] = round(cup_pattern['handle_decline_pct'], 1)
-                analysis['u_shape'] = cup_pattern['u_shape_score']
-                analysis['symmetry'] = cup_pattern['symmetry_pct']
-                analysis['asc_triangle'] = asc_triangle
-                analysis['bull_flag'] = bull_flag
-                analysis['pattern_count'] = pattern_count
-                
-                # Calculate DCF for stocks with patterns
-                dcf_result = calculate_dcf_value(symbol)
-                analysis['dcf_value'] = dcf_result.get('dcf_value')
-                analysis['margin_of_safety'] = dcf_result.get('margin')
-                
-                results.append(analysis)
-
-        except Exception as e:
-            # Silent fail for individual stocks
-            continue
-
-    print(f"Analysis complete. Found {len(results)} patterns.")
-    
-    # Sort by: status (best first), then score (highest first), then pattern count
-    status_order = {"STRONG BUY": 0, "BUY": 1, "FORMING - NEAR BREAKOUT": 2, "FORMING": 3, "WATCH": 4}
-    results.sort(key=lambda x: (status_order.get(x['status'], 5), -x['signal_score'], -x['pattern_count']))
-
-    return results
-
-
-# ════════════════════════════════════════════════════════════════
-# FLASK ROUTES
-# ════════════════════════════════════════════════════════════════
-
-@app.route("/")
-def home():
-    return render_template_string("""
+HOME_TEMPLATE = """
     <html>
     <head>
         <title>Cup & Handle Scanner V2</title>
@@ -1635,6 +913,10 @@ def home():
                 <a class="btn btn-nasdaq" href="/scan?market=nasdaq">NASDAQ ($1B+)</a>
                 <span class="time-note">~1000 stocks, 15-25 min</span>
             </p>
+            <p>
+                <a class="btn btn-nasdaq" href="/scan?market=nyse">NYSE ($1B+)</a>
+                <span class="time-note">~1000 stocks, 15-25 min</span>
+            </p>
             <p>
                 <a class="btn btn-all" href="/scan?market=all">All US ($1B+)</a>
                 <span class="time-note">~2000 stocks, 30-45 min</span>
@@ -1643,32 +925,9 @@ def home():
     </div>
     </body>
     </html>
-    """)
-
-
-@app.route("/scan")
-def scan():
-    market = request.args.get('market', 'sp500')
+"""
 
-    if market == 'nasdaq':
-        tickers = get_nasdaq_tickers(min_market_cap=1_000_000_000)
-        market_name = "NASDAQ ($1B+)"
-    elif market == 'all':
-        tickers = get_all_us_tickers(min_market_cap=1_000_000_000)
-        market_name = "All US ($1B+)"
-    else:
-        tickers = get_sp500_tickers()
-        market_name = "S&P 500"
-
-    def progress(current, total, symbol):
-        if current % 50 == 0:
-            print(f"Progress: {current}/{total} ({symbol})")
-
-    print(f"Starting Cup & Handle V2 scan for {market_name} ({len(tickers)} stocks)...")
-    results = scan_for_patterns(tickers=tickers, progress_callback=progress)
-    print(f"Scan complete. Found {len(results)} patterns.")
-
-    html = """
+SCAN_TEMPLATE = """
     <html>
     <head>
         <title>Cup & Handle V2 Scan Results</title>
@@ -1703,13 +962,31 @@ def scan():
             .badge-golden { background: gold; color: #000; }
             .summary { background: #16213e; padding: 15px; border-radius: 8px; margin: 20px 0; }
             .cup-analysis { font-size: 10px; line-height: 1.4; text-align: left; }
+            th a.sort-link { color: #00d4ff; text-decoration: none; }
+            .pager { margin: 10px 0; color: #aaa; }
+            .funnel { color: #aaa; font-size: 13px; }
+            .funnel a.golden { color: gold; text-decoration: none; }
+            .funnel a.sector-link { color: #00d4ff; text-decoration: none; margin-right: 10px; }
+            .funnel a.sector-link.active { color: #fff; font-weight: bold; }
+            .pager a { color: #00d4ff; margin: 0 6px; }
         </style>
     </head>
     <body>
     <div class="container">
         <h1>🏆 Cup & Handle V2 Scan Results</h1>
         <p><strong>Market:</strong> {{ market_name }} | <strong>Pattern:</strong> All Patterns | 
-           <strong>Scanned:</strong> {{ now }} | <strong>Found:</strong> {{ results|length }} patterns</p>
+           <strong>Scanned:</strong> {{ now }} | <strong>Found:</strong> {{ total }} patterns
+           {% if min_rs %}| <strong>RS pre-filter:</strong> &ge; {{ min_rs }} ({{ stats.rs_filtered }} skipped){% endif %}</p>
+        {% if stats.funnel %}
+        <p class="funnel"><strong>Funnel:</strong>
+           {% for stage, count in stats.funnel %}{% if not loop.first %} &rarr; {% endif %}{{ count }} {{ stage }}{% endfor %}
+           {% if stats.downloaded %}({{ ((1 - stats.analyzed / stats.downloaded) * 100)|round(1) }}% of detector work skipped){% endif %}</p>
+        {% endif %}
+        {% if stats.golden_crosses %}
+        <p class="funnel"><strong>Recent golden crosses</strong> (whole universe, last 20 bars: {{ stats.golden_crosses|length }}):
+           {% for symbol, days, rs in stats.golden_crosses[:40] %}<a href="/chart/{{ symbol }}" class="golden">{{ symbol }}</a> ({{ days }}d{% if rs %}, RS {{ rs }}{% endif %}){% if not loop.last %}, {% endif %}{% endfor %}
+           {% if stats.golden_crosses|length > 40 %}&hellip;{% endif %}</p>
+        {% endif %}
 
         <div class="summary">
             <strong>Status:</strong>
@@ -1740,38 +1017,68 @@ def scan():
             -FCF = Negative cash flow (growth stock)
         </div>
 
-        <p><a class="btn" href="/">Home</a> <a class="btn" href="/scan?market={{ market }}">Refresh</a></p>
+        <p><a class="btn" href="/">Home</a> <a class="btn" href="/scan?market={{ market }}&refresh=1">Refresh</a></p>
+
+        {% macro page_url(page_no, sort_key=sort, sort_order=order) -%}
+            /scan?market={{ market }}&page={{ page_no }}&per_page={{ per_page }}&sort={{ sort_key }}&order={{ sort_order }}{% if sector %}&sector={{ sector|urlencode }}{% endif %}
+        {%- endmacro %}
+        {% macro sort_th(label, key) -%}
+            <th><a class="sort-link" href="{{ page_url(1, key, 'asc' if (sort == key and order == 'desc') or (sort != key and key in ('rank', 'symbol', 'sector')) else 'desc') }}">{{ label }}{% if sort == key %} {{ '▼' if order == 'desc' else '▲' }}{% endif %}</a></th>
+        {%- endmacro %}
+        {% macro pager() -%}
+        <div class="pager">
+            Showing {{ first_row }}-{{ last_row }} of {{ total }}
+            {% if page > 1 %}<a href="{{ page_url(1) }}">« First</a><a href="{{ page_url(page - 1) }}">‹ Prev</a>{% endif %}
+            Page {{ page }} / {{ pages }}
+            {% if page < pages %}<a href="{{ page_url(page + 1) }}">Next ›</a><a href="{{ page_url(pages) }}">Last »</a>{% endif %}
+        </div>
+        {%- endmacro %}
+
+        {% if sectors %}
+        <p class="funnel"><strong>Sector:</strong>
+           <a class="sector-link{% if not sector %} active{% endif %}" href="/scan?market={{ market }}&sort={{ sort }}&order={{ order }}">All</a>
+           {% for s in sectors %}<a class="sector-link{% if s|lower == sector|lower %} active{% endif %}" href="/scan?market={{ market }}&sort={{ sort }}&order={{ order }}&sector={{ s|urlencode }}">{{ s }}</a>{% endfor %}</p>
+        {% endif %}
 
-        {% if results %}
+        {% if total %}
+        {{ pager() }}
         <table>
             <tr>
-                <th>Symbol</th>
+                {{ sort_th('Symbol', 'symbol') }}
+                {{ sort_th('Sector', 'sector') }}
                 <th>Chart</th>
-                <th>Patterns</th>
+                {{ sort_th('Patterns', 'patterns') }}
                 <th>Asc Triangle</th>
                 <th>Bull Flag</th>
                 <th>Golden Cross</th>
-                <th>Status</th>
-                <th>Score</th>
-                <th>Price</th>
+                {{ sort_th('Status', 'rank') }}
+                {{ sort_th('Score', 'score') }}
+                {{ sort_th('Price', 'price') }}
                 <th>Buy Point</th>
-                <th>Cup Analysis</th>
-                <th>Handle</th>
-                <th>RSI</th>
-                <th>ADX</th>
-                <th>Vol</th>
+                {{ sort_th('Cup Analysis', 'cup_depth') }}
+                {{ sort_th('Handle', 'handle') }}
+                {{ sort_th('RS', 'rs') }}
+                {{ sort_th('RSI', 'rsi') }}
+                {{ sort_th('ADX', 'adx') }}
+                {{ sort_th('Vol', 'volume') }}
                 <th>SMA50</th>
                 <th>SMA200</th>
                 <th>MACD</th>
                 <th>Stop</th>
                 <th>Target</th>
-                <th>R:R</th>
-                <th>DCF Value</th>
-                <th>Margin of Safety</th>
+                {{ sort_th('R:R', 'rr') }}
+                {{ sort_th('DCF Value', 'dcf') }}
+                {{ sort_th('DCF Min', 'dcf_min') }}
+                {{ sort_th('DCF Median', 'dcf_median') }}
+                {{ sort_th('DCF Max', 'dcf_max') }}
+                <th>MC P10 / P50 / P90</th>
+                {{ sort_th('P(Under)', 'prob_under') }}
+                {{ sort_th('Margin of Safety', 'margin') }}
             </tr>
-            {% for r in results %}
+            {% for r in rows %}
             <tr>
-                <td><strong>{{ r.symbol }}</strong></td>
+                <td title="{{ r.name or '' }}"><strong>{{ r.symbol }}</strong></td>
+                <td class="cup-analysis">{{ r.sector or '-' }}{% if r.industry %}<br><span style="color: #888;">{{ r.industry }}</span>{% endif %}</td>
                 <td><a class="view-btn" href="/chart/{{ r.symbol }}">View</a></td>
                 <td>{{ r.pattern_count }}</td>
                 <td>{% if r.asc_triangle %}<span class="pattern-badge badge-triangle">YES<br>R: ${{ r.asc_triangle.resistance }}</span>{% else %}-{% endif %}</td>
@@ -1783,6 +1090,7 @@ def scan():
                 <td>${{ r.buy_point }}</td>
                 <td class="cup-analysis">Depth: {{ r.cup_depth }}% / {{ r.cup_days }}d<br>U-shape: {{ r.u_shape }}<br>Symmetry: {{ r.symmetry }}%</td>
                 <td>{{ r.handle_pullback }}%</td>
+                <td class="{% if r.rs_rating and r.rs_rating >= 80 %}check{% endif %}">{{ r.rs_rating or '-' }}</td>
                 <td>{{ r.rsi if r.rsi else '-' }}</td>
                 <td>{{ r.adx if r.adx else '-' }}</td>
                 <td>{{ r.volume_ratio }}x</td>
@@ -1795,22 +1103,885 @@ def scan():
                 <td class="{% if r.dcf_value == '-FCF' %}dcf-orange{% elif r.margin_of_safety and r.margin_of_safety > 20 %}dcf-green{% elif r.margin_of_safety and r.margin_of_safety > 0 %}dcf-lightgreen{% elif r.margin_of_safety and r.margin_of_safety > -20 %}dcf-orange{% elif r.margin_of_safety %}dcf-red{% endif %}">
                     {% if r.dcf_value == '-FCF' %}-FCF{% elif r.dcf_value %}${{ r.dcf_value }}{% else %}-{% endif %}
                 </td>
+                {% for v in (r.dcf_min, r.dcf_median, r.dcf_max) %}
+                <td class="{% if v and r.current_price and v > r.current_price %}dcf-lightgreen{% elif v %}dcf-orange{% endif %}">{% if v %}${{ v }}{% else %}-{% endif %}</td>
+                {% endfor %}
+                <td class="cup-analysis">{% if r.dcf_p50 %}${{ r.dcf_p10 }} / ${{ r.dcf_p50 }} / ${{ r.dcf_p90 }}{% else %}-{% endif %}</td>
+                <td class="{% if r.prob_undervalued is none %}{% elif r.prob_undervalued >= 70 %}dcf-green{% elif r.prob_undervalued >= 50 %}dcf-lightgreen{% elif r.prob_undervalued >= 30 %}dcf-orange{% else %}dcf-red{% endif %}">{% if r.prob_undervalued is not none %}{{ r.prob_undervalued }}%{% else %}-{% endif %}</td>
                 <td class="{% if r.margin_of_safety and r.margin_of_safety > 20 %}dcf-green{% elif r.margin_of_safety and r.margin_of_safety > 0 %}dcf-lightgreen{% elif r.margin_of_safety and r.margin_of_safety > -20 %}dcf-orange{% elif r.margin_of_safety %}dcf-red{% endif %}">
                     {% if r.dcf_value == '-FCF' %}N/A{% elif r.margin_of_safety %}{{ r.margin_of_safety }}%{% else %}-{% endif %}
                 </td>
             </tr>
             {% endfor %}
         </table>
+        {{ pager() }}
         {% else %}
         <p style="color: #ff9800; font-size: 18px;">No cup & handle patterns found in current scan.</p>
         {% endif %}
     </div>
     </body>
     </html>
+"""
+
+CHART_TEMPLATE = """
+    <html>
+    <head>
+        <title>{{ symbol }} - {{ company.name }} | Pattern Analysis</title>
+        <style>
+            body { font-family: 'Segoe UI', Arial, sans-serif; margin: 20px; background: #1a1a2e; color: #eee; }
+            h1, h2, h3 { color: #00d4ff; }
+            .container { max-width: 1400px; margin: auto; }
+            .btn { padding: 10px 20px; background: #667eea; color: white; text-decoration: none;
+                   border-radius: 5px; margin: 5px; display: inline-block; }
+            img { max-width: 100%; border-radius: 10px; margin: 20px 0; box-shadow: 0 4px 20px rgba(0,0,0,0.5); }
+            
+            .grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(400px, 1fr)); gap: 20px; margin: 20px 0; }
+            .card { background: #16213e; padding: 20px; border-radius: 10px; }
+            .card h3 { margin-top: 0; border-bottom: 1px solid #333; padding-bottom: 10px; }
+            
+            table { width: 100%; border-collapse: collapse; margin: 10px 0; }
+            td, th { padding: 8px 12px; text-align: left; border-bottom: 1px solid #333; }
+            th { color: #888; font-weight: normal; width: 40%; }
+            
+            .pass { color: #00c853; font-weight: bold; }
+            .fail { color: #f44336; }
+            .detected { color: #00c853; font-weight: bold; }
+            .not-found { color: #888; }
+            
+            .company-header { display: flex; align-items: center; gap: 20px; margin-bottom: 20px; }
+            .company-header h1 { margin: 0; }
+            .company-meta { color: #888; font-size: 14px; }
+            
+            .description { background: #0f0f23; padding: 15px; border-radius: 8px; line-height: 1.6; 
+                          max-height: 150px; overflow-y: auto; font-size: 14px; }
+            
+            .dcf-green { color: #00c853; }
+            .dcf-lightgreen { color: #8bc34a; }
+            .dcf-orange { color: #ff9800; }
+            .dcf-red { color: #f44336; }
+            
+            .options-card { grid-column: span 2; }
+            .options-grid { display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 20px; }
+            @media (max-width: 1200px) {
+                .options-grid { grid-template-columns: 1fr 1fr; }
+            }
+            @media (max-width: 800px) {
+                .options-grid { grid-template-columns: 1fr; }
+            }
+            
+            .badge { display: inline-block; padding: 4px 12px; border-radius: 20px; font-size: 12px; 
+                    font-weight: bold; margin: 2px; }
+            .badge-triangle { background: #9c27b0; color: white; }
+            .badge-flag { background: #e91e63; color: white; }
+            .badge-cup { background: #00c853; color: white; }
+            
+            .chart-legend { background: #0f0f23; padding: 10px 15px; border-radius: 8px; margin-top: 10px;
+                           font-size: 12px; display: flex; gap: 20px; flex-wrap: wrap; }
+            .legend-item { display: flex; align-items: center; gap: 5px; }
+            .legend-color { width: 20px; height: 3px; }
+        </style>
+    </head>
+    <body>
+    <div class="container">
+        <p><a class="btn" href="javascript:history.back()">← Back to Results</a> 
+           <a class="btn" href="/">Home</a></p>
+        
+        <!-- Company Header -->
+        <div class="company-header">
+            <div>
+                <h1>{{ symbol }} - {{ company.name }}</h1>
+                <div class="company-meta">
+                    {{ company.exchange }} | {{ company.sector }} | {{ company.industry }} | 
+                    Market Cap: {{ company.market_cap_fmt }}
+                </div>
+            </div>
+        </div>
+        
+        <!-- SMA Toggle Controls -->
+        <div class="card" style="margin-bottom: 15px; padding: 15px;">
+            <strong>📈 Moving Averages:</strong>
+            <a class="btn" style="padding: 5px 12px; font-size: 12px; {% if show_smas == [50, 200] %}background: #00c853;{% endif %}" 
+               href="/chart/{{ symbol }}?sma=50,200">50 & 200</a>
+            <a class="btn" style="padding: 5px 12px; font-size: 12px; {% if 13 in show_smas and 26 in show_smas %}background: #00c853;{% endif %}" 
+               href="/chart/{{ symbol }}?sma=all">All (13,26,40,50,200)</a>
+            <a class="btn" style="padding: 5px 12px; font-size: 12px;" 
+               href="/chart/{{ symbol }}?sma=13,26,50">Short-term (13,26,50)</a>
+            <a class="btn" style="padding: 5px 12px; font-size: 12px;" 
+               href="/chart/{{ symbol }}?sma=none">None</a>
+            <span style="color: #888; font-size: 12px; margin-left: 10px;">
+                Currently showing: {% if show_smas %}{{ show_smas|join(', ') }}{% else %}None{% endif %}
+            </span>
+        </div>
+        
+        <!-- Chart -->
+        <img src="data:image/png;base64,{{ chart }}" alt="{{ symbol }} Chart">
+        
+        <div class="chart-legend">
+            <div class="legend-item"><div class="legend-color" style="background: cyan;"></div> Price</div>
+            {% if 13 in show_smas %}<div class="legend-item"><div class="legend-color" style="background: #ff6b6b;"></div> SMA 13</div>{% endif %}
+            {% if 26 in show_smas %}<div class="legend-item"><div class="legend-color" style="background: #ffd93d;"></div> SMA 26</div>{% endif %}
+            {% if 40 in show_smas %}<div class="legend-item"><div class="legend-color" style="background: #6bcb77;"></div> SMA 40</div>{% endif %}
+            {% if 50 in show_smas %}<div class="legend-item"><div class="legend-color" style="background: #4d96ff;"></div> SMA 50</div>{% endif %}
+            {% if 200 in show_smas %}<div class="legend-item"><div class="legend-color" style="background: #ff8c00;"></div> SMA 200</div>{% endif %}
+            {% if 50 in show_smas and 200 in show_smas %}<div class="legend-item"><div class="legend-color" style="background: gold;"></div> ⭐ Golden Cross (50>200)</div>{% endif %}
+            <div class="legend-item"><div class="legend-color" style="background: lime;"></div> Cup & Handle</div>
+            <div class="legend-item"><div class="legend-color" style="background: magenta;"></div> Ascending Triangle</div>
+            <div class="legend-item"><div class="legend-color" style="background: #ff9800;"></div> Bull Flag</div>
+            <div class="legend-item"><div class="legend-color" style="background: #00ff00; height: 3px;"></div> Buy Point</div>
+        </div>
+        
+        <div class="grid">
+            <!-- Breakout Criteria -->
+            <div class="card">
+                <h3>📊 Breakout Criteria</h3>
+                {% if analysis %}
+                <table>
+                    <tr>
+                        <th>Above SMA 50</th>
+                        <td class="{{ 'pass' if analysis.criteria.above_sma50.passed else 'fail' }}">
+                            {{ 'Yes' if analysis.criteria.above_sma50.passed else 'No' }}
+                            <span style="color:#888; font-size:12px;">({{ analysis.criteria.above_sma50.value }})</span>
+                        </td>
+                    </tr>
+                    <tr>
+                        <th>Above SMA 200</th>
+                        <td class="{{ 'pass' if analysis.criteria.above_sma200.passed else 'fail' }}">
+                            {{ 'Yes' if analysis.criteria.above_sma200.passed else 'No' }}
+                            <span style="color:#888; font-size:12px;">({{ analysis.criteria.above_sma200.value }})</span>
+                        </td>
+                    </tr>
+                    <tr>
+                        <th>Volume Spike</th>
+                        <td class="{{ 'pass' if analysis.criteria.volume_spike.passed else 'fail' }}">
+                            {{ analysis.criteria.volume_spike.value }} {{ analysis.criteria.volume_spike.requirement }}
+                        </td>
+                    </tr>
+                    <tr>
+                        <th>Handle Vol Contraction</th>
+                        <td class="{{ 'pass' if analysis.criteria.handle_vol_contraction.passed else 'fail' }}">
+                            {{ analysis.criteria.handle_vol_contraction.value }}
+                        </td>
+                    </tr>
+                    <tr>
+                        <th>MACD Bullish</th>
+                        <td class="{{ 'pass' if analysis.criteria.macd_bullish.passed else 'fail' }}">
+                            {{ 'Yes' if analysis.criteria.macd_bullish.passed else 'No' }}
+                        </td>
+                    </tr>
+                    <tr>
+                        <th>ADX Strong (>25)</th>
+                        <td class="{{ 'pass' if analysis.criteria.adx_strong.passed else 'fail' }}">
+                            {{ 'Yes' if analysis.criteria.adx_strong.passed else 'No' }}
+                            <span style="color:#888; font-size:12px;">({{ analysis.criteria.adx_strong.value }})</span>
+                        </td>
+                    </tr>
+                    <tr>
+                        <th>RSI Healthy (50-70)</th>
+                        <td class="{{ 'pass' if analysis.criteria.rsi_healthy.passed else 'fail' }}">
+                            {{ 'Yes' if analysis.criteria.rsi_healthy.passed else 'No' }}
+                            <span style="color:#888; font-size:12px;">({{ analysis.criteria.rsi_healthy.value }})</span>
+                        </td>
+                    </tr>
+                </table>
+                {% else %}
+                <p>Analysis not available</p>
+                {% endif %}
+            </div>
+            
+            <!-- Pattern Detection -->
+            <div class="card">
+                <h3>🔍 Additional Pattern Detection</h3>
+                <table>
+                    <tr>
+                        <th>Cup & Handle</th>
+                        <td>
+                            {% if cup_pattern %}
+                            <span class="detected">DETECTED</span>
+                            <span class="badge badge-cup">✓</span>
+                            {% else %}
+                            <span class="not-found">Not Found</span>
+                            {% endif %}
+                        </td>
+                    </tr>
+                    <tr>
+                        <th>Ascending Triangle</th>
+                        <td>
+                            {% if asc_triangle %}
+                            <span class="detected">DETECTED</span>
+                            <span class="badge badge-triangle">△</span><br>
+                            <span style="color:#888; font-size:12px;">
+                                Resistance: ${{ asc_triangle.resistance }}<br>
+                                Target: ${{ asc_triangle.target }}
+                            </span>
+                            {% else %}
+                            <span class="not-found">Not Found</span>
+                            {% endif %}
+                        </td>
+                    </tr>
+                    <tr>
+                        <th>Bull Flag/Pennant</th>
+                        <td>
+                            {% if bull_flag %}
+                            <span class="detected">DETECTED</span>
+                            <span class="badge badge-flag">⚑</span><br>
+                            <span style="color:#888; font-size:12px;">
+                                Pole: +{{ bull_flag.pole_gain }}%<br>
+                                Target: ${{ bull_flag.target }}
+                            </span>
+                            {% else %}
+                            <span class="not-found">Not Found</span>
+                            {% endif %}
+                        </td>
+                    </tr>
+                    <tr>
+                        <th>Golden Cross (50>200)</th>
+                        <td>
+                            {% if analysis and analysis.golden_cross and analysis.golden_cross.golden_cross %}
+                            <span style="color: gold; font-weight: bold;">⭐ DETECTED</span><br>
+                            <span style="color:#888; font-size:12px;">
+                                {{ analysis.golden_cross.days_since_golden }} days ago
+                            </span>
+                            {% elif analysis and analysis.golden_cross and analysis.golden_cross.sma50_above_200 %}
+                            <span style="color: #8bc34a;">50 > 200 (Bullish)</span>
+                            {% elif analysis and analysis.golden_cross and analysis.golden_cross.death_cross %}
+                            <span style="color: #f44336;">☠️ Death Cross</span><br>
+                            <span style="color:#888; font-size:12px;">
+                                {{ analysis.golden_cross.days_since_death }} days ago
+                            </span>
+                            {% elif analysis and analysis.golden_cross %}
+                            <span style="color: #f44336;">50 < 200 (Bearish)</span>
+                            {% else %}
+                            <span class="not-found">N/A</span>
+                            {% endif %}
+                        </td>
+                    </tr>
+                </table>
+                <p style="color:#888; font-size:11px; margin-top:15px;">
+                    Patterns are drawn on the chart if detected<br>
+                    (pink = triangle, orange = flag, gold star = golden cross)
+                </p>
+            </div>
+            
+            <!-- Cup & Handle Details -->
+            <div class="card">
+                <h3>🏆 Cup & Handle Formation</h3>
+                {% if cup_pattern %}
+                <table>
+                    <tr><th>Cup Depth</th><td>{{ cup_pattern.cup_depth_pct|round(1) }}%</td></tr>
+                    <tr><th>Cup Duration</th><td>{{ cup_pattern.cup_length_days }} days</td></tr>
+                    <tr><th>Left Rim</th><td>${{ cup_pattern.left_rim_price|round(2) }}</td></tr>
+                    <tr><th>Right Rim</th><td>${{ cup_pattern.right_rim_price|round(2) }}</td></tr>
+                    <tr><th>Cup Bottom</th><td>${{ cup_pattern.bottom_price|round(2) }}</td></tr>
+                    <tr><th>U-Shape Score</th><td>{{ cup_pattern.u_shape_score }} (1.0 = perfect U)</td></tr>
+                    <tr><th>Symmetry</th><td>{{ cup_pattern.symmetry_pct }}%</td></tr>
+                    <tr><th>Handle Pullback</th><td>{{ cup_pattern.handle_decline_pct|round(1) }}%</td></tr>
+                    <tr><th>Handle Days</th><td>{{ cup_pattern.handle_days }}</td></tr>
+                </table>
+                {% if analysis %}
+                <table style="margin-top:15px; border-top: 2px solid #00d4ff;">
+                    <tr><th>Buy Point</th><td style="color:#00ff00; font-weight:bold;">${{ analysis.buy_point }}</td></tr>
+                    <tr><th>Stop Loss</th><td style="color:#f44336;">${{ analysis.stop_loss }}</td></tr>
+                    <tr><th>Target</th><td style="color:#00c853;">${{ analysis.target }}</td></tr>
+                    <tr><th>Risk:Reward</th><td>{{ analysis.rr_ratio }}:1</td></tr>
+                </table>
+                {% endif %}
+                {% else %}
+                <p>Cup & Handle pattern not detected</p>
+                {% endif %}
+            </div>
+            
+            <!-- DCF Valuation -->
+            <div class="card">
+                <h3>💰 DCF Valuation</h3>
+                {% if dcf_data.status == 'success' %}
+                <table>
+                    <tr><th>Intrinsic Value</th>
+                        <td class="{% if dcf_data.margin and dcf_data.margin > 20 %}dcf-green{% elif dcf_data.margin and dcf_data.margin > 0 %}dcf-lightgreen{% elif dcf_data.margin and dcf_data.margin > -20 %}dcf-orange{% else %}dcf-red{% endif %}" style="font-size:18px; font-weight:bold;">
+                            ${{ dcf_data.dcf_value }}
+                        </td>
+                    </tr>
+                    <tr><th>Current Price</th><td>${{ dcf_data.current_price }}</td></tr>
+                    <tr><th>Margin of Safety</th>
+                        <td class="{% if dcf_data.margin and dcf_data.margin > 20 %}dcf-green{% elif dcf_data.margin and dcf_data.margin > 0 %}dcf-lightgreen{% elif dcf_data.margin and dcf_data.margin > -20 %}dcf-orange{% else %}dcf-red{% endif %}">
+                            {{ dcf_data.margin }}%
+                            {% if dcf_data.margin and dcf_data.margin > 20 %}(Undervalued 🟢)
+                            {% elif dcf_data.margin and dcf_data.margin > 0 %}(Slightly Undervalued)
+                            {% elif dcf_data.margin and dcf_data.margin > -20 %}(Fairly Valued 🟡)
+                            {% else %}(Overvalued 🔴){% endif %}
+                        </td>
+                    </tr>
+                    <tr><th>Free Cash Flow</th><td>{{ dcf_data.fcf_fmt }}</td></tr>
+                    <tr><th>Growth Rate (5yr)</th><td>{{ dcf_data.growth_rate }}%</td></tr>
+                    <tr><th>Discount Rate</th><td>{{ dcf_data.discount_rate }}%</td></tr>
+                    <tr><th>Terminal Growth</th><td>{{ dcf_data.terminal_growth }}%</td></tr>
+                </table>
+                {% if dcf_mc.status == 'success' %}
+                <h4 style="margin-bottom:4px;">Monte Carlo ({{ '{:,}'.format(dcf_mc.simulations) }} scenarios)</h4>
+                <table>
+                    <tr><th>P10 / P25 / P50</th><td>${{ dcf_mc.p10 }} / ${{ dcf_mc.p25 }} / ${{ dcf_mc.p50 }}</td></tr>
+                    <tr><th>P75 / P90</th><td>${{ dcf_mc.p75 }} / ${{ dcf_mc.p90 }}</td></tr>
+                    {% if dcf_mc.prob_undervalued is not none %}
+                    <tr><th>P(Undervalued)</th>
+                        <td class="{% if dcf_mc.prob_undervalued >= 70 %}dcf-green{% elif dcf_mc.prob_undervalued >= 50 %}dcf-lightgreen{% elif dcf_mc.prob_undervalued >= 30 %}dcf-orange{% else %}dcf-red{% endif %}">{{ dcf_mc.prob_undervalued }}%</td></tr>
+                    {% endif %}
+                </table>
+                <p style="color:#888; font-size:12px; margin-top:4px;">
+                    Growth ~ N({{ dcf_mc.growth_mean }}%, {{ dcf_mc.growth_std }}%) fitted to FCF history,
+                    discount ~ N({{ dcf_mc.discount_mean }}%, {{ dcf_mc.discount_std }}%),
+                    terminal {{ dcf_mc.terminal_low }}-{{ dcf_mc.terminal_high }}%.
+                </p>
+                {% endif %}
+                {% if dcf_grid.status == 'success' %}
+                <h4 style="margin-bottom:4px;">Sensitivity (value per share)</h4>
+                <p style="color:#888; font-size:12px; margin-top:0;">
+                    {{ dcf_grid['values']|length * dcf_grid.growth_rates|length * dcf_grid.discount_rates|length }} scenarios:
+                    min ${{ dcf_grid.min }} / median ${{ dcf_grid.median }} / max ${{ dcf_grid.max }}.
+                    Rows = 5yr growth, columns = discount rate; green = above current price.
+                </p>
+                {% for plane in dcf_grid['values'] %}
+                <table style="font-size:12px; margin-bottom:8px;">
+                    <tr><th>Terminal {{ dcf_grid.terminal_rates[loop.index0] }}%</th>
+                        {% for rate in dcf_grid.discount_rates %}<th>{{ rate }}%</th>{% endfor %}</tr>
+                    {% for row in plane %}
+                    <tr><th>{{ dcf_grid.growth_rates[loop.index0] }}%</th>
+                        {% for v in row %}<td class="{% if v is none %}{% elif dcf_data.current_price and v > dcf_data.current_price %}dcf-green{% else %}dcf-red{% endif %}">{% if v is none %}-{% else %}${{ v }}{% endif %}</td>{% endfor %}
+                    </tr>
+                    {% endfor %}
+                </table>
+                {% endfor %}
+                {% endif %}
+                {% elif dcf_data.status == 'negative_fcf' %}
+                <p style="color:#ff9800;">⚠️ Negative Free Cash Flow</p>
+                <p style="color:#888; font-size:13px;">This is common for growth companies reinvesting heavily. DCF not applicable.</p>
+                {% else %}
+                <p style="color:#888;">DCF data not available</p>
+                {% endif %}
+            </div>
+            
+            <!-- Options Strategy: Bull Call Spread -->
+            <div class="card" style="grid-column: span 2;">
+                <h3>📈 Options Strategy: Bull Call Spread</h3>
+                {% if options.status == 'success' %}
+                <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 20px;">
+                    <!-- Trade Setup -->
+                    <div>
+                        <h4 style="color: #00d4ff; margin-top: 0;">📋 Trade Setup</h4>
+                        <table>
+                            <tr><th>Expiration</th><td>{{ options.expiration }} ({{ options.days_to_exp }} days)</td></tr>
+                            <tr><th>Strategy</th><td style="color: #00c853; font-weight: bold;">{{ options.strategy }}</td></tr>
+                            <tr>
+                                <th>BUY Call</th>
+                                <td style="color: #4caf50;">
+                                    ${{ options.buy_strike }} @ ${{ options.buy_premium }}<br>
+                                    <span style="font-size: 11px; color: #888;">
+                                        Δ {{ options.buy_delta }} | Vol: {{ options.buy_volume }} | OI: {{ options.buy_oi }}
+                                        {% if options.buy_iv %}| IV: {{ options.buy_iv }}%{% endif %}
+                                    </span>
+                                </td>
+                            </tr>
+                            <tr>
+                                <th>SELL Call</th>
+                                <td style="color: #f44336;">
+                                    ${{ options.sell_strike }} @ ${{ options.sell_premium }}<br>
+                                    <span style="font-size: 11px; color: #888;">
+                                        Δ {{ options.sell_delta }} | Vol: {{ options.sell_volume }} | OI: {{ options.sell_oi }}
+                                        {% if options.sell_iv %}| IV: {{ options.sell_iv }}%{% endif %}
+                                    </span>
+                                </td>
+                            </tr>
+                            <tr><th>Spread Width</th><td>${{ options.spread_width }}</td></tr>
+                            <tr><th>Net Debit</th><td style="font-weight: bold;">${{ options.net_debit }} per contract</td></tr>
+                        </table>
+                    </div>
+                    
+                    <!-- Position Sizing & P/L -->
+                    <div>
+                        <h4 style="color: #00d4ff; margin-top: 0;">💰 Position & Risk</h4>
+                        <table>
+                            <tr><th>Budget</th><td>${{ options.budget }}</td></tr>
+                            <tr><th>Contracts</th><td style="font-weight: bold;">{{ options.contracts }}</td></tr>
+                            <tr><th>Total Cost</th><td style="color: #ff9800;">${{ options.total_cost }}</td></tr>
+                            <tr><th>Breakeven</th><td>${{ options.breakeven }} ({{ options.breakeven_move_pct }}% move needed)</td></tr>
+                            <tr><th>Max Gain</th><td style="color: #00c853; font-weight: bold;">${{ options.max_gain_total }}</td></tr>
+                            <tr><th>Max Loss</th><td style="color: #f44336;">${{ options.max_loss_total }}</td></tr>
+                            <tr><th>Risk/Reward</th><td>1:{{ options.rr_ratio }}</td></tr>
+                        </table>
+                        {% if options.avg_iv %}
+                        <p style="font-size: 11px; color: #888; margin-top: 10px;">
+                            <strong>IV Assessment:</strong> {{ options.iv_assessment }}<br>
+                            Average IV: {{ options.avg_iv }}%
+                        </p>
+                        {% endif %}
+                    </div>
+                    
+                    <!-- Exit Rules -->
+                    <div>
+                        <h4 style="color: #00d4ff; margin-top: 0;">🎯 Exit Rules</h4>
+                        <table>
+                            <tr><th>50% Profit Target</th><td style="color: #8bc34a;">Close at ${{ options.profit_target_50 }}/spread</td></tr>
+                            <tr><th>100% Profit Target</th><td style="color: #00c853;">Close at ${{ options.profit_target_100 }}/spread</td></tr>
+                            <tr><th>Stop Loss</th><td style="color: #f44336;">Close at ${{ options.stop_loss_spread }}/spread (50% loss)</td></tr>
+                            {% if options.pattern_stop %}
+                            <tr><th>Pattern Stop</th><td style="color: #ff9800;">Close if stock drops below ${{ options.pattern_stop }}</td></tr>
+                            {% endif %}
+                            <tr><th>Time Stop</th><td>Exit {{ options.exit_days_before_exp }} days before expiration</td></tr>
+                        </table>
+                        
+                        <div style="margin-top: 15px; padding: 10px; background: #0f0f23; border-radius: 8px;">
+                            <strong style="color: {% if options.recommendation_strength == 'STRONG' %}#00c853{% elif options.recommendation_strength == 'MODERATE' %}#ff9800{% else %}#f44336{% endif %};">
+                                {{ options.recommendation_strength }} SIGNAL
+                            </strong>
+                            <br>
+                            <span style="font-size: 12px; color: #888;">{{ options.size_recommendation }}</span>
+                        </div>
+                    </div>
+                </div>
+                
+                <!-- Entry Timing Rules -->
+                <div style="margin-top: 15px; padding: 15px; background: #0f0f23; border-radius: 8px;">
+                    <h4 style="color: #00d4ff; margin: 0 0 10px 0;">⏰ Entry Timing Rules</h4>
+                    <ul style="margin: 0; padding-left: 20px; font-size: 13px; line-height: 1.8;">
+                        <li><strong>Breakout Confirmation:</strong> Enter when price breaks above buy point (${{ analysis.buy_point if analysis else 'N/A' }}) with volume spike</li>
+                        <li><strong>RSI Check:</strong> Ideal entry when RSI is 50-70 (currently {{ analysis.rsi if analysis and analysis.rsi else 'N/A' }})</li>
+                        <li><strong>Volume:</strong> Wait for 2x+ average volume on breakout day (currently {{ analysis.volume_ratio if analysis else 'N/A' }}x)</li>
+                        {% if options.breakeven_move_pct > 5 %}
+                        <li style="color: #ff9800;">⚠️ <strong>Extended Stock Warning:</strong> Breakeven requires {{ options.breakeven_move_pct }}% move - consider waiting for pullback to handle</li>
+                        {% endif %}
+                    </ul>
+                </div>
+                
+                <!-- Budget Adjustment -->
+                <div style="margin-top: 10px;">
+                    <form style="display: inline-flex; gap: 10px; align-items: center;">
+                        <span style="color: #888; font-size: 12px;">Adjust budget:</span>
+                        <a class="btn" style="padding: 4px 10px; font-size: 11px;" href="/chart/{{ symbol }}?budget=150&sma={{ show_smas|join(',') }}">$150</a>
+                        <a class="btn" style="padding: 4px 10px; font-size: 11px;" href="/chart/{{ symbol }}?budget=250&sma={{ show_smas|join(',') }}">$250</a>
+                        <a class="btn" style="padding: 4px 10px; font-size: 11px;" href="/chart/{{ symbol }}?budget=375&sma={{ show_smas|join(',') }}">$375</a>
+                        <a class="btn" style="padding: 4px 10px; font-size: 11px;" href="/chart/{{ symbol }}?budget=500&sma={{ show_smas|join(',') }}">$500</a>
+                        <a class="btn" style="padding: 4px 10px; font-size: 11px;" href="/chart/{{ symbol }}?budget=1000&sma={{ show_smas|join(',') }}">$1000</a>
+                    </form>
+                </div>
+                
+                {% elif options.status == 'no_options' or options.status == 'no_suitable_exp' %}
+                <p style="color: #ff9800;">⚠️ {{ options.message }}</p>
+                <p style="color: #888; font-size: 13px;">Options trading not available for this symbol or no suitable expirations found.</p>
+                {% else %}
+                <p style="color: #f44336;">❌ {{ options.message if options.message else 'Unable to calculate options strategy' }}</p>
+                {% if options.traceback %}
+                <details style="font-size: 11px; color: #888;">
+                    <summary>Debug Info</summary>
+                    <pre>{{ options.traceback }}</pre>
+                </details>
+                {% endif %}
+                {% endif %}
+            </div>
+            
+            <!-- Social Sentiment -->
+            <div class="card">
+                <h3>📱 Social Media & News</h3>
+                <table>
+                    <tr><th>Reddit Mentions (7d)</th><td>{{ social.reddit_mentions }} posts</td></tr>
+                    <tr><th>Reddit Sentiment</th><td>{{ social.reddit_sentiment }}</td></tr>
+                    <tr><th>StockTwits</th><td>{{ social.stocktwits_sentiment }}</td></tr>
+                    <tr><th>News Sentiment</th><td>{{ social.news_sentiment }}</td></tr>
+                </table>
+                <p style="color:#888; font-size:11px; margin-top:10px;">
+                    Social data is indicative only. Always do your own research.
+                </p>
+            </div>
+            
+            <!-- Company Info -->
+            <div class="card">
+                <h3>🏢 Company Overview</h3>
+                <table>
+                    <tr><th>Sector</th><td>{{ company.sector }}</td></tr>
+                    <tr><th>Industry</th><td>{{ company.industry }}</td></tr>
+                    <tr><th>Market Cap</th><td>{{ company.market_cap_fmt }}</td></tr>
+                    <tr><th>Employees</th><td>{{ company.employees }}</td></tr>
+                    <tr><th>Country</th><td>{{ company.country }}</td></tr>
+                    {% if company.pe_ratio %}<tr><th>P/E Ratio</th><td>{{ company.pe_ratio|round(1) }}</td></tr>{% endif %}
+                    {% if company.forward_pe %}<tr><th>Forward P/E</th><td>{{ company.forward_pe|round(1) }}</td></tr>{% endif %}
+                    {% if company.beta %}<tr><th>Beta</th><td>{{ company.beta|round(2) }}</td></tr>{% endif %}
+                    <tr><th>52-Week Range</th><td>${{ company.fifty_two_week_low|round(2) }} - ${{ company.fifty_two_week_high|round(2) }}</td></tr>
+                </table>
+            </div>
+        </div>
+        
+        <!-- Business Description -->
+        <div class="card" style="margin-top: 20px;">
+            <h3>📝 Business Description</h3>
+            <div class="description">{{ company.description }}</div>
+        </div>
+        
+    </div>
+    </body>
+    </html>
+"""
+
+app.jinja_loader = DictLoader({
+    'home.html': HOME_TEMPLATE,
+    'scan.html': SCAN_TEMPLATE,
+    'chart.html': CHART_TEMPLATE,
+})
+
+
+def stream_template(name, **context):
+    """Render a cached template as a chunked response so the first bytes go out immediately."""
+    app.update_template_context(context)
+    stream = app.jinja_env.get_template(name).stream(context)
+    stream.enable_buffering(1000)  # ~10 table rows per chunk instead of one write per token
+    return Response(stream_with_context(stream), mimetype='text/html')
+
+
+# ════════════════════════════════════════════════════════════════
+# FLASK ROUTES
+# ════════════════════════════════════════════════════════════════
+
+@app.route("/")
+def home():
+    return render_template('home.html')
+
+
+def run_market_scan(market):
     """
+    Fetch the market's tickers, scan them and store the results for every worker.
+    Changes against the previous stored scan are appended to scan_events.
+    """
+    if market == 'nasdaq':
+        tickers = get_nasdaq_tickers(min_market_cap=1_000_000_000)
+    elif market == 'nyse':
+        tickers = get_nyse_tickers(min_market_cap=1_000_000_000)
+    elif market == 'all':
+        tickers = get_all_us_tickers(min_market_cap=1_000_000_000)
+    else:
+        tickers = get_sp500_tickers()
+    market_name = MARKET_NAMES.get(market, MARKET_NAMES['sp500'])
 
-    return render_template_string(html, results=results, now=datetime.now().strftime("%Y-%m-%d %H:%M"),
-                                   market=market, market_name=market_name)
+    def progress(current, total, symbol):
+        if current % 50 == 0:
+            print(f"Progress: {current}/{total} ({symbol})")
+
+    print(f"Starting Cup & Handle V2 scan for {market_name} ({len(tickers)} stocks)...")
+    scan_start = time.perf_counter()
+    stats = {}
+    with stage_timer('scan'):
+        results = scan_for_patterns(tickers=tickers, progress_callback=progress, min_rs=SCAN_MIN_RS, stats=stats,
+                                    prescreen_config=SCAN_PRESCREEN, compact=SCAN_COMPACT_PANEL,
+                                    workers=SCAN_WORKERS, panel_name=f'scan-{market}')
+    scan_seconds = time.perf_counter() - scan_start
+    metrics.SCANS.inc(market=market)
+    metrics.LAST_SCAN_SECONDS.set(round(scan_seconds, 3), market=market)
+    metrics.LAST_SCAN_RESULTS.set(len(results), market=market)
+    print(f"Scan complete. Found {len(results)} patterns in {scan_seconds:.1f}s.")
+
+    meta = {
+        'market': market,
+        'market_name': market_name,
+        'scanned_at': datetime.now().strftime("%Y-%m-%d %H:%M"),
+        'ticker_count': len(tickers),
+        'duration_s': round(scan_seconds, 1),
+        'min_rs': SCAN_MIN_RS,
+        'stats': stats,
+        # Set here, not by the store, so this fresh meta and the stored copy report the same age
+        'saved_at': time.time(),
+    }
+    record_scan(scan_store, market, results, meta, events=scan_events)
+    return results, meta
+
+
+def get_market_scan(market, refresh=False):
+    """
+    Return (results, meta) for a market, reusing a stored scan younger than
+    SCAN_CACHE_TTL (or made since the last close, while the market is closed).
+
+    A per-market file lock makes concurrent requests (from any worker) wait for
+    the one scan in flight instead of each starting their own.
+    """
+    max_age = quiet_max_age(SCAN_CACHE_TTL)
+    if not refresh:
+        stored = scan_store.load(market, max_age=max_age)
+        if stored:
+            return stored['results'], stored['meta']
+
+    with file_lock(f'scan-{market}'):
+        if not refresh:
+            stored = scan_store.load(market, max_age=max_age)
+            if stored:
+                return stored['results'], stored['meta']
+        return run_market_scan(market)
+
+
+SCAN_PAGE_SIZE = 100
+SCAN_MAX_PAGE_SIZE = 5000
+
+
+def _numeric_or_none(value):
+    return value if isinstance(value, (int, float, np.integer, np.floating)) and not pd.isna(value) else None
+
+
+# ?sort= keys for the results table -> value extractor ('rank' keeps the scanner's own ordering)
+SCAN_SORT_KEYS = {
+    'rank': None,
+    'symbol': lambda r: r['symbol'],
+    'sector': lambda r: r.get('sector'),
+    'patterns': lambda r: r['pattern_count'],
+    'score': lambda r: r['signal_score'],
+    'price': lambda r: r['current_price'],
+    'cup_depth': lambda r: r['cup_depth'],
+    'handle': lambda r: r['handle_pullback'],
+    'rs': lambda r: r.get('rs_rating'),
+    'rsi': lambda r: r.get('rsi'),
+    'adx': lambda r: r.get('adx'),
+    'volume': lambda r: r.get('volume_ratio'),
+    'rr': lambda r: r.get('rr_ratio'),
+    'dcf': lambda r: _numeric_or_none(r.get('dcf_value')),
+    'dcf_min': lambda r: r.get('dcf_min'),
+    'dcf_median': lambda r: r.get('dcf_median'),
+    'dcf_max': lambda r: r.get('dcf_max'),
+    'prob_under': lambda r: r.get('prob_undervalued'),
+    'margin': lambda r: _numeric_or_none(r.get('margin_of_safety')),
+}
+
+
+def api_sort_args(args):
+    """
+    (sort, order) from API query args. An unknown sort falls back to rank, as on
+    the page; an order other than asc/desc raises ValueError (a 400 for the caller).
+    """
+    sort = args.get('sort', 'rank')
+    if sort not in SCAN_SORT_KEYS:
+        sort = 'rank'
+    order = args.get('order', 'asc' if sort in ('rank', 'symbol', 'sector') else 'desc')
+    if order not in ('asc', 'desc'):
+        raise ValueError(f"Unknown order {order!r} (expected asc or desc)")
+    return sort, order
+
+
+def paginate_results(results, sort='rank', order='asc', page=1, per_page=SCAN_PAGE_SIZE):
+    """
+    Server-side sort + page over stored scan results.
+    per_page=0 returns every row (still streamed). Missing values always sort last.
+    """
+    extract = SCAN_SORT_KEYS.get(sort)
+    if extract is None:
+        ordered = results if order == 'asc' else results[::-1]
+    else:
+        present = [r for r in results if extract(r) is not None]
+        missing = [r for r in results if extract(r) is None]
+        ordered = sorted(present, key=extract, reverse=(order == 'desc')) + missing
+
+    total = len(ordered)
+    if per_page:
+        pages = max(1, -(-total // per_page))
+        page = min(page, pages)
+        start = (page - 1) * per_page
+        rows = ordered[start:start + per_page]
+    else:
+        pages, page, start, rows = 1, 1, 0, ordered
+
+    return rows, {
+        'total': total,
+        'page': page,
+        'pages': pages,
+        'per_page': per_page,
+        'first_row': start + 1 if rows else 0,
+        'last_row': start + len(rows),
+    }
+
+
+@app.route("/scan")
+def scan():
+    market = request.args.get('market', 'sp500')
+    if market not in MARKET_NAMES:
+        market = 'sp500'
+    refresh = request.args.get('refresh') == '1'
+
+    results, meta = get_market_scan(market, refresh=refresh)
+    market_name = meta['market_name']
+
+    sort = request.args.get('sort', 'rank')
+    if sort not in SCAN_SORT_KEYS:
+        sort = 'rank'
+    default_order = 'asc' if sort in ('rank', 'symbol', 'sector') else 'desc'
+    order = request.args.get('order', default_order)
+    if order not in ('asc', 'desc'):
+        order = default_order
+    try:
+        per_page = max(0, min(int(request.args.get('per_page', SCAN_PAGE_SIZE)), SCAN_MAX_PAGE_SIZE))
+        page = max(1, int(request.args.get('page', 1)))
+    except ValueError:
+        per_page, page = SCAN_PAGE_SIZE, 1
+
+    sectors = sorted({r['sector'] for r in results if r.get('sector')})
+    sector = request.args.get('sector', '')
+    results = filter_results(results, request.args)
+
+    rows, page_info = paginate_results(results, sort=sort, order=order, page=page, per_page=per_page)
+
+    return stream_template('scan.html', rows=rows, now=meta['scanned_at'],
+                           market=market, market_name=market_name, sector=sector, sectors=sectors,
+                           min_rs=meta.get('min_rs'), stats=meta.get('stats') or {},
+                           sort=sort, order=order, **page_info)
+
+
+def filter_results(results, args):
+    """Apply scan query filters (status, symbols, sector, min_score, min_patterns, min_margin, min_rs, golden_cross)."""
+    statuses = {s.strip().upper() for s in args.get('status', '').split(',') if s.strip()}
+    symbols = {s.strip().upper() for s in args.get('symbols', '').split(',') if s.strip()}
+    sectors = {s.strip().lower() for s in args.get('sector', '').split(',') if s.strip()}
+    min_score = args.get('min_score', type=float)
+    min_patterns = args.get('min_patterns', type=int)
+    min_margin = args.get('min_margin', type=float)
+    min_rs = args.get('min_rs', type=int)
+    golden_only = args.get('golden_cross') == '1'
+
+    filtered = []
+    for r in results:
+        if statuses and r['status'] not in statuses:
+            continue
+        if symbols and r['symbol'] not in symbols:
+            continue
+        if sectors and (r.get('sector') or '').lower() not in sectors:
+            continue
+        if min_score is not None and r['signal_score'] < min_score:
+            continue
+        if min_patterns is not None and r['pattern_count'] < min_patterns:
+            continue
+        if min_margin is not None:
+            margin = _numeric_or_none(r.get('margin_of_safety'))
+            if margin is None or margin < min_margin:
+                continue
+        if min_rs is not None and (r.get('rs_rating') or 0) < min_rs:
+            continue
+        if golden_only and not (r.get('golden_cross') and r['golden_cross'].get('golden_cross')):
+            continue
+        filtered.append(r)
+    return filtered
+
+
+def json_response(payload, status=200):
+    """Compact JSON, gzip-compressed when the client accepts it."""
+    body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    response = Response(status=status, mimetype='application/json')
+    if 'gzip' in request.accept_encodings and len(body) > 1024:
+        body = gzip.compress(body, compresslevel=6)
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.set_data(body)
+    return response
+
+
+@app.route("/api/scan")
+def api_scan():
+    """
+    Stored scan results as columns (one array per field) for automation.
+
+    Query: market, refresh=1, status=BUY,STRONG BUY, symbols=, sector=, min_score=, min_patterns=,
+    min_margin=, min_rs=, golden_cross=1, sort=, order=, offset=, limit=, fields=a,b,c, include=criteria
+    """
+    market = request.args.get('market', 'sp500')
+    if market not in MARKET_NAMES:
+        return json_response({'error': f'Unknown market {market}', 'markets': list(MARKET_NAMES)}, 400)
+    try:
+        sort, order = api_sort_args(request.args)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
+    stored = None if request.args.get('refresh') == '1' else scan_store.load(market, max_age=float('inf'))
+    if stored:
+        results, meta = stored['results'], stored['meta']
+    else:
+        results, meta = get_market_scan(market, refresh=request.args.get('refresh') == '1')
+
+    filtered = filter_results(results, request.args)
+
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = max(0, min(request.args.get('limit', 1000, type=int), SCAN_MAX_PAGE_SIZE))
+    ordered, _ = paginate_results(filtered, sort=sort, order=order, per_page=0)
+    rows = ordered[offset:offset + limit]
+
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip() in SCAN_FIELDS] or None
+    include = {i.strip() for i in request.args.get('include', '').split(',')}
+
+    return json_response({
+        'market': market,
+        'market_name': meta.get('market_name'),
+        'scanned_at': meta.get('scanned_at'),
+        'age_s': round(time.time() - meta['saved_at']) if meta.get('saved_at') else None,
+        'total': len(filtered),
+        'offset': offset,
+        'limit': limit,
+        'count': len(rows),
+        'stats': meta.get('stats'),
+        'fields': list(fields or SCAN_FIELDS) + (['criteria'] if 'criteria' in include else []),
+        'columns': scan_columns(rows, fields=fields, include_criteria='criteria' in include),
+    })
+
+
+@app.route("/api/export")
+def api_export():
+    """
+    Stored scan results streamed as a flat file, nested criteria/pattern dicts as
+    dotted columns. Query: market, format=csv|ndjson|parquet, refresh=1, and the
+    /api/scan filters and sort/order (no paging: every matching row is exported).
+    """
+    market = request.args.get('market', 'sp500')
+    if market not in MARKET_NAMES:
+        return json_response({'error': f'Unknown market {market}', 'markets': list(MARKET_NAMES)}, 400)
+    fmt = request.args.get('format', 'csv').lower()
+    try:
+        sort, order = api_sort_args(request.args)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
+    stored = None if request.args.get('refresh') == '1' else scan_store.load(market, max_age=float('inf'))
+    if stored:
+        results, meta = stored['results'], stored['meta']
+    else:
+        results, meta = get_market_scan(market, refresh=request.args.get('refresh') == '1')
+
+    rows, _ = paginate_results(filter_results(results, request.args), sort=sort, order=order, per_page=0)
+
+    try:
+        chunks = export_stream(rows, fmt)
+    except ValueError as e:
+        return json_response({'error': str(e), 'formats': list(EXPORT_FORMATS)}, 400)
+    except ImportError as e:
+        return json_response({'error': f'{fmt} export is not available on this server ({e})'}, 501)
+
+    stamp = (meta.get('scanned_at') or '').replace(' ', '_').replace(':', '')
+    response = Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="scan-{market}-{stamp}.{fmt}"'
+    return response
+
+
+@app.route("/api/events")
+def api_events():
+    """
+    Scan change events (new, upgraded, downgraded, dropped, breakout), oldest first.
+
+    Query: since=<seq> (poll with the last seq seen), market=, type=new,breakout,
+    symbols=, limit= (default 1000). Returns the events and last_seq to resume from.
+    """
+    since = max(0, request.args.get('since', 0, type=int))
+    market = request.args.get('market') or None
+    if market and market not in MARKET_NAMES:
+        return json_response({'error': f'Unknown market {market}', 'markets': list(MARKET_NAMES)}, 400)
+    types = {t.strip().lower() for t in request.args.get('type', '').split(',') if t.strip()}
+    unknown = types - set(EVENT_TYPES)
+    if unknown:
+        return json_response({'error': f"Unknown event type {', '.join(sorted(unknown))}",
+                              'types': list(EVENT_TYPES)}, 400)
+    symbols = {s.strip().upper() for s in request.args.get('symbols', '').split(',') if s.strip()}
+    limit = max(1, min(request.args.get('limit', 1000, type=int), SCAN_MAX_PAGE_SIZE))
+
+    events = scan_events.read(since=since, market=market, types=types, symbols=symbols, limit=limit)
+    return json_response({
+        'since': since,
+        'count': len(events),
+        'last_seq': events[-1]['seq'] if events else since,
+        'events': events,
+    })
 
 
 @app.route("/chart")
@@ -1823,6 +1994,37 @@ def chart_search():
     return redirect(f"/chart/{symbol}")
 
 
+def get_chart_history(symbol):
+    """
+    ~500 trading days of daily bars for the chart page, shared across workers
+    (PRICE_CACHE_TTL during the session, since the last close otherwise). The
+    last cached copy is served if Yahoo can't be reached.
+    """
+    df = chart_history_cache.get(symbol, max_age=quiet_max_age(PRICE_CACHE_TTL))
+    if df is not None:
+        return df.copy()
+
+    import yfinance as yf
+    # Fetch enough data so 200 SMA covers the full displayed period
+    # Need: 252 (display) + 200 (SMA warmup) = 452 days minimum
+    # Request 500 days to be safe
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=700)  # ~500 trading days
+    try:
+        with provider_call('yahoo'):
+            df = yf.Ticker(symbol).history(start=start_date, end=end_date)
+    except Exception:
+        # Yahoo down or failing fast: an old chart beats an error page
+        stale = chart_history_cache.get(symbol, max_age=float('inf'))
+        if stale is None:
+            raise
+        return stale.copy()
+    if df is not None and not df.empty:
+        chart_history_cache.set(symbol, df)
+        return df.copy()
+    return df
+
+
 @app.route("/chart/<symbol>")
 def chart(symbol):
     """Generate detailed chart view with all info."""
@@ -1839,15 +2041,8 @@ def chart(symbol):
             except:
                 show_smas = [50, 200]
         
-        ticker = yf.Ticker(symbol)
         try:
-            # Fetch enough data so 200 SMA covers the full displayed period
-            # Need: 252 (display) + 200 (SMA warmup) = 452 days minimum
-            # Request 500 days to be safe
-            from datetime import datetime, timedelta
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=700)  # ~500 trading days
-            df_full = ticker.history(start=start_date, end=end_date)
+            df_full = get_chart_history(symbol)
         except Exception as hist_err:
             return f"Error fetching history for {symbol}: {hist_err}"
         
@@ -1880,13 +2075,16 @@ def chart(symbol):
         asc_triangle = detect_ascending_triangle(df)
         bull_flag = detect_bull_flag(df)
         dcf_data = calculate_dcf_value(symbol)
+        fundamentals = get_fundamentals(symbol)  # cached by calculate_dcf_value, no extra fetch
+        dcf_grid = dcf_sensitivity(fundamentals)
+        dcf_mc = dcf_monte_carlo(fundamentals)
         social = get_social_sentiment(symbol)
         
         # Get analysis
         analysis = None
         buy_point = None
         if cup_pattern:
-            analysis = check_breakout_criteria(df.copy(), cup_pattern, asc_triangle, bull_flag)
+            analysis = check_breakout_criteria(df, cup_pattern, asc_triangle, bull_flag)
             buy_point = analysis['buy_point'] if analysis else None
         
         # Get options strategy recommendation
@@ -1900,489 +2098,83 @@ def chart(symbol):
         
         # Generate unified chart with SMA toggle
         # Pass df which now has pre-calculated SMAs
-        chart_base64 = generate_unified_chart(symbol, df, cup_pattern, asc_triangle, bull_flag, buy_point, show_smas=show_smas)
-        
-        html = """
-        <html>
-        <head>
-            <title>{{ symbol }} - {{ company.name }} | Pattern Analysis</title>
-            <style>
-                body { font-family: 'Segoe UI', Arial, sans-serif; margin: 20px; background: #1a1a2e; color: #eee; }
-                h1, h2, h3 { color: #00d4ff; }
-                .container { max-width: 1400px; margin: auto; }
-                .btn { padding: 10px 20px; background: #667eea; color: white; text-decoration: none;
-                       border-radius: 5px; margin: 5px; display: inline-block; }
-                img { max-width: 100%; border-radius: 10px; margin: 20px 0; box-shadow: 0 4px 20px rgba(0,0,0,0.5); }
-                
-                .grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(400px, 1fr)); gap: 20px; margin: 20px 0; }
-                .card { background: #16213e; padding: 20px; border-radius: 10px; }
-                .card h3 { margin-top: 0; border-bottom: 1px solid #333; padding-bottom: 10px; }
-                
-                table { width: 100%; border-collapse: collapse; margin: 10px 0; }
-                td, th { padding: 8px 12px; text-align: left; border-bottom: 1px solid #333; }
-                th { color: #888; font-weight: normal; width: 40%; }
-                
-                .pass { color: #00c853; font-weight: bold; }
-                .fail { color: #f44336; }
-                .detected { color: #00c853; font-weight: bold; }
-                .not-found { color: #888; }
-                
-                .company-header { display: flex; align-items: center; gap: 20px; margin-bottom: 20px; }
-                .company-header h1 { margin: 0; }
-                .company-meta { color: #888; font-size: 14px; }
-                
-                .description { background: #0f0f23; padding: 15px; border-radius: 8px; line-height: 1.6; 
-                              max-height: 150px; overflow-y: auto; font-size: 14px; }
-                
-                .dcf-green { color: #00c853; }
-                .dcf-lightgreen { color: #8bc34a; }
-                .dcf-orange { color: #ff9800; }
-                .dcf-red { color: #f44336; }
-                
-                .options-card { grid-column: span 2; }
-                .options-grid { display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 20px; }
-                @media (max-width: 1200px) {
-                    .options-grid { grid-template-columns: 1fr 1fr; }
-                }
-                @media (max-width: 800px) {
-                    .options-grid { grid-template-columns: 1fr; }
-                }
-                
-                .badge { display: inline-block; padding: 4px 12px; border-radius: 20px; font-size: 12px; 
-                        font-weight: bold; margin: 2px; }
-                .badge-triangle { background: #9c27b0; color: white; }
-                .badge-flag { background: #e91e63; color: white; }
-                .badge-cup { background: #00c853; color: white; }
-                
-                .chart-legend { background: #0f0f23; padding: 10px 15px; border-radius: 8px; margin-top: 10px;
-                               font-size: 12px; display: flex; gap: 20px; flex-wrap: wrap; }
-                .legend-item { display: flex; align-items: center; gap: 5px; }
-                .legend-color { width: 20px; height: 3px; }
-            </style>
-        </head>
-        <body>
-        <div class="container">
-            <p><a class="btn" href="javascript:history.back()">← Back to Results</a> 
-               <a class="btn" href="/">Home</a></p>
-            
-            <!-- Company Header -->
-            <div class="company-header">
-                <div>
-                    <h1>{{ symbol }} - {{ company.name }}</h1>
-                    <div class="company-meta">
-                        {{ company.exchange }} | {{ company.sector }} | {{ company.industry }} | 
-                        Market Cap: {{ company.market_cap_fmt }}
-                    </div>
-                </div>
-            </div>
-            
-            <!-- SMA Toggle Controls -->
-            <div class="card" style="margin-bottom: 15px; padding: 15px;">
-                <strong>📈 Moving Averages:</strong>
-                <a class="btn" style="padding: 5px 12px; font-size: 12px; {% if show_smas == [50, 200] %}background: #00c853;{% endif %}" 
-                   href="/chart/{{ symbol }}?sma=50,200">50 & 200</a>
-                <a class="btn" style="padding: 5px 12px; font-size: 12px; {% if 13 in show_smas and 26 in show_smas %}background: #00c853;{% endif %}" 
-                   href="/chart/{{ symbol }}?sma=all">All (13,26,40,50,200)</a>
-                <a class="btn" style="padding: 5px 12px; font-size: 12px;" 
-                   href="/chart/{{ symbol }}?sma=13,26,50">Short-term (13,26,50)</a>
-                <a class="btn" style="padding: 5px 12px; font-size: 12px;" 
-                   href="/chart/{{ symbol }}?sma=none">None</a>
-                <span style="color: #888; font-size: 12px; margin-left: 10px;">
-                    Currently showing: {% if show_smas %}{{ show_smas|join(', ') }}{% else %}None{% endif %}
-                </span>
-            </div>
-            
-            <!-- Chart -->
-            <img src="data:image/png;base64,{{ chart }}" alt="{{ symbol }} Chart">
-            
-            <div class="chart-legend">
-                <div class="legend-item"><div class="legend-color" style="background: cyan;"></div> Price</div>
-                {% if 13 in show_smas %}<div class="legend-item"><div class="legend-color" style="background: #ff6b6b;"></div> SMA 13</div>{% endif %}
-                {% if 26 in show_smas %}<div class="legend-item"><div class="legend-color" style="background: #ffd93d;"></div> SMA 26</div>{% endif %}
-                {% if 40 in show_smas %}<div class="legend-item"><div class="legend-color" style="background: #6bcb77;"></div> SMA 40</div>{% endif %}
-                {% if 50 in show_smas %}<div class="legend-item"><div class="legend-color" style="background: #4d96ff;"></div> SMA 50</div>{% endif %}
-                {% if 200 in show_smas %}<div class="legend-item"><div class="legend-color" style="background: #ff8c00;"></div> SMA 200</div>{% endif %}
-                {% if 50 in show_smas and 200 in show_smas %}<div class="legend-item"><div class="legend-color" style="background: gold;"></div> ⭐ Golden Cross (50>200)</div>{% endif %}
-                <div class="legend-item"><div class="legend-color" style="background: lime;"></div> Cup & Handle</div>
-                <div class="legend-item"><div class="legend-color" style="background: magenta;"></div> Ascending Triangle</div>
-                <div class="legend-item"><div class="legend-color" style="background: #ff9800;"></div> Bull Flag</div>
-                <div class="legend-item"><div class="legend-color" style="background: #00ff00; height: 3px;"></div> Buy Point</div>
-            </div>
-            
-            <div class="grid">
-                <!-- Breakout Criteria -->
-                <div class="card">
-                    <h3>📊 Breakout Criteria</h3>
-                    {% if analysis %}
-                    <table>
-                        <tr>
-                            <th>Above SMA 50</th>
-                            <td class="{{ 'pass' if analysis.criteria.above_sma50.passed else 'fail' }}">
-                                {{ 'Yes' if analysis.criteria.above_sma50.passed else 'No' }}
-                                <span style="color:#888; font-size:12px;">({{ analysis.criteria.above_sma50.value }})</span>
-                            </td>
-                        </tr>
-                        <tr>
-                            <th>Above SMA 200</th>
-                            <td class="{{ 'pass' if analysis.criteria.above_sma200.passed else 'fail' }}">
-                                {{ 'Yes' if analysis.criteria.above_sma200.passed else 'No' }}
-                                <span style="color:#888; font-size:12px;">({{ analysis.criteria.above_sma200.value }})</span>
-                            </td>
-                        </tr>
-                        <tr>
-                            <th>Volume Spike</th>
-                            <td class="{{ 'pass' if analysis.criteria.volume_spike.passed else 'fail' }}">
-                                {{ analysis.criteria.volume_spike.value }} {{ analysis.criteria.volume_spike.requirement }}
-                            </td>
-                        </tr>
-                        <tr>
-                            <th>Handle Vol Contraction</th>
-                            <td class="{{ 'pass' if analysis.criteria.handle_vol_contraction.passed else 'fail' }}">
-                                {{ analysis.criteria.handle_vol_contraction.value }}
-                            </td>
-                        </tr>
-                        <tr>
-                            <th>MACD Bullish</th>
-                            <td class="{{ 'pass' if analysis.criteria.macd_bullish.passed else 'fail' }}">
-                                {{ 'Yes' if analysis.criteria.macd_bullish.passed else 'No' }}
-                            </td>
-                        </tr>
-                        <tr>
-                            <th>ADX Strong (>25)</th>
-                            <td class="{{ 'pass' if analysis.criteria.adx_strong.passed else 'fail' }}">
-                                {{ 'Yes' if analysis.criteria.adx_strong.passed else 'No' }}
-                                <span style="color:#888; font-size:12px;">({{ analysis.criteria.adx_strong.value }})</span>
-                            </td>
-                        </tr>
-                        <tr>
-                            <th>RSI Healthy (50-70)</th>
-                            <td class="{{ 'pass' if analysis.criteria.rsi_healthy.passed else 'fail' }}">
-                                {{ 'Yes' if analysis.criteria.rsi_healthy.passed else 'No' }}
-                                <span style="color:#888; font-size:12px;">({{ analysis.criteria.rsi_healthy.value }})</span>
-                            </td>
-                        </tr>
-                    </table>
-                    {% else %}
-                    <p>Analysis not available</p>
-                    {% endif %}
-                </div>
-                
-                <!-- Pattern Detection -->
-                <div class="card">
-                    <h3>🔍 Additional Pattern Detection</h3>
-                    <table>
-                        <tr>
-                            <th>Cup & Handle</th>
-                            <td>
-                                {% if cup_pattern %}
-                                <span class="detected">DETECTED</span>
-                                <span class="badge badge-cup">✓</span>
-                                {% else %}
-                                <span class="not-found">Not Found</span>
-                                {% endif %}
-                            </td>
-                        </tr>
-                        <tr>
-                            <th>Ascending Triangle</th>
-                            <td>
-                                {% if asc_triangle %}
-                                <span class="detected">DETECTED</span>
-                                <span class="badge badge-triangle">△</span><br>
-                                <span style="color:#888; font-size:12px;">
-                                    Resistance: ${{ asc_triangle.resistance }}<br>
-                                    Target: ${{ asc_triangle.target }}
-                                </span>
-                                {% else %}
-                                <span class="not-found">Not Found</span>
-                                {% endif %}
-                            </td>
-                        </tr>
-                        <tr>
-                            <th>Bull Flag/Pennant</th>
-                            <td>
-                                {% if bull_flag %}
-                                <span class="detected">DETECTED</span>
-                                <span class="badge badge-flag">⚑</span><br>
-                                <span style="color:#888; font-size:12px;">
-                                    Pole: +{{ bull_flag.pole_gain }}%<br>
-                                    Target: ${{ bull_flag.target }}
-                                </span>
-                                {% else %}
-                                <span class="not-found">Not Found</span>
-                                {% endif %}
-                            </td>
-                        </tr>
-                        <tr>
-                            <th>Golden Cross (50>200)</th>
-                            <td>
-                                {% if analysis and analysis.golden_cross and analysis.golden_cross.golden_cross %}
-                                <span style="color: gold; font-weight: bold;">⭐ DETECTED</span><br>
-                                <span style="color:#888; font-size:12px;">
-                                    {{ analysis.golden_cross.days_since_golden }} days ago
-                                </span>
-                                {% elif analysis and analysis.golden_cross and analysis.golden_cross.sma50_above_200 %}
-                                <span style="color: #8bc34a;">50 > 200 (Bullish)</span>
-                                {% elif analysis and analysis.golden_cross and analysis.golden_cross.death_cross %}
-                                <span style="color: #f44336;">☠️ Death Cross</span><br>
-                                <span style="color:#888; font-size:12px;">
-                                    {{ analysis.golden_cross.days_since_death }} days ago
-                                </span>
-                                {% elif analysis and analysis.golden_cross %}
-                                <span style="color: #f44336;">50 < 200 (Bearish)</span>
-                                {% else %}
-                                <span class="not-found">N/A</span>
-                                {% endif %}
-                            </td>
-                        </tr>
-                    </table>
-                    <p style="color:#888; font-size:11px; margin-top:15px;">
-                        Patterns are drawn on the chart if detected<br>
-                        (pink = triangle, orange = flag, gold star = golden cross)
-                    </p>
-                </div>
-                
-                <!-- Cup & Handle Details -->
-                <div class="card">
-                    <h3>🏆 Cup & Handle Formation</h3>
-                    {% if cup_pattern %}
-                    <table>
-                        <tr><th>Cup Depth</th><td>{{ cup_pattern.cup_depth_pct|round(1) }}%</td></tr>
-                        <tr><th>Cup Duration</th><td>{{ cup_pattern.cup_length_days }} days</td></tr>
-                        <tr><th>Left Rim</th><td>${{ cup_pattern.left_rim_price|round(2) }}</td></tr>
-                        <tr><th>Right Rim</th><td>${{ cup_pattern.right_rim_price|round(2) }}</td></tr>
-                        <tr><th>Cup Bottom</th><td>${{ cup_pattern.bottom_price|round(2) }}</td></tr>
-                        <tr><th>U-Shape Score</th><td>{{ cup_pattern.u_shape_score }} (1.0 = perfect U)</td></tr>
-                        <tr><th>Symmetry</th><td>{{ cup_pattern.symmetry_pct }}%</td></tr>
-                        <tr><th>Handle Pullback</th><td>{{ cup_pattern.handle_decline_pct|round(1) }}%</td></tr>
-                        <tr><th>Handle Days</th><td>{{ cup_pattern.handle_days }}</td></tr>
-                    </table>
-                    {% if analysis %}
-                    <table style="margin-top:15px; border-top: 2px solid #00d4ff;">
-                        <tr><th>Buy Point</th><td style="color:#00ff00; font-weight:bold;">${{ analysis.buy_point }}</td></tr>
-                        <tr><th>Stop Loss</th><td style="color:#f44336;">${{ analysis.stop_loss }}</td></tr>
-                        <tr><th>Target</th><td style="color:#00c853;">${{ analysis.target }}</td></tr>
-                        <tr><th>Risk:Reward</th><td>{{ analysis.rr_ratio }}:1</td></tr>
-                    </table>
-                    {% endif %}
-                    {% else %}
-                    <p>Cup & Handle pattern not detected</p>
-                    {% endif %}
-                </div>
-                
-                <!-- DCF Valuation -->
-                <div class="card">
-                    <h3>💰 DCF Valuation</h3>
-                    {% if dcf_data.status == 'success' %}
-                    <table>
-                        <tr><th>Intrinsic Value</th>
-                            <td class="{% if dcf_data.margin and dcf_data.margin > 20 %}dcf-green{% elif dcf_data.margin and dcf_data.margin > 0 %}dcf-lightgreen{% elif dcf_data.margin and dcf_data.margin > -20 %}dcf-orange{% else %}dcf-red{% endif %}" style="font-size:18px; font-weight:bold;">
-                                ${{ dcf_data.dcf_value }}
-                            </td>
-                        </tr>
-                        <tr><th>Current Price</th><td>${{ dcf_data.current_price }}</td></tr>
-                        <tr><th>Margin of Safety</th>
-                            <td class="{% if dcf_data.margin and dcf_data.margin > 20 %}dcf-green{% elif dcf_data.margin and dcf_data.margin > 0 %}dcf-lightgreen{% elif dcf_data.margin and dcf_data.margin > -20 %}dcf-orange{% else %}dcf-red{% endif %}">
-                                {{ dcf_data.margin }}%
-                                {% if dcf_data.margin and dcf_data.margin > 20 %}(Undervalued 🟢)
-                                {% elif dcf_data.margin and dcf_data.margin > 0 %}(Slightly Undervalued)
-                                {% elif dcf_data.margin and dcf_data.margin > -20 %}(Fairly Valued 🟡)
-                                {% else %}(Overvalued 🔴){% endif %}
-                            </td>
-                        </tr>
-                        <tr><th>Free Cash Flow</th><td>{{ dcf_data.fcf_fmt }}</td></tr>
-                        <tr><th>Growth Rate (5yr)</th><td>{{ dcf_data.growth_rate }}%</td></tr>
-                        <tr><th>Discount Rate</th><td>{{ dcf_data.discount_rate }}%</td></tr>
-                        <tr><th>Terminal Growth</th><td>{{ dcf_data.terminal_growth }}%</td></tr>
-                    </table>
-                    {% elif dcf_data.status == 'negative_fcf' %}
-                    <p style="color:#ff9800;">⚠️ Negative Free Cash Flow</p>
-                    <p style="color:#888; font-size:13px;">This is common for growth companies reinvesting heavily. DCF not applicable.</p>
-                    {% else %}
-                    <p style="color:#888;">DCF data not available</p>
-                    {% endif %}
-                </div>
-                
-                <!-- Options Strategy: Bull Call Spread -->
-                <div class="card" style="grid-column: span 2;">
-                    <h3>📈 Options Strategy: Bull Call Spread</h3>
-                    {% if options.status == 'success' %}
-                    <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 20px;">
-                        <!-- Trade Setup -->
-                        <div>
-                            <h4 style="color: #00d4ff; margin-top: 0;">📋 Trade Setup</h4>
-                            <table>
-                                <tr><th>Expiration</th><td>{{ options.expiration }} ({{ options.days_to_exp }} days)</td></tr>
-                                <tr><th>Strategy</th><td style="color: #00c853; font-weight: bold;">{{ options.strategy }}</td></tr>
-                                <tr>
-                                    <th>BUY Call</th>
-                                    <td style="color: #4caf50;">
-                                        ${{ options.buy_strike }} @ ${{ options.buy_premium }}<br>
-                                        <span style="font-size: 11px; color: #888;">
-                                            Δ {{ options.buy_delta }} | Vol: {{ options.buy_volume }} | OI: {{ options.buy_oi }}
-                                            {% if options.buy_iv %}| IV: {{ options.buy_iv }}%{% endif %}
-                                        </span>
-                                    </td>
-                                </tr>
-                                <tr>
-                                    <th>SELL Call</th>
-                                    <td style="color: #f44336;">
-                                        ${{ options.sell_strike }} @ ${{ options.sell_premium }}<br>
-                                        <span style="font-size: 11px; color: #888;">
-                                            Δ {{ options.sell_delta }} | Vol: {{ options.sell_volume }} | OI: {{ options.sell_oi }}
-                                            {% if options.sell_iv %}| IV: {{ options.sell_iv }}%{% endif %}
-                                        </span>
-                                    </td>
-                                </tr>
-                                <tr><th>Spread Width</th><td>${{ options.spread_width }}</td></tr>
-                                <tr><th>Net Debit</th><td style="font-weight: bold;">${{ options.net_debit }} per contract</td></tr>
-                            </table>
-                        </div>
-                        
-                        <!-- Position Sizing & P/L -->
-                        <div>
-                            <h4 style="color: #00d4ff; margin-top: 0;">💰 Position & Risk</h4>
-                            <table>
-                                <tr><th>Budget</th><td>${{ options.budget }}</td></tr>
-                                <tr><th>Contracts</th><td style="font-weight: bold;">{{ options.contracts }}</td></tr>
-                                <tr><th>Total Cost</th><td style="color: #ff9800;">${{ options.total_cost }}</td></tr>
-                                <tr><th>Breakeven</th><td>${{ options.breakeven }} ({{ options.breakeven_move_pct }}% move needed)</td></tr>
-                                <tr><th>Max Gain</th><td style="color: #00c853; font-weight: bold;">${{ options.max_gain_total }}</td></tr>
-                                <tr><th>Max Loss</th><td style="color: #f44336;">${{ options.max_loss_total }}</td></tr>
-                                <tr><th>Risk/Reward</th><td>1:{{ options.rr_ratio }}</td></tr>
-                            </table>
-                            {% if options.avg_iv %}
-                            <p style="font-size: 11px; color: #888; margin-top: 10px;">
-                                <strong>IV Assessment:</strong> {{ options.iv_assessment }}<br>
-                                Average IV: {{ options.avg_iv }}%
-                            </p>
-                            {% endif %}
-                        </div>
-                        
-                        <!-- Exit Rules -->
-                        <div>
-                            <h4 style="color: #00d4ff; margin-top: 0;">🎯 Exit Rules</h4>
-                            <table>
-                                <tr><th>50% Profit Target</th><td style="color: #8bc34a;">Close at ${{ options.profit_target_50 }}/spread</td></tr>
-                                <tr><th>100% Profit Target</th><td style="color: #00c853;">Close at ${{ options.profit_target_100 }}/spread</td></tr>
-                                <tr><th>Stop Loss</th><td style="color: #f44336;">Close at ${{ options.stop_loss_spread }}/spread (50% loss)</td></tr>
-                                {% if options.pattern_stop %}
-                                <tr><th>Pattern Stop</th><td style="color: #ff9800;">Close if stock drops below ${{ options.pattern_stop }}</td></tr>
-                                {% endif %}
-                                <tr><th>Time Stop</th><td>Exit {{ options.exit_days_before_exp }} days before expiration</td></tr>
-                            </table>
-                            
-                            <div style="margin-top: 15px; padding: 10px; background: #0f0f23; border-radius: 8px;">
-                                <strong style="color: {% if options.recommendation_strength == 'STRONG' %}#00c853{% elif options.recommendation_strength == 'MODERATE' %}#ff9800{% else %}#f44336{% endif %};">
-                                    {{ options.recommendation_strength }} SIGNAL
-                                </strong>
-                                <br>
-                                <span style="font-size: 12px; color: #888;">{{ options.size_recommendation }}</span>
-                            </div>
-                        </div>
-                    </div>
-                    
-                    <!-- Entry Timing Rules -->
-                    <div style="margin-top: 15px; padding: 15px; background: #0f0f23; border-radius: 8px;">
-                        <h4 style="color: #00d4ff; margin: 0 0 10px 0;">⏰ Entry Timing Rules</h4>
-                        <ul style="margin: 0; padding-left: 20px; font-size: 13px; line-height: 1.8;">
-                            <li><strong>Breakout Confirmation:</strong> Enter when price breaks above buy point (${{ analysis.buy_point if analysis else 'N/A' }}) with volume spike</li>
-                            <li><strong>RSI Check:</strong> Ideal entry when RSI is 50-70 (currently {{ analysis.rsi if analysis and analysis.rsi else 'N/A' }})</li>
-                            <li><strong>Volume:</strong> Wait for 2x+ average volume on breakout day (currently {{ analysis.volume_ratio if analysis else 'N/A' }}x)</li>
-                            {% if options.breakeven_move_pct > 5 %}
-                            <li style="color: #ff9800;">⚠️ <strong>Extended Stock Warning:</strong> Breakeven requires {{ options.breakeven_move_pct }}% move - consider waiting for pullback to handle</li>
-                            {% endif %}
-                        </ul>
-                    </div>
-                    
-                    <!-- Budget Adjustment -->
-                    <div style="margin-top: 10px;">
-                        <form style="display: inline-flex; gap: 10px; align-items: center;">
-                            <span style="color: #888; font-size: 12px;">Adjust budget:</span>
-                            <a class="btn" style="padding: 4px 10px; font-size: 11px;" href="/chart/{{ symbol }}?budget=150&sma={{ show_smas|join(',') }}">$150</a>
-                            <a class="btn" style="padding: 4px 10px; font-size: 11px;" href="/chart/{{ symbol }}?budget=250&sma={{ show_smas|join(',') }}">$250</a>
-                            <a class="btn" style="padding: 4px 10px; font-size: 11px;" href="/chart/{{ symbol }}?budget=375&sma={{ show_smas|join(',') }}">$375</a>
-                            <a class="btn" style="padding: 4px 10px; font-size: 11px;" href="/chart/{{ symbol }}?budget=500&sma={{ show_smas|join(',') }}">$500</a>
-                            <a class="btn" style="padding: 4px 10px; font-size: 11px;" href="/chart/{{ symbol }}?budget=1000&sma={{ show_smas|join(',') }}">$1000</a>
-                        </form>
-                    </div>
-                    
-                    {% elif options.status == 'no_options' or options.status == 'no_suitable_exp' %}
-                    <p style="color: #ff9800;">⚠️ {{ options.message }}</p>
-                    <p style="color: #888; font-size: 13px;">Options trading not available for this symbol or no suitable expirations found.</p>
-                    {% else %}
-                    <p style="color: #f44336;">❌ {{ options.message if options.message else 'Unable to calculate options strategy' }}</p>
-                    {% if options.traceback %}
-                    <details style="font-size: 11px; color: #888;">
-                        <summary>Debug Info</summary>
-                        <pre>{{ options.traceback }}</pre>
-                    </details>
-                    {% endif %}
-                    {% endif %}
-                </div>
-                
-                <!-- Social Sentiment -->
-                <div class="card">
-                    <h3>📱 Social Media & News</h3>
-                    <table>
-                        <tr><th>Reddit Mentions (7d)</th><td>{{ social.reddit_mentions }} posts</td></tr>
-                        <tr><th>Reddit Sentiment</th><td>{{ social.reddit_sentiment }}</td></tr>
-                        <tr><th>StockTwits</th><td>{{ social.stocktwits_sentiment }}</td></tr>
-                        <tr><th>News Sentiment</th><td>{{ social.news_sentiment }}</td></tr>
-                    </table>
-                    <p style="color:#888; font-size:11px; margin-top:10px;">
-                        Social data is indicative only. Always do your own research.
-                    </p>
-                </div>
-                
-                <!-- Company Info -->
-                <div class="card">
-                    <h3>🏢 Company Overview</h3>
-                    <table>
-                        <tr><th>Sector</th><td>{{ company.sector }}</td></tr>
-                        <tr><th>Industry</th><td>{{ company.industry }}</td></tr>
-                        <tr><th>Market Cap</th><td>{{ company.market_cap_fmt }}</td></tr>
-                        <tr><th>Employees</th><td>{{ company.employees }}</td></tr>
-                        <tr><th>Country</th><td>{{ company.country }}</td></tr>
-                        {% if company.pe_ratio %}<tr><th>P/E Ratio</th><td>{{ company.pe_ratio|round(1) }}</td></tr>{% endif %}
-                        {% if company.forward_pe %}<tr><th>Forward P/E</th><td>{{ company.forward_pe|round(1) }}</td></tr>{% endif %}
-                        {% if company.beta %}<tr><th>Beta</th><td>{{ company.beta|round(2) }}</td></tr>{% endif %}
-                        <tr><th>52-Week Range</th><td>${{ company.fifty_two_week_low|round(2) }} - ${{ company.fifty_two_week_high|round(2) }}</td></tr>
-                    </table>
-                </div>
-            </div>
-            
-            <!-- Business Description -->
-            <div class="card" style="margin-top: 20px;">
-                <h3>📝 Business Description</h3>
-                <div class="description">{{ company.description }}</div>
-            </div>
-            
-        </div>
-        </body>
-        </html>
-        """
-        
-        return render_template_string(html, 
-                                      symbol=symbol, 
-                                      chart=chart_base64,
-                                      company=company_info,
-                                      cup_pattern=cup_pattern, 
-                                      asc_triangle=asc_triangle, 
-                                      bull_flag=bull_flag,
-                                      analysis=analysis,
-                                      dcf_data=dcf_data,
-                                      social=social,
-                                      show_smas=show_smas,
-                                      options=options_strategy,
-                                      options_budget=options_budget)
+        # Rendered PNGs are shared across workers; keyed on the last bar so new data re-renders
+        chart_key = (symbol, tuple(show_smas), str(df.index[-1].date()))
+        chart_base64 = chart_cache.get(chart_key, max_age=quiet_max_age(chart_cache.ttl))
+        if chart_base64 is None:
+            chart_base64 = generate_unified_chart(symbol, df, cup_pattern, asc_triangle, bull_flag, buy_point, show_smas=show_smas)
+            chart_cache.set(chart_key, chart_base64)
+        
+        
+        return render_template('chart.html', 
+                               symbol=symbol, 
+                               chart=chart_base64,
+                               company=company_info,
+                               cup_pattern=cup_pattern, 
+                               asc_triangle=asc_triangle, 
+                               bull_flag=bull_flag,
+                               analysis=analysis,
+                               dcf_data=dcf_data,
+                               dcf_grid=dcf_grid,
+                               dcf_mc=dcf_mc,
+                               social=social,
+                               show_smas=show_smas,
+                               options=options_strategy,
+                               options_budget=options_budget)
     
     except Exception as e:
         import traceback
         return f"Error generating chart for {symbol}: {e}<br><pre>{traceback.format_exc()}</pre>"
 
 
+# ════════════════════════════════════════════════════════════════
+# SCHEDULED WARM-UP
+# ════════════════════════════════════════════════════════════════
+
+def warm_up(markets):
+    """
+    Scheduled job: refresh the universe lists, rescan each market (prices and
+    hit fundamentals/DCF land in the shared caches) and render the chart pages of
+    its top SCHEDULE_WARM_CHARTS hits, so the first visit of the day is served
+    from warm data.
+    """
+    # Universe snapshots are daily; pull today's copy if the stored one is from yesterday
+    load_screener_snapshot(max_age=12 * 3600)
+    load_sp500_snapshot(max_age=12 * 3600)
+
+    client = app.test_client()
+    for market in markets:
+        if market not in MARKET_NAMES:
+            print(f"Warm-up: unknown market {market!r}")
+            continue
+        with file_lock(f'scan-{market}'):
+            results, _ = run_market_scan(market)
+        top = results[:SCHEDULE_WARM_CHARTS]  # already in rank order
+        for r in top:
+            client.get(f"/chart/{r['symbol']}")
+        print(f"Warm-up {market}: {len(results)} hits, {len(top)} charts rendered")
+
+
+_scheduler = None
+
+
+def start_scheduler():
+    """Start the SCANNER_SCHEDULE warm-up thread in this process (one process runs it)."""
+    global _scheduler
+    if SCANNER_SCHEDULE and _scheduler is None:
+        _scheduler = Scheduler(SCANNER_SCHEDULE, warm_up).start()
+    return _scheduler
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Per-stage timings, provider request stats and scan counters (Prometheus text format)."""
+    return Response(metrics.render_prometheus(), content_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     print("Starting Cup & Handle Scanner V2 (Enhanced)...")
     print("Open http://127.0.0.1:5002 in your browser")
+    start_scheduler()
     # Disable reloader to prevent crashes during long scans
     app.run(debug=True, host="0.0.0.0", port=5002, use_reloader=False)
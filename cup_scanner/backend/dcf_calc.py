@@ -2,118 +2,124 @@
 """
 Simple DCF Calculator - Called by Node.js backend
 Usage: python3 dcf_calc.py <SYMBOL>
-Output: JSON with DCF data
+       python3 dcf_calc.py --batch [--workers N]  < symbols.txt
+       python3 dcf_calc.py --socket /tmp/dcf.sock [--workers N]
+Output: JSON with DCF data (batch/socket: one JSON object per line, each with "symbol")
+
+The valuation itself lives in scanner_core/dcf.py (shared with both Flask apps);
+this script only adapts its result to the JSON shape the Node.js backend reads.
+
+Batch and socket modes keep one interpreter (and yfinance's HTTP session) alive
+for many symbols: symbols are read as they arrive, valued concurrently, and each
+result is written as soon as it is ready (completion order, not input order).
+Fundamentals come from the shared on-disk cache, so repeat symbols are instant.
 """
 
+import argparse
 import sys
+import os
 import json
-import yfinance as yf
-
-def format_market_cap(value):
-    if abs(value) >= 1e12:
-        return f"${value/1e12:.2f}T"
-    elif abs(value) >= 1e9:
-        return f"${value/1e9:.2f}B"
-    elif abs(value) >= 1e6:
-        return f"${value/1e6:.2f}M"
-    else:
-        return f"${value:.0f}"
+import re
+
+# Add the stocks directory (repo root) to path to import the shared scanner_core package
+STOCKS_DIR = os.environ.get('STOCKS_DIR', os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.insert(0, STOCKS_DIR)
+
+DEFAULT_WORKERS = int(os.environ.get('FETCH_WORKERS', 8))
+
 
 def calculate_dcf_value(symbol):
+    # Imported here so usage errors and argument parsing don't wait on pandas
+    from scanner_core.adapters import cli_dcf
+    from scanner_core.dcf import calculate_dcf_value as core_dcf
     try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
-        
-        # Get free cash flow
-        cashflow = ticker.cashflow
-        if cashflow is None or cashflow.empty:
-            return {'status': 'no_data', 'dcf_value': None, 'margin': None}
-        
-        # Find Free Cash Flow
-        fcf = None
-        fcf_history = []
-        
-        for row_name in ['Free Cash Flow', 'FreeCashFlow']:
-            if row_name in cashflow.index:
-                fcf_row = cashflow.loc[row_name]
-                fcf = fcf_row.iloc[0] if len(fcf_row) > 0 else None
-                fcf_history = fcf_row.tolist()[:4]
-                break
-        
-        if fcf is None:
-            # Try to calculate: Operating Cash Flow - CapEx
-            ocf = None
-            capex = None
-            for row_name in ['Operating Cash Flow', 'Total Cash From Operating Activities']:
-                if row_name in cashflow.index:
-                    ocf = cashflow.loc[row_name].iloc[0]
-                    break
-            for row_name in ['Capital Expenditure', 'Capital Expenditures']:
-                if row_name in cashflow.index:
-                    capex = abs(cashflow.loc[row_name].iloc[0])
-                    break
-            if ocf is not None and capex is not None:
-                fcf = ocf - capex
-            else:
-                return {'status': 'no_fcf', 'dcf_value': None, 'margin': None}
-        
-        if fcf is None or fcf <= 0:
-            return {'status': 'negative_fcf', 'dcf_value': '-FCF', 'margin': None}
-        
-        # Get shares outstanding
-        shares = info.get('sharesOutstanding', None)
-        if not shares:
-            return {'status': 'no_shares', 'dcf_value': None, 'margin': None}
-        
-        # DCF parameters
-        growth_rate = 0.10  # 10% growth for 5 years
-        terminal_growth = 0.03  # 3% terminal growth
-        discount_rate = 0.10  # 10% discount rate
-        years = 5
-        
-        # Project future cash flows
-        projected_fcf = []
-        current_fcf = fcf
-        for year in range(1, years + 1):
-            current_fcf = current_fcf * (1 + growth_rate)
-            discounted = current_fcf / ((1 + discount_rate) ** year)
-            projected_fcf.append(discounted)
-        
-        # Terminal value
-        terminal_fcf = current_fcf * (1 + terminal_growth)
-        terminal_value = terminal_fcf / (discount_rate - terminal_growth)
-        discounted_terminal = terminal_value / ((1 + discount_rate) ** years)
-        
-        # Total intrinsic value
-        total_value = sum(projected_fcf) + discounted_terminal
-        intrinsic_per_share = total_value / shares
-        
-        # Get current price
-        current_price = info.get('currentPrice', info.get('regularMarketPrice', None))
-        
-        result = {
-            'status': 'success',
-            'dcf_value': round(intrinsic_per_share, 2),
-            'fcf': fcf,
-            'fcf_fmt': format_market_cap(fcf),
-            'shares': shares,
-        }
-        
-        if current_price:
-            margin_of_safety = ((intrinsic_per_share - current_price) / current_price) * 100
-            result['current_price'] = current_price
-            result['margin'] = round(margin_of_safety, 1)
-        
-        return result
-        
+        return cli_dcf(core_dcf(symbol))
     except Exception as e:
         return {'status': 'error', 'error': str(e)}
 
+
+def parse_symbols(line):
+    """Symbols separated by whitespace and/or commas."""
+    return [s.upper() for s in re.split(r'[\s,]+', line) if s]
+
+
+def symbol_result(symbol):
+    return {'symbol': symbol, **calculate_dcf_value(symbol)}
+
+
+def stream_batch(lines, write, workers=DEFAULT_WORKERS):
+    """
+    Value every symbol in an iterable of text lines, calling write(result_dict)
+    for each one as it completes. Only the calling thread writes.
+    """
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = set()
+        for line in lines:
+            for symbol in parse_symbols(line):
+                pending.add(pool.submit(symbol_result, symbol))
+            # Flush whatever finished while we waited for more input
+            done = {f for f in pending if f.done()}
+            for future in done:
+                write(future.result())
+            pending -= done
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                write(future.result())
+
+
+def run_batch(workers):
+    def write(result):
+        sys.stdout.write(json.dumps(result) + '\n')
+        sys.stdout.flush()
+    stream_batch(sys.stdin, write, workers)
+
+
+def run_socket(path, workers):
+    """Serve batch requests on a Unix socket: send symbol lines, read NDJSON back."""
+    import socketserver
+
+    class DCFHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            def write(result):
+                self.wfile.write((json.dumps(result) + '\n').encode('utf-8'))
+                self.wfile.flush()
+            stream_batch((line.decode('utf-8', 'replace') for line in self.rfile), write, workers)
+
+    if os.path.exists(path):
+        os.unlink(path)
+    with socketserver.ThreadingUnixStreamServer(path, DCFHandler) as server:
+        server.daemon_threads = True
+        print(json.dumps({'status': 'listening', 'socket': path}), flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
+
+
 if __name__ == '__main__':
     if len(sys.argv) < 2:
-        print(json.dumps({'error': 'Usage: python3 dcf_calc.py <SYMBOL>'}))
+        print(json.dumps({'error': 'Usage: python3 dcf_calc.py <SYMBOL> | --batch | --socket PATH'}))
         sys.exit(1)
-    
-    symbol = sys.argv[1].upper()
-    result = calculate_dcf_value(symbol)
-    print(json.dumps(result))
+
+    parser = argparse.ArgumentParser(description='DCF intrinsic value (JSON / NDJSON)')
+    parser.add_argument('symbol', nargs='?')
+    parser.add_argument('--batch', action='store_true', help='read symbols from stdin, stream NDJSON')
+    parser.add_argument('--socket', metavar='PATH', help='serve batch requests on a Unix socket')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='concurrent fetches')
+    args = parser.parse_args()
+
+    if args.socket:
+        run_socket(args.socket, args.workers)
+    elif args.batch:
+        run_batch(args.workers)
+    elif args.symbol:
+        symbol = args.symbol.upper()
+        result = calculate_dcf_value(symbol)
+        print(json.dumps(result))
+    else:
+        parser.error('a symbol, --batch or --socket is required')
@@ -2,23 +2,38 @@
 # Uses yfinance for reliable data fetching
 # Serves JSON APIs for React frontend
 
-from flask import Flask, jsonify, request
+# yfinance, pandas, pandas_ta and scipy are imported inside the handlers that need
+# them so health/search requests don't pay for the scientific stack at startup.
+
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-import yfinance as yf
-import pandas as pd
-import pandas_ta as ta
 from datetime import datetime, timedelta
-from scipy.signal import argrelextrema
-import numpy as np
+import gzip
+import json
 import sys
 import os
 
-# Add the stocks directory to path to import from cup_handle_scanner_2
-sys.path.insert(0, '/Users/richard/Documents/stocks')
+# Add the stocks directory (repo root) to path to import the shared scanner_core package
+STOCKS_DIR = os.environ.get('STOCKS_DIR', os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.insert(0, STOCKS_DIR)
+
+from scanner_core.adapters import camel_breakout, camel_cup_pattern, camel_dcf
+from scanner_core.breakout import check_breakout_criteria
+from scanner_core.cache import DiskCache
+from scanner_core.dcf import calculate_dcf_value, format_market_cap
+from scanner_core.detectors import detect_cup_and_handle
+from scanner_core.fetch import fetch_many
+from scanner_core.prices import download_history
+from scanner_core.search import get_symbol_index
+from scanner_core.serialize import column_records, history_columns
+from scanner_core.universe import MARKETS, market_tickers
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
 
+# Encoded /api/history bodies, keyed by the symbol's last bar
+history_cache = DiskCache('history', ttl=24 * 3600)
+
 # ═══════════════════════════════════════════════════════════════
 # CONSTANTS
 # ═══════════════════════════════════════════════════════════════
@@ -42,19 +57,9 @@ SP500_TICKERS = [
 # HELPER FUNCTIONS
 # ═══════════════════════════════════════════════════════════════
 
-def format_market_cap(value):
-    if not value or value == 0:
-        return 'N/A'
-    if value >= 1e12:
-        return f"${value/1e12:.2f}T"
-    elif value >= 1e9:
-        return f"${value/1e9:.2f}B"
-    elif value >= 1e6:
-        return f"${value/1e6:.2f}M"
-    return f"${value:,.0f}"
-
 def get_company_info(symbol):
     """Get detailed company information using yfinance."""
+    import yfinance as yf
     try:
         ticker = yf.Ticker(symbol)
         info = ticker.info
@@ -95,235 +100,20 @@ def get_company_info(symbol):
             'error': str(e)
         }
 
-def detect_cup_and_handle(df, min_cup_days=20, max_cup_days=130):
-    """Detect cup and handle pattern."""
-    if len(df) < max_cup_days + 30:
-        return None
-
-    closes = df['Close'].values
-    highs = df['High'].values
-    lows = df['Low'].values
-
-    order = 10
-    local_max_idx = argrelextrema(closes, np.greater_equal, order=order)[0]
-    local_min_idx = argrelextrema(closes, np.less_equal, order=order)[0]
-
-    if len(local_max_idx) < 2 or len(local_min_idx) < 1:
-        return None
-
-    lookback = min(len(closes), max_cup_days + 50)
-    recent_max = [i for i in local_max_idx if i >= len(closes) - lookback]
-    recent_min = [i for i in local_min_idx if i >= len(closes) - lookback]
-
-    if len(recent_max) < 2 or len(recent_min) < 1:
-        return None
-
-    best_pattern = None
-    best_score = 0
-
-    for i, left_rim_idx in enumerate(recent_max[:-1]):
-        for right_rim_idx in recent_max[i+1:]:
-            cup_length = right_rim_idx - left_rim_idx
-
-            if cup_length < min_cup_days or cup_length > max_cup_days:
-                continue
-
-            bottom_candidates = [m for m in recent_min if left_rim_idx < m < right_rim_idx]
-            if not bottom_candidates:
-                continue
-
-            bottom_idx = min(bottom_candidates, key=lambda x: closes[x])
-
-            left_rim_price = closes[left_rim_idx]
-            right_rim_price = closes[right_rim_idx]
-            bottom_price = closes[bottom_idx]
-
-            avg_rim = (left_rim_price + right_rim_price) / 2
-            cup_depth_pct = (avg_rim - bottom_price) / avg_rim * 100
-
-            if cup_depth_pct < 12 or cup_depth_pct > 35:
-                continue
-
-            rim_diff = abs(left_rim_price - right_rim_price) / avg_rim * 100
-            if rim_diff > 5:
-                continue
-
-            handle_start = right_rim_idx
-            handle_data = closes[handle_start:]
-
-            if len(handle_data) < 5:
-                continue
-
-            handle_low = min(handle_data)
-            handle_decline = (right_rim_price - handle_low) / right_rim_price * 100
-
-            if handle_decline < 2 or handle_decline > 15:
-                continue
-
-            # Calculate symmetry
-            left_days = bottom_idx - left_rim_idx
-            right_days = right_rim_idx - bottom_idx
-            symmetry = 1 - abs(left_days - right_days) / cup_length
-
-            score = 100 - abs(cup_depth_pct - 25) - rim_diff - abs(handle_decline - 8) + symmetry * 20
-
-            if score > best_score:
-                best_score = score
-                best_pattern = {
-                    'leftRimIdx': int(left_rim_idx),
-                    'rightRimIdx': int(right_rim_idx),
-                    'bottomIdx': int(bottom_idx),
-                    'leftRimPrice': float(left_rim_price),
-                    'rightRimPrice': float(right_rim_price),
-                    'bottomPrice': float(bottom_price),
-                    'cupDepthPct': float(cup_depth_pct),
-                    'cupLengthDays': int(cup_length),
-                    'handleLow': float(handle_low),
-                    'handleDeclinePct': float(handle_decline),
-                    'symmetryPct': float(symmetry * 100),
-                    'score': float(score)
-                }
-
-    return best_pattern
-
-def check_breakout_criteria(df, pattern):
-    """Validate breakout criteria."""
-    if pattern is None:
-        return None, {}
-
-    last = df.iloc[-1]
-    prev = df.iloc[-2] if len(df) > 1 else last
-
-    resistance = pattern['rightRimPrice']
-    buy_point = resistance + 0.10
-    current_price = float(last['Close'])
-
-    # Calculate indicators
-    df = df.copy()
-    df['SMA50'] = df['Close'].rolling(50).mean()
-    df['SMA200'] = df['Close'].rolling(200).mean()
-    df['RSI'] = ta.rsi(df['Close'], length=14)
-
-    macd = ta.macd(df['Close'], fast=12, slow=26, signal=9)
-    if macd is not None:
-        df['MACD'] = macd['MACD_12_26_9']
-        df['MACD_signal'] = macd['MACDs_12_26_9']
-    
-    last = df.iloc[-1]
-    prev = df.iloc[-2] if len(df) > 1 else last
-
-    sma50 = float(last['SMA50']) if not pd.isna(last['SMA50']) else None
-    sma200 = float(last['SMA200']) if not pd.isna(last['SMA200']) else None
-    rsi = float(last['RSI']) if not pd.isna(last['RSI']) else None
-    macd_val = float(last['MACD']) if 'MACD' in last and not pd.isna(last['MACD']) else None
-    macd_sig = float(last['MACD_signal']) if 'MACD_signal' in last and not pd.isna(last['MACD_signal']) else None
-
-    # Volume analysis
-    handle_start = pattern['rightRimIdx']
-    if handle_start < len(df) - 1:
-        handle_volumes = df['Volume'].iloc[handle_start:-1]
-        avg_handle_vol = handle_volumes.mean() if len(handle_volumes) > 0 else df['Volume'].mean()
-    else:
-        avg_handle_vol = df['Volume'].rolling(20).mean().iloc[-1]
-
-    current_vol = float(last['Volume'])
-    vol_ratio = current_vol / avg_handle_vol if avg_handle_vol > 0 else 1
-
-    criteria = {
-        'breakoutConfirmed': current_price > buy_point,
-        'aboveSMA50': current_price > sma50 if sma50 else False,
-        'aboveSMA200': current_price > sma200 if sma200 else False,
-        'rsiHealthy': 50 <= rsi <= 70 if rsi else False,
-        'rsiAcceptable': 45 <= rsi <= 75 if rsi else False,
-        'volumeSpike': vol_ratio > 1.5,
-        'macdBullish': (macd_val > macd_sig) if (macd_val and macd_sig) else False,
-    }
-
-    # Signal score
-    signal_score = sum([
-        criteria['breakoutConfirmed'] * 25,
-        criteria['aboveSMA50'] * 15,
-        criteria['aboveSMA200'] * 15,
-        criteria['rsiHealthy'] * 10,
-        criteria['volumeSpike'] * 15,
-        criteria['macdBullish'] * 10,
-    ])
-
-    # Status
-    if criteria['breakoutConfirmed'] and criteria['aboveSMA50'] and criteria['aboveSMA200']:
-        if signal_score >= 70:
-            status = "STRONG BUY"
-        elif signal_score >= 50:
-            status = "BUY"
-        else:
-            status = "WATCH"
-    elif not criteria['breakoutConfirmed'] and current_price > resistance * 0.97:
-        status = "FORMING - NEAR BREAKOUT"
-    elif not criteria['breakoutConfirmed']:
-        status = "FORMING"
-    else:
-        status = "WATCH"
-
-    return {
-        'buyPoint': round(buy_point, 2),
-        'currentPrice': round(current_price, 2),
-        'resistance': round(resistance, 2),
-        'sma50': round(sma50, 2) if sma50 else None,
-        'sma200': round(sma200, 2) if sma200 else None,
-        'rsi': round(rsi, 1) if rsi else None,
-        'volumeRatio': round(vol_ratio, 2),
-        'criteria': criteria,
-        'signalScore': signal_score,
-        'status': status,
-    }, criteria
-
-def calculate_dcf_value(symbol):
-    """Calculate DCF intrinsic value."""
-    try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
-        hist = ticker.history(period="5y")
-        
-        if len(hist) < 252:
-            return None
-            
-        current_price = info.get('currentPrice', info.get('regularMarketPrice', 0))
-        if not current_price:
-            return None
-            
-        # Calculate historical growth
-        yearly_returns = hist['Close'].resample('Y').last().pct_change().dropna()
-        avg_growth = yearly_returns.mean() if len(yearly_returns) > 0 else 0.05
-        
-        # Conservative growth estimate
-        growth_rate = min(max(avg_growth * 0.7, 0.02), 0.25)
-        discount_rate = 0.10
-        terminal_growth = 0.02
-        projection_years = 5
-        
-        # Simple DCF
-        dcf_value = current_price
-        for year in range(1, projection_years + 1):
-            dcf_value *= (1 + growth_rate) / (1 + discount_rate)
-        
-        # Terminal value
-        terminal_value = dcf_value * (1 + terminal_growth) / (discount_rate - terminal_growth)
-        terminal_value_pv = terminal_value / ((1 + discount_rate) ** projection_years)
-        
-        intrinsic_value = dcf_value + terminal_value_pv * 0.3
-        margin_of_safety = ((intrinsic_value - current_price) / current_price) * 100
-        
-        return {
-            'dcfValue': round(intrinsic_value, 2),
-            'currentPrice': round(current_price, 2),
-            'marginOfSafety': round(margin_of_safety, 1),
-            'estimatedGrowth': round(growth_rate * 100, 1),
-            'discountRate': discount_rate * 100,
-            'valuationStatus': 'Undervalued' if margin_of_safety > 10 else ('Overvalued' if margin_of_safety < -10 else 'Fair Value')
-        }
-    except Exception as e:
-        print(f"DCF calculation error for {symbol}: {e}")
-        return None
+def analyze_cup_and_handle(df):
+    """
+    Run the shared cup & handle detector and breakout scoring (scanner_core).
+    Returns (pattern, breakout, criteria) in the frontend's camelCase shape.
+    """
+    raw = detect_cup_and_handle(df)
+    if raw is None:
+        return None, None, {}
+    breakout, criteria = camel_breakout(check_breakout_criteria(df, raw))
+    return camel_cup_pattern(raw), breakout, criteria
+
+def get_dcf(symbol):
+    """Shared DCF valuation (cached fundamentals) in the frontend's camelCase shape."""
+    return camel_dcf(calculate_dcf_value(symbol))
 
 # ═══════════════════════════════════════════════════════════════
 # API ROUTES
@@ -345,29 +135,14 @@ def search():
         return jsonify({'results': []})
     
     try:
-        # Search using yfinance
-        results = []
-        
-        # Check if exact match in S&P 500
-        matching = [t for t in SP500_TICKERS if t.startswith(query)][:10]
-        
-        for symbol in matching:
-            try:
-                ticker = yf.Ticker(symbol)
-                info = ticker.info
-                results.append({
-                    'symbol': symbol,
-                    'name': info.get('longName', info.get('shortName', symbol)),
-                    'exchange': info.get('exchange', 'Unknown'),
-                    'type': 'EQUITY'
-                })
-            except:
-                results.append({
-                    'symbol': symbol,
-                    'name': symbol,
-                    'exchange': 'Unknown',
-                    'type': 'EQUITY'
-                })
+        # Prefix index over the cached NASDAQ/NYSE screener snapshot: no network per keystroke
+        index = get_symbol_index(fallback_symbols=SP500_TICKERS)
+        results = [{
+            'symbol': row['symbol'],
+            'name': row['name'],
+            'exchange': row.get('exchange', 'Unknown'),
+            'type': 'EQUITY'
+        } for row in index.search(query, limit=10)]
         
         return jsonify({'query': query, 'results': results})
     except Exception as e:
@@ -381,6 +156,7 @@ def company(symbol):
 
 @app.route('/api/scan/<symbol>')
 def scan_symbol(symbol):
+    import yfinance as yf
     symbol = symbol.upper()
     
     try:
@@ -390,13 +166,10 @@ def scan_symbol(symbol):
         if df.empty or len(df) < 150:
             return jsonify({'error': 'Insufficient data', 'symbol': symbol}), 404
         
-        # Detect pattern
-        pattern = detect_cup_and_handle(df)
+        # Detect pattern and get breakout criteria
+        pattern, breakout, criteria = analyze_cup_and_handle(df)
         
-        # Get breakout criteria
-        if pattern:
-            breakout, criteria = check_breakout_criteria(df, pattern)
-        else:
+        if not pattern:
             breakout = {
                 'currentPrice': float(df['Close'].iloc[-1]),
                 'status': 'WATCH',
@@ -405,10 +178,9 @@ def scan_symbol(symbol):
                 'sma50': float(df['Close'].rolling(50).mean().iloc[-1]) if len(df) >= 50 else None,
                 'sma200': float(df['Close'].rolling(200).mean().iloc[-1]) if len(df) >= 200 else None,
             }
-            criteria = {}
         
         # Calculate DCF
-        dcf = calculate_dcf_value(symbol)
+        dcf = get_dcf(symbol)
         
         return jsonify({
             'symbol': symbol,
@@ -447,57 +219,67 @@ def scan_market():
     market = request.args.get('market', 'sp500').lower()
     limit = int(request.args.get('limit', 500))
     
-    tickers = SP500_TICKERS[:limit]
+    if market not in MARKETS:
+        return jsonify({'error': f'Unknown market {market}', 'markets': list(MARKETS)}), 400
+    # Built from the shared daily screener / S&P 500 snapshots (no per-scan API calls)
+    tickers = market_tickers(market, fallback=SP500_TICKERS)[:limit]
     results = []
     
     print(f"Scanning {len(tickers)} stocks...")
     
+    # One batched download per 100 symbols, shared with the standalone scanner's price cache
+    price_data = download_history(tickers, period="1y")
+    
+    hits = []
     for i, symbol in enumerate(tickers):
         try:
-            ticker = yf.Ticker(symbol)
-            df = ticker.history(period="1y")
+            df = price_data.get(symbol)
             
-            if df.empty or len(df) < 150:
+            if df is None or df.empty or len(df) < 150:
                 continue
             
-            pattern = detect_cup_and_handle(df)
+            pattern, breakout, criteria = analyze_cup_and_handle(df)
             
             if not pattern:
                 continue
             
-            breakout, criteria = check_breakout_criteria(df, pattern)
-            dcf = calculate_dcf_value(symbol)
-            
-            results.append({
-                'symbol': symbol,
-                'currentPrice': breakout.get('currentPrice'),
-                'status': breakout.get('status', 'FORMING'),
-                'score': pattern['score'],
-                'patterns': {'cupAndHandle': pattern},
-                'cupDepth': f"{pattern['cupDepthPct']:.1f}",
-                'cupDays': pattern['cupLengthDays'],
-                'handlePullback': f"{pattern['handleDeclinePct']:.1f}",
-                'rsi': breakout.get('rsi'),
-                'volumeRatio': breakout.get('volumeRatio'),
-                'aboveSMA50': criteria.get('aboveSMA50', False),
-                'aboveSMA200': criteria.get('aboveSMA200', False),
-                'macdBullish': criteria.get('macdBullish', False),
-                'buyPoint': breakout.get('buyPoint'),
-                'stopLoss': pattern['handleLow'],
-                'target': pattern['rightRimPrice'] + (pattern['rightRimPrice'] - pattern['bottomPrice']),
-                'dcfValue': dcf['dcfValue'] if dcf else None,
-                'marginOfSafety': dcf['marginOfSafety'] if dcf else None,
-                'criteria': criteria,
-                'signalScore': breakout.get('signalScore', 0),
-            })
+            hits.append((symbol, pattern, breakout, criteria))
             
-            if (i + 1) % 10 == 0:
-                print(f"Scanned {i + 1}/{len(tickers)}, found {len(results)} patterns")
+            if (i + 1) % 50 == 0:
+                print(f"Scanned {i + 1}/{len(tickers)}, found {len(hits)} patterns")
                 
         except Exception as e:
             print(f"Error scanning {symbol}: {e}")
             continue
     
+    # Fundamentals only for pattern hits, fetched concurrently
+    dcf_values = fetch_many(get_dcf, [hit[0] for hit in hits])
+    
+    for symbol, pattern, breakout, criteria in hits:
+        dcf = dcf_values.get(symbol)
+        results.append({
+            'symbol': symbol,
+            'currentPrice': breakout.get('currentPrice'),
+            'status': breakout.get('status', 'FORMING'),
+            'score': pattern['score'],
+            'patterns': {'cupAndHandle': pattern},
+            'cupDepth': f"{pattern['cupDepthPct']:.1f}",
+            'cupDays': pattern['cupLengthDays'],
+            'handlePullback': f"{pattern['handleDeclinePct']:.1f}",
+            'rsi': breakout.get('rsi'),
+            'volumeRatio': breakout.get('volumeRatio'),
+            'aboveSMA50': criteria.get('aboveSMA50', False),
+            'aboveSMA200': criteria.get('aboveSMA200', False),
+            'macdBullish': criteria.get('macdBullish', False),
+            'buyPoint': breakout.get('buyPoint'),
+            'stopLoss': pattern['handleLow'],
+            'target': pattern['rightRimPrice'] + (pattern['rightRimPrice'] - pattern['bottomPrice']),
+            'dcfValue': dcf['dcfValue'] if dcf else None,
+            'marginOfSafety': dcf['marginOfSafety'] if dcf else None,
+            'criteria': criteria,
+            'signalScore': breakout.get('signalScore', 0),
+        })
+    
     # Sort by score
     results.sort(key=lambda x: (-['STRONG BUY', 'BUY', 'FORMING - NEAR BREAKOUT', 'FORMING', 'WATCH'].index(x['status']) if x['status'] in ['STRONG BUY', 'BUY', 'FORMING - NEAR BREAKOUT', 'FORMING', 'WATCH'] else 5, -x['score']))
     
@@ -508,58 +290,66 @@ def scan_market():
         'results': results
     })
 
+def history_payload(symbol, df, compact=False):
+    """Chart data for /api/history: row objects by default, columns with format=compact."""
+    columns = history_columns(df, decimals=4 if compact else None)
+    
+    # Detect pattern for markers
+    pattern = camel_cup_pattern(detect_cup_and_handle(df))
+    pattern_markers = None
+    if pattern:
+        left_idx = pattern['leftRimIdx']
+        bottom_idx = pattern['bottomIdx']
+        right_idx = pattern['rightRimIdx']
+        dates = columns['date']
+        
+        if 0 <= left_idx < len(dates) and 0 <= right_idx < len(dates):
+            pattern_markers = {
+                'leftRim': {'index': left_idx, 'date': dates[left_idx], 'price': pattern['leftRimPrice']},
+                'bottom': {'index': bottom_idx, 'date': dates[bottom_idx], 'price': pattern['bottomPrice']},
+                'rightRim': {'index': right_idx, 'date': dates[right_idx], 'price': pattern['rightRimPrice']},
+                'handleLow': {'price': pattern['handleLow']},
+                'target': pattern['rightRimPrice'] + (pattern['rightRimPrice'] - pattern['bottomPrice']),
+                'cupDepthPct': pattern['cupDepthPct'],
+                'cupLengthDays': pattern['cupLengthDays'],
+            }
+    
+    payload = {'symbol': symbol, 'totalDays': len(df), 'patternMarkers': pattern_markers}
+    if compact:
+        del columns['date'], columns['index']  # derivable from fullDate / position
+        payload['format'] = 'compact'
+        payload['columns'] = columns
+    else:
+        payload['data'] = column_records(columns)
+    return payload
+
 @app.route('/api/history/<symbol>')
 def history(symbol):
     symbol = symbol.upper()
+    compact = request.args.get('format') == 'compact'
     
     try:
-        ticker = yf.Ticker(symbol)
-        df = ticker.history(period="1y")
+        # Same shared price cache as the scans (one batched download, 15 min TTL)
+        df = download_history([symbol], period="1y").get(symbol)
         
-        if df.empty:
+        if df is None or df.empty:
             return jsonify({'error': 'No data'}), 404
         
-        # Detect pattern for markers
-        pattern = detect_cup_and_handle(df)
-        
-        data = []
-        for i, (date, row) in enumerate(df.iterrows()):
-            data.append({
-                'date': date.strftime('%b %d'),
-                'fullDate': date.strftime('%Y-%m-%d'),
-                'price': float(row['Close']),
-                'volume': int(row['Volume']),
-                'high': float(row['High']),
-                'low': float(row['Low']),
-                'open': float(row['Open']),
-                'index': i
-            })
+        # The encoded body only changes when a new (or updated intraday) bar arrives
+        last = df.iloc[-1]
+        key = (symbol, compact, len(df), str(df.index[-1]), float(last['Close']), float(last['Volume']))
+        body = history_cache.get(key)
+        if body is None:
+            body = json.dumps(history_payload(symbol, df, compact), separators=(',', ':')).encode('utf-8')
+            history_cache.set(key, body)
         
-        # Pattern markers
-        pattern_markers = None
-        if pattern:
-            offset = len(df) - len(data) if len(df) > len(data) else 0
-            left_idx = pattern['leftRimIdx'] - offset
-            bottom_idx = pattern['bottomIdx'] - offset
-            right_idx = pattern['rightRimIdx'] - offset
-            
-            if 0 <= left_idx < len(data) and 0 <= right_idx < len(data):
-                pattern_markers = {
-                    'leftRim': {'index': left_idx, 'date': data[left_idx]['date'], 'price': pattern['leftRimPrice']},
-                    'bottom': {'index': bottom_idx, 'date': data[bottom_idx]['date'], 'price': pattern['bottomPrice']},
-                    'rightRim': {'index': right_idx, 'date': data[right_idx]['date'], 'price': pattern['rightRimPrice']},
-                    'handleLow': {'price': pattern['handleLow']},
-                    'target': pattern['rightRimPrice'] + (pattern['rightRimPrice'] - pattern['bottomPrice']),
-                    'cupDepthPct': pattern['cupDepthPct'],
-                    'cupLengthDays': pattern['cupLengthDays'],
-                }
-        
-        return jsonify({
-            'symbol': symbol,
-            'data': data,
-            'totalDays': len(data),
-            'patternMarkers': pattern_markers
-        })
+        response = Response(mimetype='application/json')
+        if 'gzip' in request.accept_encodings and len(body) > 1024:
+            body = gzip.compress(body, compresslevel=6)
+            response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.set_data(body)
+        return response
     except Exception as e:
         print(f"History error for {symbol}: {e}")
         return jsonify({'error': str(e)}), 500
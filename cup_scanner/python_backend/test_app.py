@@ -0,0 +1,57 @@
+# Tests for the Flask backend's JSON payloads (run: pytest cup_scanner/python_backend)
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app as backend
+
+
+def cup_and_handle_frame():
+    """~200 bars: an advance, a 25%-deep rounded cup, a shallow handle and a breakout on volume."""
+    rng = np.random.default_rng(0)
+    advance = np.linspace(60, 100, 120)
+    cup = 100 - 25 * np.sin(np.linspace(0, np.pi, 70))
+    handle = np.concatenate([np.linspace(100, 95, 6), np.linspace(95, 99, 6)])
+    breakout = np.linspace(100, 104, 4)
+    close = np.concatenate([advance, cup, handle, breakout])
+    close = close + rng.normal(0, 0.2, len(close))
+    volume = np.full(len(close), 1e6)
+    volume[-1] = 3e6
+    return pd.DataFrame({'Open': close, 'High': close * 1.01, 'Low': close * 0.99, 'Close': close,
+                         'Volume': volume}, index=pd.bdate_range('2025-01-01', periods=len(close)))
+
+
+def test_analyze_cup_and_handle_is_json_serializable():
+    pytest.importorskip('pandas_ta')
+    pattern, breakout, criteria = backend.analyze_cup_and_handle(cup_and_handle_frame())
+    assert pattern is not None and breakout is not None
+
+    # What /api/scan and /api/scan/<symbol> hand to jsonify
+    with backend.app.app_context():
+        body = json.loads(backend.jsonify({'pattern': pattern, 'breakout': breakout, 'criteria': criteria}).get_data())
+    assert isinstance(body['breakout']['signalScore'], int)
+    assert isinstance(body['criteria']['rsiAcceptable'], bool)
+
+
+def test_camel_breakout_casts_numpy_scalars():
+    analysis = {
+        'criteria': {name: {'passed': np.bool_(True)} for name in (
+            'breakout_confirmed', 'above_sma50', 'above_sma200', 'rsi_healthy', 'volume_spike', 'macd_bullish')},
+        'rsi': np.float64(61.2),
+        'buy_point': np.float64(100.0),
+        'current_price': np.float64(101.5),
+        'resistance': np.float64(99.9),
+        'sma50': np.float64(95.0),
+        'sma200': None,
+        'volume_ratio': np.float64(2.4),
+        'signal_score': np.int64(72),
+        'status': 'STRONG BUY',
+    }
+    breakout, criteria = backend.camel_breakout(analysis)
+    json.dumps(breakout)
+    assert type(breakout['signalScore']) is int
+    assert type(criteria['rsiAcceptable']) is bool
+    assert breakout['sma200'] is None
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# gunicorn.conf.py
+# Production server settings for wsgi:app (all overridable through the environment)
+
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', '5002')}")
+
+# Import pandas/scipy/matplotlib and the app once in the master, then fork
+preload_app = True
+
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# A cold All-US scan can take the better part of an hour; don't kill the worker running it
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 3600))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # Threads don't survive the fork, so the SCANNER_SCHEDULE warm-up starts in each
+    # worker; a file lock lets only one of them run it
+    from cup_handle_scanner_2 import start_scheduler
+    start_scheduler()
@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+# scanner_core
+# Shared, Flask-free building blocks for the Cup & Handle scanner apps
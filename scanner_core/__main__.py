@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+# scanner_core/__main__.py
+# python -m scanner_core -> headless CLI (scanner_core/cli.py)
+
+import sys
+
+from scanner_core.cli import main
+
+# Guarded: spawned worker processes re-import the main module as __mp_main__
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# scanner_core/adapters.py
+# Reshape the core's snake_case results for each app's existing output format:
+# camelCase for the React frontend (python_backend) and the dcf_calc.py CLI JSON.
+# Values go straight to jsonify, so numpy scalars are cast to Python types here.
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+def camel_cup_pattern(pattern):
+    """detect_cup_and_handle() result -> python_backend 'cupAndHandle' dict."""
+    if pattern is None:
+        return None
+    return {
+        'leftRimIdx': pattern['left_rim_idx'],
+        'rightRimIdx': pattern['right_rim_idx'],
+        'bottomIdx': pattern['bottom_idx'],
+        'leftRimPrice': pattern['left_rim_price'],
+        'rightRimPrice': pattern['right_rim_price'],
+        'bottomPrice': pattern['bottom_price'],
+        'cupDepthPct': pattern['cup_depth_pct'],
+        'cupLengthDays': pattern['cup_length_days'],
+        'handleLow': pattern['handle_low'],
+        'handleDeclinePct': pattern['handle_decline_pct'],
+        'symmetryPct': pattern['symmetry_pct'],
+        'score': pattern['score'],
+    }
+
+
+def camel_breakout(analysis):
+    """check_breakout_criteria() result -> python_backend (breakout, criteria) pair."""
+    if analysis is None:
+        return None, {}
+
+    passed = {name: bool(check['passed']) for name, check in analysis['criteria'].items()}
+    rsi = _float(analysis['rsi'])
+    criteria = {
+        'breakoutConfirmed': passed['breakout_confirmed'],
+        'aboveSMA50': passed['above_sma50'],
+        'aboveSMA200': passed['above_sma200'],
+        'rsiHealthy': passed['rsi_healthy'],
+        'rsiAcceptable': bool(45 <= rsi <= 75) if rsi else False,
+        'volumeSpike': passed['volume_spike'],
+        'macdBullish': passed['macd_bullish'],
+    }
+    breakout = {
+        'buyPoint': _float(analysis['buy_point']),
+        'currentPrice': float(analysis['current_price']),
+        'resistance': _float(analysis['resistance']),
+        'sma50': _float(analysis['sma50']),
+        'sma200': _float(analysis['sma200']),
+        'rsi': rsi,
+        'volumeRatio': float(analysis['volume_ratio']),
+        'criteria': criteria,
+        'signalScore': int(analysis['signal_score']),
+        'status': analysis['status'],
+    }
+    return breakout, criteria
+
+
+def camel_dcf(dcf):
+    """calculate_dcf_value() result -> python_backend DCF dict (None when not valued)."""
+    if dcf is None or dcf.get('status') != 'success':
+        return None
+    margin = dcf['margin']
+    if margin is None:
+        valuation_status = None
+    elif margin > 10:
+        valuation_status = 'Undervalued'
+    elif margin < -10:
+        valuation_status = 'Overvalued'
+    else:
+        valuation_status = 'Fair Value'
+    return {
+        'dcfValue': dcf['dcf_value'],
+        'currentPrice': round(dcf['current_price'], 2) if dcf['current_price'] else None,
+        'marginOfSafety': margin,
+        'estimatedGrowth': dcf['growth_rate'],
+        'discountRate': dcf['discount_rate'],
+        'valuationStatus': valuation_status,
+    }
+
+
+def cli_dcf(dcf):
+    """calculate_dcf_value() result -> the JSON object dcf_calc.py prints."""
+    status = dcf.get('status')
+    if status == 'error':
+        return {'status': 'error', 'error': dcf.get('error')}
+    if status != 'success':
+        return {'status': status, 'dcf_value': dcf.get('dcf_value'), 'margin': None}
+    result = {key: dcf[key] for key in ('status', 'dcf_value', 'fcf', 'fcf_fmt', 'shares')}
+    if dcf['current_price']:
+        result['current_price'] = dcf['current_price']
+        result['margin'] = dcf['margin']
+    return result
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+# scanner_core/analysis.py
+# Per-symbol pattern analysis for scans, run in this process or fanned out to
+# worker processes that all map the same read-only price panel file
+
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from scanner_core.breakout import check_breakout_criteria
+from scanner_core.detectors import detect_ascending_triangle, detect_bull_flag, detect_cup_and_handle
+from scanner_core.metrics import REGISTRY
+from scanner_core.panel import PricePanel, panel_path
+
+MIN_BARS = 150
+ANALYSIS_CHUNK_SIZE = 50
+
+
+def analyze_symbol(symbol, df, rs_rating=None):
+    """
+    Run the pattern detectors and breakout scoring on one symbol's history.
+
+    Returns (analyzed, analysis): analyzed is False when there are too few bars
+    to try, analysis is the result dict for a cup & handle hit and None otherwise.
+    """
+    if df is None or df.empty or len(df) < MIN_BARS:
+        return False, None
+    try:
+        cup_pattern = detect_cup_and_handle(df)
+        if cup_pattern is None:
+            return True, None
+
+        asc_triangle = detect_ascending_triangle(df)
+        bull_flag = detect_bull_flag(df)
+        pattern_count = 1 + bool(asc_triangle) + bool(bull_flag)
+
+        analysis = check_breakout_criteria(df, cup_pattern, asc_triangle, bull_flag)
+        if not analysis:
+            return True, None
+        analysis['symbol'] = symbol
+        analysis['cup_depth'] = round(cup_pattern['cup_depth_pct'], 1)
+        analysis['cup_days'] = cup_pattern['cup_length_days']
+        analysis['handle_pullback'] = round(cup_pattern['handle_decline_pct'], 1)
+        analysis['u_shape'] = cup_pattern['u_shape_score']
+        analysis['symmetry'] = cup_pattern['symmetry_pct']
+        analysis['asc_triangle'] = asc_triangle
+        analysis['bull_flag'] = bull_flag
+        analysis['pattern_count'] = pattern_count
+        analysis['rs_rating'] = rs_rating
+        return True, analysis
+    except Exception:
+        # Silent fail for individual stocks
+        return True, None
+
+
+# ════════════════════════════════════════════════════════════════
+# WORKER PROCESSES (shared memory-mapped panel)
+# ════════════════════════════════════════════════════════════════
+
+_worker_panel = None
+
+
+def _init_worker(path, metrics_dir):
+    global _worker_panel
+    if metrics_dir:
+        REGISTRY.enable_multiprocess(metrics_dir)
+    _worker_panel = PricePanel.open(path)
+
+
+def _analyze_chunk(items):
+    return [(symbol, *analyze_symbol(symbol, _worker_panel[symbol] if symbol in _worker_panel else None, rs_rating))
+            for symbol, rs_rating in items]
+
+
+def analyze_universe(price_data, symbols, rs=None, workers=1, panel_name='analysis', progress_callback=None):
+    """
+    Analyze symbols from price_data ({symbol: frame} or PricePanel).
+
+    Returns (results, analyzed): the hits in `symbols` order and how many symbols
+    had enough history to be tried. With workers > 1 the prices are saved once as
+    a panel file (panel_name in the shared cache) and a spawned process pool maps
+    it read-only: nothing is pickled per symbol, and each extra worker adds only
+    its interpreter, not another copy of the universe.
+    """
+    rs = rs or {}
+    hits = {}
+    analyzed = 0
+
+    if workers <= 1 or len(symbols) <= ANALYSIS_CHUNK_SIZE:
+        for idx, symbol in enumerate(symbols):
+            if progress_callback and idx % 50 == 0:
+                progress_callback(idx, len(symbols), symbol)
+            tried, analysis = analyze_symbol(symbol, price_data.get(symbol), rs.get(symbol))
+            analyzed += tried
+            if analysis:
+                hits[symbol] = analysis
+        return [hits[s] for s in symbols if s in hits], analyzed
+
+    panel = price_data if isinstance(price_data, PricePanel) else PricePanel.from_frames(price_data)
+    path = panel.save(panel_path(panel_name))
+    chunks = [[(symbol, rs.get(symbol)) for symbol in symbols[i:i + ANALYSIS_CHUNK_SIZE]]
+              for i in range(0, len(symbols), ANALYSIS_CHUNK_SIZE)]
+    print(f"Analyzing {len(symbols)} symbols on {workers} worker processes ({panel.nbytes / 1e6:.1f} MB panel mapped)")
+
+    done = 0
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=context,
+                             initializer=_init_worker, initargs=(path, REGISTRY.shared_dir)) as pool:
+        pending = {pool.submit(_analyze_chunk, chunk) for chunk in chunks}
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                for symbol, tried, analysis in future.result():
+                    analyzed += tried
+                    done += 1
+                    if analysis:
+                        hits[symbol] = analysis
+            if progress_callback:
+                progress_callback(done, len(symbols), symbol)
+    return [hits[s] for s in symbols if s in hits], analyzed
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+# scanner_core/breakout.py
+# Breakout validation and signal scoring for a detected cup & handle
+
+import pandas as pd
+
+from scanner_core.detectors import detect_golden_cross
+from scanner_core.indicators import add_indicators
+from scanner_core.metrics import timed
+
+
+@timed('breakout_scoring')
+def check_breakout_criteria(df, pattern, asc_triangle=None, bull_flag=None):
+    """
+    Validate breakout with comprehensive criteria.
+    """
+    if pattern is None:
+        return None
+
+    last = df.iloc[-1]
+    prev = df.iloc[-2] if len(df) > 1 else last
+
+    resistance = pattern['right_rim_price']
+    buy_point = resistance * 1.001
+    current_price = last['Close']
+
+    # Calculate indicators
+    df_calc = add_indicators(df)
+
+    last = df_calc.iloc[-1]
+    prev = df_calc.iloc[-2] if len(df_calc) > 1 else last
+
+    # Get values
+    sma50 = last['SMA50'] if not pd.isna(last.get('SMA50')) else None
+    sma200 = last['SMA200'] if not pd.isna(last.get('SMA200')) else None
+    rsi = last['RSI'] if not pd.isna(last.get('RSI')) else None
+    adx = last['ADX'] if not pd.isna(last.get('ADX')) else None
+    macd_val = last['MACD'] if not pd.isna(last.get('MACD')) else None
+    macd_sig = last['MACD_signal'] if not pd.isna(last.get('MACD_signal')) else None
+
+    # Volume analysis
+    handle_start = pattern['right_rim_idx']
+    avg_20_vol = df['Volume'].rolling(20).mean().iloc[-1]
+    current_vol = last['Volume']
+    vol_ratio = current_vol / avg_20_vol if avg_20_vol > 0 else 1
+    
+    # Volume requirement: 2x average for breakout
+    volume_requirement = 2.0
+    volume_spike = vol_ratio >= volume_requirement
+
+    # Handle volume contraction
+    handle_vol_contraction = pattern.get('handle_vol_contraction', False)
+
+    # Calculate stop loss and target
+    handle_low = pattern['handle_low']
+    stop_loss = handle_low * 0.97
+    
+    cup_height = pattern['right_rim_price'] - pattern['bottom_price']
+    target = buy_point + cup_height
+    
+    risk = buy_point - stop_loss
+    reward = target - buy_point
+    rr_ratio = reward / risk if risk > 0 else 0
+
+    # Criteria checks with detailed info
+    criteria = {
+        'breakout_confirmed': {
+            'passed': current_price > buy_point,
+            'value': f"${current_price:.2f}",
+            'requirement': f">${buy_point:.2f}",
+        },
+        'above_sma50': {
+            'passed': current_price > sma50 if sma50 else False,
+            'value': f"${sma50:.2f}" if sma50 else 'N/A',
+        },
+        'above_sma200': {
+            'passed': current_price > sma200 if sma200 else False,
+            'value': f"${sma200:.2f}" if sma200 else 'N/A',
+        },
+        'volume_spike': {
+            'passed': volume_spike,
+            'value': f"{vol_ratio:.2f}x",
+            'requirement': f"(req: {volume_requirement}x)",
+        },
+        'handle_vol_contraction': {
+            'passed': handle_vol_contraction,
+            'value': 'Yes' if handle_vol_contraction else 'No',
+        },
+        'macd_bullish': {
+            'passed': (macd_val > macd_sig) if (macd_val and macd_sig) else False,
+            'value': f"{macd_val:.3f}" if macd_val else 'N/A',
+        },
+        'adx_strong': {
+            'passed': adx > 25 if adx else False,
+            'value': f"{adx:.1f}" if adx else 'N/A',
+            'requirement': '(>25)',
+        },
+        'rsi_healthy': {
+            'passed': 50 <= rsi <= 70 if rsi else False,
+            'value': f"{rsi:.1f}" if rsi else 'N/A',
+            'requirement': '(50-70)',
+        },
+    }
+
+    # Detect golden cross
+    golden_cross_info = detect_golden_cross(df, lookback_days=20)
+    
+    # Signal score
+    signal_score = sum([
+        criteria['breakout_confirmed']['passed'] * 25,
+        criteria['above_sma50']['passed'] * 15,
+        criteria['above_sma200']['passed'] * 15,
+        criteria['rsi_healthy']['passed'] * 10,
+        criteria['volume_spike']['passed'] * 15,
+        criteria['macd_bullish']['passed'] * 10,
+        criteria['adx_strong']['passed'] * 5,
+        criteria['handle_vol_contraction']['passed'] * 5,
+    ])
+    
+    # Bonus for recent golden cross
+    if golden_cross_info and golden_cross_info['golden_cross']:
+        signal_score += 5
+
+    # Status
+    if criteria['breakout_confirmed']['passed'] and criteria['above_sma50']['passed'] and criteria['above_sma200']['passed']:
+        if signal_score >= 75:
+            status = "STRONG BUY"
+        elif signal_score >= 55:
+            status = "BUY"
+        else:
+            status = "WATCH"
+    elif not criteria['breakout_confirmed']['passed'] and current_price > resistance * 0.97:
+        status = "FORMING - NEAR BREAKOUT"
+    elif not criteria['breakout_confirmed']['passed']:
+        status = "FORMING"
+    else:
+        status = "WATCH"
+
+    return {
+        'buy_point': round(buy_point, 2),
+        'current_price': round(current_price, 2),
+        'resistance': round(resistance, 2),
+        'sma50': round(sma50, 2) if sma50 else None,
+        'sma200': round(sma200, 2) if sma200 else None,
+        'rsi': round(rsi, 1) if rsi else None,
+        'adx': round(adx, 1) if adx else None,
+        'volume_ratio': round(vol_ratio, 2),
+        'stop_loss': round(stop_loss, 2),
+        'target': round(target, 2),
+        'rr_ratio': round(rr_ratio, 2),
+        'criteria': criteria,
+        'signal_score': signal_score,
+        'status': status,
+        'pattern': pattern,
+        'golden_cross': golden_cross_info,
+    }
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+# scanner_core/cache.py
+# On-disk caches shared by every process (gunicorn workers, CLI runs) using the same directory
+
+import fcntl
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from scanner_core.metrics import REGISTRY
+
+CACHE_REQUESTS = REGISTRY.counter(
+    'scanner_cache_requests_total', 'Disk cache lookups by namespace and result.', ('namespace', 'result'))
+
+_cache_dir = os.environ.get('SCANNER_CACHE_DIR') or os.path.join(
+    os.path.expanduser('~'), '.cache', 'cup_handle_scanner')
+
+
+def get_cache_dir():
+    return _cache_dir
+
+
+def set_cache_dir(path):
+    """Point every cache in this process at a different directory (CLI --cache-dir)."""
+    global _cache_dir
+    _cache_dir = os.path.abspath(os.path.expanduser(path))
+
+
+def _safe_name(key):
+    """Readable, filesystem-safe file name for a cache key."""
+    text = key if isinstance(key, str) else repr(key)
+    slug = re.sub(r'[^A-Za-z0-9._-]+', '_', text)[:80]
+    digest = hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+    return f"{slug}-{digest}"
+
+
+def _atomic_write(path, payload):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class DiskCache:
+    """
+    Pickle-per-key cache under <cache dir>/<namespace>/.
+
+    Entries are written atomically (temp file + rename) so concurrent readers in
+    other processes never see a partial file. Expiry is based on file mtime.
+    """
+
+    def __init__(self, namespace, ttl=None):
+        self.namespace = namespace
+        self.ttl = ttl
+
+    @property
+    def directory(self):
+        return os.path.join(get_cache_dir(), self.namespace)
+
+    def path(self, key):
+        return os.path.join(self.directory, _safe_name(key) + '.pkl')
+
+    def age(self, key):
+        """Seconds since the entry was written, or None if missing."""
+        try:
+            return time.time() - os.path.getmtime(self.path(key))
+        except OSError:
+            return None
+
+    def get(self, key, default=None, max_age=None):
+        max_age = self.ttl if max_age is None else max_age
+        path = self.path(key)
+        try:
+            if max_age is not None and time.time() - os.path.getmtime(path) > max_age:
+                CACHE_REQUESTS.inc(namespace=self.namespace, result='expired')
+                return default
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            CACHE_REQUESTS.inc(namespace=self.namespace, result='miss')
+            return default
+        except Exception as e:
+            print(f"Cache read error ({self.namespace}/{key}): {e}")
+            CACHE_REQUESTS.inc(namespace=self.namespace, result='error')
+            return default
+        CACHE_REQUESTS.inc(namespace=self.namespace, result='hit')
+        return value
+
+    def set(self, key, value):
+        try:
+            _atomic_write(self.path(key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            print(f"Cache write error ({self.namespace}/{key}): {e}")
+
+    def delete(self, key):
+        try:
+            os.unlink(self.path(key))
+        except OSError:
+            pass
+
+
+@contextmanager
+def file_lock(name, blocking=True):
+    """
+    Cross-process exclusive lock on <cache dir>/locks/<name>.lock.
+
+    Used so that only one worker runs an expensive job (e.g. a market scan)
+    while the others wait and then read its cached result.
+    With blocking=False it yields False at once if another process holds the
+    lock (and True once acquired), instead of waiting.
+    """
+    lock_dir = os.path.join(get_cache_dir(), 'locks')
+    os.makedirs(lock_dir, exist_ok=True)
+    with open(os.path.join(lock_dir, _safe_name(name) + '.lock'), 'w') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def disk_cached(namespace, ttl, key=None, when=None, stale_on_error=False):
+    """
+    Cache a function's return value on disk.
+
+    key:  callable(*args, **kwargs) -> cache key (default: repr of the arguments)
+    when: callable(result) -> bool deciding whether a result is worth caching
+          (e.g. skip transient network errors)
+    stale_on_error: when a refresh raises or returns an uncacheable result (a
+          provider is down or failing fast), return the expired cached value
+          instead, if there is one
+    The undecorated function stays reachable as ``func.uncached``.
+    """
+    cache = DiskCache(namespace, ttl=ttl)
+    _missing = object()
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            cache_key = key(*args, **kwargs) if key else repr((args, sorted(kwargs.items())))
+            value = cache.get(cache_key, default=_missing)
+            if value is not _missing:
+                return value
+            try:
+                value = func(*args, **kwargs)
+            except Exception:
+                stale = cache.get(cache_key, default=_missing, max_age=float('inf')) if stale_on_error else _missing
+                if stale is _missing:
+                    raise
+                return stale
+            if when is None or when(value):
+                cache.set(cache_key, value)
+            elif stale_on_error:
+                stale = cache.get(cache_key, default=_missing, max_age=float('inf'))
+                if stale is not _missing:
+                    return stale
+            return value
+        wrapper.uncached = func
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+class ScanStore:
+    """Latest scan results per market, shared by all workers through the disk cache."""
+
+    def __init__(self, ttl=None):
+        self.cache = DiskCache('scans', ttl=ttl)
+
+    def save(self, market, results, meta=None):
+        meta = dict(meta or {})
+        meta.setdefault('market', market)
+        meta.setdefault('saved_at', time.time())
+        self.cache.set(market, {'results': results, 'meta': meta})
+
+    def load(self, market, max_age=None):
+        """Return {'results': [...], 'meta': {...}} or None if missing/expired."""
+        return self.cache.get(market, max_age=max_age)
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+# scanner_core/cli.py
+# Headless command line for cron and batch jobs - no Flask, no browser:
+#
+#     python -m scanner_core scan --market nasdaq --workers 4 --format parquet -o nasdaq.parquet
+#     python -m scanner_core scan --tickers watchlist.txt --format csv -o -
+#     python -m scanner_core export --market sp500 --format ndjson -o sp500.ndjson
+#     python -m scanner_core shard submit --market all --shards 4 --store    (coordinator)
+#     python -m scanner_core shard worker                                    (on each node)
+#
+# Results go to the output file (or stdout with -o -); progress, logs and the
+# throughput summary go to stderr.
+
+import argparse
+import contextlib
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+# Modules are imported inside the commands, so --help and usage errors return at once
+FORMATS = ('csv', 'ndjson', 'parquet')
+
+
+def read_tickers(path):
+    """Symbols from a file ('-' for stdin): whitespace/comma separated, '#' starts a comment."""
+    handle = sys.stdin if path == '-' else open(path)
+    try:
+        text = '\n'.join(line.split('#', 1)[0] for line in handle)
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+    return list(dict.fromkeys(s.upper() for s in re.split(r'[\s,]+', text) if s))
+
+
+def _default_output(label, fmt):
+    return f"scan-{label}-{datetime.now().strftime('%Y%m%d-%H%M')}.{fmt}"
+
+
+def _print_summary(label, stats, seconds, log):
+    from scanner_core import metrics
+
+    rate = stats.get('requested', 0) / seconds if seconds else 0
+    log(f"Scanned {label}: {stats.get('requested', 0)} requested, {stats.get('downloaded', 0)} downloaded, "
+        f"{stats.get('prescreened', 0)} prescreened, {stats.get('analyzed', 0)} analyzed, "
+        f"{stats.get('matched', 0)} matched")
+    log(f"Time: {seconds:.1f}s ({rate:.1f} symbols/s)")
+    stages = sorted(((key[0], series) for key, series in metrics.STAGE_SECONDS.snapshot().items()),
+                    key=lambda item: -item[1]['sum'])
+    if stages:
+        log("Stages (in this process; nested stages overlap):")
+        for stage, series in stages[:12]:
+            log(f"  {stage:<24} {series['sum']:8.2f}s  x{series['count']}")
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def _scan_tickers(args):
+    """(tickers, label) for --tickers FILE or --market, after --limit."""
+    from scanner_core.universe import SP500_TICKERS, market_tickers
+
+    if args.tickers:
+        tickers, label = read_tickers(args.tickers), os.path.splitext(os.path.basename(args.tickers))[0] or 'stdin'
+    else:
+        with contextlib.redirect_stdout(sys.stderr):
+            tickers = market_tickers(args.market, args.min_market_cap, fallback=SP500_TICKERS)
+        label = args.market
+    if args.limit:
+        tickers = tickers[:args.limit]
+    return tickers, label
+
+
+def _finish_scan(args, label, tickers, results, stats, seconds):
+    """--store the scan if asked, write the results file and print the summary."""
+    from scanner_core.cache import ScanStore
+    from scanner_core.events import EventLog
+    from scanner_core.export import write_export
+    from scanner_core.scan import record_scan
+    from scanner_core.universe import MARKET_NAMES
+
+    if args.store and not args.tickers:
+        meta = {
+            'market': args.market,
+            'market_name': MARKET_NAMES.get(args.market, args.market),
+            'scanned_at': datetime.now().strftime("%Y-%m-%d %H:%M"),
+            'ticker_count': len(tickers),
+            'duration_s': round(seconds, 1),
+            'min_rs': args.min_rs,
+            'stats': stats,
+        }
+        with contextlib.redirect_stdout(sys.stderr):
+            record_scan(ScanStore(), args.market, results, meta, events=EventLog('scan_events'))
+        log(f"Stored as the current {args.market} scan (served by /scan and /api/scan)")
+    elif args.store:
+        log("--store only applies to --market scans; a ticker file scan is not stored")
+
+    output = args.output or _default_output(label, args.format)
+    written = write_export(results, args.format, output)
+    _print_summary(label, stats, seconds, log)
+    if output != '-':
+        log(f"Wrote {len(results)} results to {output} ({written / 1024:.1f} KB {args.format})")
+
+
+def cmd_scan(args):
+    from scanner_core.panel import remove_panel
+    from scanner_core.prescreen import prescreen_config_from_env
+    from scanner_core.scan import scan_for_patterns
+
+    tickers, label = _scan_tickers(args)
+    if not tickers:
+        log("No tickers to scan")
+        return 1
+
+    def progress(current, total, symbol):
+        if not args.quiet and current % 50 == 0:
+            log(f"Progress: {current}/{total} ({symbol})")
+
+    log(f"Scanning {len(tickers)} {label} tickers on {args.workers} worker process(es)...")
+    stats = {}
+    started = time.perf_counter()
+    # Per-process panel, so a cron run and a manual run of one market never map each other's files
+    panel_name = f'cli-{label}-{os.getpid()}'
+    # The pipeline prints as it goes; keep stdout for the results
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            results = scan_for_patterns(tickers=tickers, progress_callback=progress, min_rs=args.min_rs, stats=stats,
+                                        prescreen_config=None if args.no_prescreen else prescreen_config_from_env(),
+                                        compact=args.compact, workers=args.workers, panel_name=panel_name)
+    finally:
+        remove_panel(panel_name)
+    seconds = time.perf_counter() - started
+
+    _finish_scan(args, label, tickers, results, stats, seconds)
+    return 0
+
+
+def cmd_export(args):
+    from scanner_core.cache import ScanStore
+    from scanner_core.export import write_export
+
+    stored = ScanStore().load(args.market, max_age=float('inf'))
+    if not stored:
+        print(f"No stored scan for {args.market}; run `python -m scanner_core scan --market {args.market} --store`",
+              file=sys.stderr)
+        return 1
+    output = args.output or _default_output(args.market, args.format)
+    written = write_export(stored['results'], args.format, output)
+    if output != '-':
+        print(f"Wrote {len(stored['results'])} {args.market} results (scanned {stored['meta'].get('scanned_at')}) "
+              f"to {output} ({written / 1024:.1f} KB)", file=sys.stderr)
+    return 0
+
+
+def cmd_shard_submit(args):
+    from scanner_core.prescreen import prescreen_config_from_env
+    from scanner_core.shard import WorkQueue, coordinate
+
+    tickers, label = _scan_tickers(args)
+    if not tickers:
+        log("No tickers to scan")
+        return 1
+    queue = WorkQueue(args.queue)
+    prescreen_config = None if args.no_prescreen else prescreen_config_from_env()
+    if args.no_wait:
+        job_id = queue.submit(tickers, args.shards, label=label, params={'prescreen': prescreen_config})
+        log(f"Queued {len(tickers)} {label} tickers as job {job_id} on {queue.path}")
+        print(job_id)
+        return 0
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            results, stats = coordinate(queue, tickers, args.shards, label=label, min_rs=args.min_rs,
+                                        prescreen_config=prescreen_config, work=args.work, workers=args.workers,
+                                        compact=args.compact, timeout=args.timeout or None)
+        except (RuntimeError, TimeoutError) as e:
+            log(str(e))
+            return 1
+    seconds = time.perf_counter() - started
+    log(f"Shard times: {', '.join(f'{s:.1f}s' for s in stats['shard_seconds'])}")
+    _finish_scan(args, label, tickers, results, stats, seconds)
+    return 0
+
+
+def cmd_shard_worker(args):
+    from scanner_core.shard import WorkQueue, run_worker
+
+    queue = WorkQueue(args.queue)
+    log(f"Worker on {queue.path}" + (f" (job {args.job})" if args.job else ''))
+    with contextlib.redirect_stdout(sys.stderr):
+        done = run_worker(queue, job_id=args.job, workers=args.workers, compact=args.compact,
+                          exit_when_idle=args.exit_when_idle)
+    log(f"Queue empty after {done} shard(s)")
+    return 0
+
+
+def cmd_shard_status(args):
+    from scanner_core.shard import WorkQueue
+
+    queue = WorkQueue(args.queue)
+    if not queue.job(args.job):
+        log(f"No job {args.job} on {queue.path}")
+        return 1
+    state = queue.status(args.job)
+    print(f"{args.job}: {state['done']}/{state['total']} done, {state['running']} running, "
+          f"{state['pending']} pending, {state['failed']} failed; workers: {', '.join(state['workers']) or '-'}")
+    return 0 if state['done'] == state['total'] else 2
+
+
+def cmd_shard_collect(args):
+    from scanner_core.export import write_export
+    from scanner_core.shard import WorkQueue, merge_shards
+
+    queue = WorkQueue(args.queue)
+    state = queue.status(args.job)
+    if not state['total'] or state['done'] < state['total']:
+        log(f"Job {args.job}: {state['done']}/{state['total']} shards done; nothing to collect yet")
+        return 1
+    results, stats = merge_shards(queue.results(args.job), min_rs=args.min_rs)
+    output = args.output or _default_output(args.job, args.format)
+    written = write_export(results, args.format, output)
+    if output != '-':
+        log(f"Merged {stats['shards']} shards: {len(results)} results to {output} ({written / 1024:.1f} KB)")
+    return 0
+
+
+def _add_scan_arguments(parser, markets):
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--market', choices=markets, default='sp500')
+    source.add_argument('--tickers', metavar='FILE', help="symbols to scan instead of a market ('-' for stdin)")
+    parser.add_argument('--min-market-cap', type=float, default=1e9, help='for nasdaq/nyse/all (default 1e9)')
+    parser.add_argument('--limit', type=int, default=0, help='scan only the first N tickers (largest first)')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('SCAN_WORKERS', 0)) or os.cpu_count() or 1,
+                        help='detector processes (default: $SCAN_WORKERS or the CPU count)')
+    parser.add_argument('--compact', action='store_true', default=os.environ.get('SCAN_COMPACT_PANEL') == '1',
+                        help='hold prices in one float32 panel (less memory on large universes)')
+    parser.add_argument('--min-rs', type=int, default=int(os.environ.get('SCAN_MIN_RS', 0)),
+                        help='skip symbols with a lower relative strength rating (1-99)')
+    parser.add_argument('--no-prescreen', action='store_true', help='run the detectors on every downloaded symbol')
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('-o', '--output', help="output file ('-' for stdout; default scan-<market>-<time>.<format>)")
+    parser.add_argument('--store', action='store_true',
+                        help='also save as the current market scan for the web app (and record change events)')
+
+
+def build_parser():
+    markets = ('sp500', 'nasdaq', 'nyse', 'all')  # scanner_core.universe.MARKETS, without importing it
+    parser = argparse.ArgumentParser(prog='python -m scanner_core', description='Headless Cup & Handle scanner')
+    parser.add_argument('--cache-dir', help='shared cache directory (default: $SCANNER_CACHE_DIR or '
+                                            '~/.cache/cup_handle_scanner)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    scan = commands.add_parser('scan', help='run a scan and write the results to a file')
+    _add_scan_arguments(scan, markets)
+    scan.add_argument('-q', '--quiet', action='store_true', help='no per-50-symbol progress lines')
+    scan.set_defaults(func=cmd_scan)
+
+    export = commands.add_parser('export', help="write a market's stored scan to a file")
+    export.add_argument('--market', choices=markets, default='sp500')
+    export.add_argument('--format', choices=FORMATS, default='csv')
+    export.add_argument('-o', '--output', help="output file ('-' for stdout)")
+    export.set_defaults(func=cmd_export)
+
+    shard = commands.add_parser('shard', help='split a scan into shards for worker nodes on a shared queue')
+    actions = shard.add_subparsers(dest='action', required=True)
+    queue_help = 'queue database shared by every node (default: <cache dir>/shards/queue.sqlite)'
+
+    submit = actions.add_parser('submit', help='queue a scan as shards, wait for the workers and merge the results')
+    _add_scan_arguments(submit, markets)
+    submit.add_argument('--shards', type=int, default=4, help='number of shards (default 4; about one per node)')
+    submit.add_argument('--queue', help=queue_help)
+    submit.add_argument('--work', action='store_true', help='also scan shards on this node while waiting')
+    submit.add_argument('--timeout', type=float, default=0, help='give up after this many seconds')
+    submit.add_argument('--no-wait', action='store_true',
+                        help='only queue the job and print its id (merge later with `shard collect`)')
+    submit.set_defaults(func=cmd_shard_submit)
+
+    worker = actions.add_parser('worker', help='claim and scan shards from the queue')
+    worker.add_argument('--queue', help=queue_help)
+    worker.add_argument('--job', help='only shards of this job')
+    worker.add_argument('--workers', type=int, default=int(os.environ.get('SCAN_WORKERS', 0)) or os.cpu_count() or 1,
+                        help='detector processes per shard (default: $SCAN_WORKERS or the CPU count)')
+    worker.add_argument('--compact', action='store_true', default=os.environ.get('SCAN_COMPACT_PANEL') == '1')
+    worker.add_argument('--exit-when-idle', action='store_true', help='stop when no shard is left instead of polling')
+    worker.set_defaults(func=cmd_shard_worker)
+
+    status = actions.add_parser('status', help="a job's shard counts (exit code 0 once every shard is done)")
+    status.add_argument('job')
+    status.add_argument('--queue', help=queue_help)
+    status.set_defaults(func=cmd_shard_status)
+
+    collect = actions.add_parser('collect', help="merge a finished job's shards into one results file")
+    collect.add_argument('job')
+    collect.add_argument('--queue', help=queue_help)
+    collect.add_argument('--min-rs', type=int, default=0, help='drop hits below this RS rating (1-99)')
+    collect.add_argument('--format', choices=FORMATS, default='csv')
+    collect.add_argument('-o', '--output', help="output file ('-' for stdout)")
+    collect.set_defaults(func=cmd_shard_collect)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, 'format', None) == 'parquet':
+        # Fail before the scan, not after it when the results are written
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError as e:
+            parser.error(f"--format parquet needs pyarrow (pip install pyarrow): {e}")
+    if args.cache_dir:
+        # Environment too, so spawned worker processes resolve the same directory
+        os.environ['SCANNER_CACHE_DIR'] = os.path.abspath(os.path.expanduser(args.cache_dir))
+        from scanner_core.cache import set_cache_dir
+        set_cache_dir(args.cache_dir)
+    try:
+        return args.func(args)
+    except ImportError as e:
+        print(f"Missing dependency: {e}", file=sys.stderr)
+        return 1
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+# scanner_core/dcf.py
+# Discounted-cash-flow valuation, split into a cached fundamentals fetch and a
+# pure valuation step so re-pricing with other assumptions never hits Yahoo.
+
+import numpy as np
+
+from scanner_core.cache import disk_cached
+from scanner_core.metrics import timed
+from scanner_core.providers import provider_call
+
+# Sensitivity grid (growth x discount x terminal growth), base case in the middle
+SENSITIVITY_GROWTH_RATES = (0.04, 0.06, 0.08, 0.10, 0.12, 0.14, 0.16)
+SENSITIVITY_DISCOUNT_RATES = (0.08, 0.09, 0.10, 0.11, 0.12)
+SENSITIVITY_TERMINAL_RATES = (0.02, 0.03, 0.04)
+
+# Monte Carlo valuation
+MONTE_CARLO_SIMULATIONS = 20000
+MONTE_CARLO_PERCENTILES = (10, 25, 50, 75, 90)
+
+# dcf_value for a company with negative free cash flow (no meaningful DCF)
+NEGATIVE_FCF = '-FCF'
+
+
+def format_market_cap(value):
+    """Format market cap in human readable form."""
+    if not value or value == 0:
+        return 'N/A'
+    if value >= 1e12:
+        return f"${value/1e12:.2f}T"
+    elif value >= 1e9:
+        return f"${value/1e9:.2f}B"
+    elif value >= 1e6:
+        return f"${value/1e6:.2f}M"
+    else:
+        return f"${value:,.0f}"
+
+
+def _first_row(cashflow, row_names):
+    for row_name in row_names:
+        if row_name in cashflow.index:
+            return cashflow.loc[row_name]
+    return None
+
+
+@disk_cached('fundamentals', ttl=24 * 3600, key=lambda symbol: symbol,
+             when=lambda f: f.get('status') != 'error', stale_on_error=True)
+@timed('fundamentals')
+def get_fundamentals(symbol):
+    """
+    Fetch the DCF inputs for a symbol: latest free cash flow (or OCF - CapEx),
+    up to 4 years of FCF history, shares outstanding and current price.
+    status is 'ok', 'no_data', 'no_fcf' or 'error'.
+    """
+    import yfinance as yf
+    try:
+        ticker = yf.Ticker(symbol)
+        with provider_call('yahoo'):
+            info = ticker.info
+        with provider_call('yahoo'):
+            cashflow = ticker.cashflow
+        if cashflow is None or cashflow.empty:
+            return {'status': 'no_data'}
+
+        fcf = None
+        fcf_history = []
+        fcf_row = _first_row(cashflow, ['Free Cash Flow', 'FreeCashFlow'])
+        if fcf_row is not None:
+            fcf = fcf_row.iloc[0] if len(fcf_row) > 0 else None
+            fcf_history = fcf_row.tolist()[:4]  # Last 4 years
+
+        if fcf is None:
+            # Try to calculate: Operating Cash Flow - CapEx
+            ocf = _first_row(cashflow, ['Operating Cash Flow', 'Total Cash From Operating Activities'])
+            capex = _first_row(cashflow, ['Capital Expenditure', 'Capital Expenditures'])
+            if ocf is None or capex is None:
+                return {'status': 'no_fcf'}
+            fcf = ocf.iloc[0] - abs(capex.iloc[0])
+
+        return {
+            'status': 'ok',
+            'fcf': float(fcf),
+            'fcf_history': fcf_history,
+            'shares': info.get('sharesOutstanding', None),
+            'current_price': info.get('currentPrice', info.get('regularMarketPrice', None)),
+        }
+    except Exception as e:
+        print(f"Fundamentals error for {symbol}: {e}")
+        return {'status': 'error', 'error': str(e)}
+
+
+def _unvalued(fundamentals):
+    """Result dict explaining why fundamentals can't be valued, or None if they can."""
+    status = fundamentals.get('status')
+    if status != 'ok':
+        result = {'status': status, 'dcf_value': None, 'margin': None}
+        if 'error' in fundamentals:
+            result['error'] = fundamentals['error']
+        return result
+
+    fcf = fundamentals['fcf']
+    if fcf is None or fcf <= 0:
+        return {'status': 'negative_fcf', 'dcf_value': NEGATIVE_FCF, 'margin': None, 'fcf': fcf}
+
+    if not fundamentals.get('shares'):
+        return {'status': 'no_shares', 'dcf_value': None, 'margin': None}
+    return None
+
+
+def intrinsic_values(fcf, shares, growth_rate, discount_rate, terminal_growth, years=5):
+    """
+    Two-stage DCF value per share, vectorized: the rates may be numpy arrays of
+    any mutually broadcastable shapes and the result has their broadcast shape.
+    Combinations with discount_rate <= terminal_growth have no finite value (NaN).
+    """
+    g = np.asarray(growth_rate, dtype=float)[..., None]
+    r = np.asarray(discount_rate, dtype=float)[..., None]
+    t = np.asarray(terminal_growth, dtype=float)
+    year = np.arange(1, years + 1)
+
+    # Explicit years: FCF grown at g and discounted at r, summed over the last axis
+    stage_one = fcf * (((1 + g) / (1 + r)) ** year).sum(axis=-1)
+
+    # Terminal value on the year-N cash flow, discounted back N years
+    g, r = g[..., 0], r[..., 0]
+    spread = np.where(r > t, r - t, np.nan)
+    terminal = fcf * (1 + g) ** years * (1 + t) / spread / (1 + r) ** years
+
+    return (stage_one + terminal) / shares
+
+
+def dcf_valuation(fundamentals, growth_rate=0.10, terminal_growth=0.03, discount_rate=0.10, years=5):
+    """
+    Value fundamentals from get_fundamentals() with a two-stage DCF:
+    `years` of growth at growth_rate, then a Gordon-growth terminal value.
+    """
+    unvalued = _unvalued(fundamentals)
+    if unvalued:
+        return unvalued
+
+    fcf = fundamentals['fcf']
+    shares = fundamentals['shares']
+    intrinsic_per_share = float(intrinsic_values(fcf, shares, growth_rate, discount_rate, terminal_growth, years))
+
+    # Margin of safety (None without a current price)
+    current_price = fundamentals.get('current_price')
+    margin_of_safety = None
+    if current_price:
+        margin_of_safety = round(((intrinsic_per_share - current_price) / current_price) * 100, 1)
+
+    return {
+        'status': 'success',
+        'dcf_value': round(intrinsic_per_share, 2),
+        'margin': margin_of_safety,
+        'fcf': fcf,
+        'fcf_fmt': format_market_cap(fcf),
+        'shares': shares,
+        'current_price': current_price,
+        'growth_rate': growth_rate * 100,
+        'discount_rate': discount_rate * 100,
+        'terminal_growth': terminal_growth * 100,
+        'fcf_history': fundamentals.get('fcf_history', []),
+    }
+
+
+def dcf_sensitivity(fundamentals, growth_rates=SENSITIVITY_GROWTH_RATES,
+                    discount_rates=SENSITIVITY_DISCOUNT_RATES,
+                    terminal_rates=SENSITIVITY_TERMINAL_RATES, years=5):
+    """
+    Intrinsic value per share over the full growth x discount x terminal grid,
+    computed in one numpy broadcast from the cached FCF and share count.
+
+    'values' is nested [terminal][growth][discount] (rates as percentages);
+    min/median/max summarize every finite scenario.
+    """
+    unvalued = _unvalued(fundamentals)
+    if unvalued:
+        return unvalued
+
+    grid = intrinsic_values(fundamentals['fcf'], fundamentals['shares'],
+                            np.asarray(growth_rates)[None, :, None],
+                            np.asarray(discount_rates)[None, None, :],
+                            np.asarray(terminal_rates)[:, None, None], years)
+    finite = grid[np.isfinite(grid)]
+    if finite.size == 0:
+        return {'status': 'no_finite_values', 'dcf_value': None, 'margin': None}
+
+    values = np.where(np.isfinite(grid), np.round(grid, 2), np.nan)
+    return {
+        'status': 'success',
+        'growth_rates': [round(g * 100, 2) for g in growth_rates],
+        'discount_rates': [round(r * 100, 2) for r in discount_rates],
+        'terminal_rates': [round(t * 100, 2) for t in terminal_rates],
+        'values': [[[None if np.isnan(v) else float(v) for v in row] for row in plane] for plane in values],
+        'min': round(float(finite.min()), 2),
+        'median': round(float(np.median(finite)), 2),
+        'max': round(float(finite.max()), 2),
+        'current_price': fundamentals.get('current_price'),
+    }
+
+
+def fit_rate_distributions(fcf_history):
+    """
+    Distribution parameters for growth / discount / terminal rates from FCF history
+    (newest first, as returned by Yahoo).
+
+    Growth is centred on the median year-over-year FCF growth; its spread and the
+    discount rate's risk premium widen with how volatile the history is. Short or
+    sign-flipping histories fall back to the base-case assumptions.
+    """
+    history = np.asarray([v for v in (fcf_history or []) if v is not None], dtype=float)
+    history = history[np.isfinite(history)][::-1]  # oldest -> newest
+    with np.errstate(divide='ignore', invalid='ignore'):
+        yoy = history[1:] / history[:-1] - 1 if len(history) > 1 else np.array([])
+    yoy = yoy[(history[:-1] > 0) & np.isfinite(yoy)] if len(yoy) else yoy
+
+    if len(yoy) >= 2:
+        growth_mean = float(np.clip(np.median(yoy), -0.05, 0.20))
+        growth_std = float(np.clip(np.std(yoy), 0.02, 0.10))
+    else:
+        growth_mean, growth_std = 0.08, 0.05
+
+    volatility = float(np.std(history) / abs(np.mean(history))) if len(history) > 1 and np.mean(history) else 0.5
+    discount_mean = float(np.clip(0.09 + 0.05 * min(volatility, 1.0), 0.08, 0.14))
+
+    return {
+        'growth_mean': growth_mean,
+        'growth_std': growth_std,
+        'discount_mean': discount_mean,
+        'discount_std': 0.01,
+        'terminal_low': 0.015,
+        'terminal_mode': 0.025,
+        'terminal_high': 0.035,
+    }
+
+
+def dcf_monte_carlo(fundamentals, simulations=MONTE_CARLO_SIMULATIONS, years=5, seed=0):
+    """
+    Distribution of intrinsic value per share: growth ~ Normal, discount ~ Normal
+    (floored above terminal growth), terminal ~ Triangular, all fitted by
+    fit_rate_distributions() and valued in one vectorized intrinsic_values() call.
+
+    Returns percentile values (p10..p90), the mean, and prob_undervalued - the
+    share of simulations worth more than the current price (None without a price).
+    The fixed seed keeps repeated views of the same fundamentals stable.
+    """
+    unvalued = _unvalued(fundamentals)
+    if unvalued:
+        return unvalued
+
+    params = fit_rate_distributions(fundamentals.get('fcf_history'))
+    rng = np.random.default_rng(seed)
+    growth = rng.normal(params['growth_mean'], params['growth_std'], simulations)
+    terminal = rng.triangular(params['terminal_low'], params['terminal_mode'], params['terminal_high'], simulations)
+    discount = rng.normal(params['discount_mean'], params['discount_std'], simulations)
+    discount = np.maximum(discount, terminal + 0.02)
+
+    values = intrinsic_values(fundamentals['fcf'], fundamentals['shares'], growth, discount, terminal, years)
+    percentiles = np.percentile(values, MONTE_CARLO_PERCENTILES)
+
+    current_price = fundamentals.get('current_price')
+    result = {
+        'status': 'success',
+        'simulations': simulations,
+        'mean': round(float(values.mean()), 2),
+        'prob_undervalued': round(float((values > current_price).mean()) * 100, 1) if current_price else None,
+        'current_price': current_price,
+    }
+    result.update({f'p{q}': round(float(v), 2) for q, v in zip(MONTE_CARLO_PERCENTILES, percentiles)})
+    result.update({key: round(value * 100, 2) for key, value in params.items()})
+    return result
+
+
+@timed('dcf')
+def calculate_dcf_value(symbol):
+    """
+    Calculate intrinsic value using DCF model.
+    Returns dict with dcf details; 'status' says why dcf_value is missing.
+    """
+    return dcf_valuation(get_fundamentals(symbol))
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+# scanner_core/detectors.py
+# Chart-pattern detectors shared by the standalone scanner and python_backend.
+# They return snake_case dicts; scanner_core/adapters.py reshapes them per app.
+
+import numpy as np
+
+from scanner_core.indicators import sma, sma_crossovers
+from scanner_core.metrics import timed
+
+
+# ════════════════════════════════════════════════════════════════
+# CUP & HANDLE
+# ════════════════════════════════════════════════════════════════
+
+@timed('detect_cup_and_handle')
+def detect_cup_and_handle(df, min_cup_days=20, max_cup_days=130):
+    """
+    Detect cup and handle pattern with U-shape and symmetry scoring.
+    """
+    from scipy.signal import argrelextrema
+
+    if len(df) < max_cup_days + 30:
+        return None
+
+    closes = df['Close'].values
+    highs = df['High'].values
+    lows = df['Low'].values
+    volumes = df['Volume'].values
+
+    order = 10
+    local_max_idx = argrelextrema(closes, np.greater_equal, order=order)[0]
+    local_min_idx = argrelextrema(closes, np.less_equal, order=order)[0]
+
+    if len(local_max_idx) < 2 or len(local_min_idx) < 1:
+        return None
+
+    lookback = min(len(closes), max_cup_days + 50)
+    recent_max = [i for i in local_max_idx if i >= len(closes) - lookback]
+    recent_min = [i for i in local_min_idx if i >= len(closes) - lookback]
+
+    if len(recent_max) < 2 or len(recent_min) < 1:
+        return None
+
+    best_pattern = None
+    best_score = 0
+
+    for i, left_rim_idx in enumerate(recent_max[:-1]):
+        for right_rim_idx in recent_max[i+1:]:
+            cup_length = right_rim_idx - left_rim_idx
+
+            if cup_length < min_cup_days or cup_length > max_cup_days:
+                continue
+
+            bottom_candidates = [m for m in recent_min if left_rim_idx < m < right_rim_idx]
+            if not bottom_candidates:
+                continue
+
+            bottom_idx = min(bottom_candidates, key=lambda x: closes[x])
+
+            left_rim_price = closes[left_rim_idx]
+            right_rim_price = closes[right_rim_idx]
+            bottom_price = closes[bottom_idx]
+
+            avg_rim = (left_rim_price + right_rim_price) / 2
+            cup_depth_pct = (avg_rim - bottom_price) / avg_rim * 100
+
+            if cup_depth_pct < 12 or cup_depth_pct > 35:
+                continue
+
+            rim_diff = abs(left_rim_price - right_rim_price) / avg_rim * 100
+            if rim_diff > 5:
+                continue
+
+            # Calculate U-shape score
+            cup_prices = closes[left_rim_idx:right_rim_idx+1]
+            cup_mid = len(cup_prices) // 2
+            left_half = cup_prices[:cup_mid]
+            right_half = cup_prices[cup_mid:]
+            
+            if len(left_half) > 2 and len(right_half) > 2:
+                left_slope = float(abs(np.polyfit(range(len(left_half)), left_half.flatten(), 1)[0]))
+                right_slope = float(abs(np.polyfit(range(len(right_half)), right_half.flatten(), 1)[0]))
+                u_shape_score = 1 / (1 + (left_slope + right_slope) * 10)
+            else:
+                u_shape_score = 0.5
+            
+            # Symmetry
+            left_days = bottom_idx - left_rim_idx
+            right_days = right_rim_idx - bottom_idx
+            symmetry = 1 - abs(left_days - right_days) / cup_length
+            symmetry_pct = symmetry * 100
+
+            # Handle check
+            handle_start = right_rim_idx
+            handle_data = closes[handle_start:]
+            handle_volumes = volumes[handle_start:] if handle_start < len(volumes) else []
+
+            if len(handle_data) < 5:
+                continue
+
+            handle_low = min(handle_data)
+            handle_high = max(handle_data)
+            handle_decline = (right_rim_price - handle_low) / right_rim_price * 100
+
+            if handle_decline < 2 or handle_decline > 15:
+                continue
+
+            # Handle volume contraction check
+            cup_avg_vol = np.mean(volumes[left_rim_idx:right_rim_idx])
+            handle_avg_vol = np.mean(handle_volumes) if len(handle_volumes) > 0 else cup_avg_vol
+            handle_vol_contraction = handle_avg_vol < cup_avg_vol * 0.8
+
+            score = 100 - abs(cup_depth_pct - 25) - rim_diff - abs(handle_decline - 8)
+            score += u_shape_score * 10 + symmetry * 10
+
+            if score > best_score:
+                best_score = score
+                best_pattern = {
+                    'left_rim_idx': int(left_rim_idx),
+                    'right_rim_idx': int(right_rim_idx),
+                    'bottom_idx': int(bottom_idx),
+                    'left_rim_price': float(np.asarray(left_rim_price).flatten()[0]) if hasattr(left_rim_price, '__iter__') else float(left_rim_price),
+                    'right_rim_price': float(np.asarray(right_rim_price).flatten()[0]) if hasattr(right_rim_price, '__iter__') else float(right_rim_price),
+                    'bottom_price': float(np.asarray(bottom_price).flatten()[0]) if hasattr(bottom_price, '__iter__') else float(bottom_price),
+                    'cup_depth_pct': float(np.asarray(cup_depth_pct).flatten()[0]) if hasattr(cup_depth_pct, '__iter__') else float(cup_depth_pct),
+                    'cup_length_days': int(cup_length),
+                    'handle_low': float(np.asarray(handle_low).flatten()[0]) if hasattr(handle_low, '__iter__') else float(handle_low),
+                    'handle_high': float(np.asarray(handle_high).flatten()[0]) if hasattr(handle_high, '__iter__') else float(handle_high),
+                    'handle_decline_pct': float(np.asarray(handle_decline).flatten()[0]) if hasattr(handle_decline, '__iter__') else float(handle_decline),
+                    'handle_days': len(handle_data),
+                    'u_shape_score': round(float(u_shape_score), 3),
+                    'symmetry_pct': round(float(symmetry_pct), 1),
+                    'handle_vol_contraction': bool(handle_vol_contraction),
+                    'score': float(np.asarray(score).flatten()[0]) if hasattr(score, '__iter__') else float(score)
+                }
+
+    return best_pattern
+
+
+# ════════════════════════════════════════════════════════════════
+# ASCENDING TRIANGLE
+# ════════════════════════════════════════════════════════════════
+
+@timed('detect_ascending_triangle')
+def detect_ascending_triangle(df, lookback=60):
+    """
+    Detect ascending triangle: flat resistance + rising support.
+    Returns dict with resistance, support slope, target if found.
+    """
+    from scipy.signal import argrelextrema
+    from scipy.stats import linregress
+
+    if len(df) < lookback:
+        return None
+    
+    recent = df.tail(lookback)
+    highs = recent['High'].values
+    lows = recent['Low'].values
+    closes = recent['Close'].values
+    indices = np.arange(len(recent))
+    
+    # Find resistance (multiple touches at similar high)
+    order = 5
+    local_highs_idx = argrelextrema(highs, np.greater_equal, order=order)[0]
+    
+    if len(local_highs_idx) < 3:
+        return None
+    
+    high_prices = highs[local_highs_idx]
+    resistance = np.mean(high_prices[-5:])
+    
+    # Check if highs are flat (within 3% of each other)
+    high_range = (max(high_prices[-5:]) - min(high_prices[-5:])) / resistance * 100
+    if high_range > 3:
+        return None
+    
+    # Check for rising lows (ascending support)
+    local_lows_idx = argrelextrema(lows, np.less_equal, order=order)[0]
+    if len(local_lows_idx) < 3:
+        return None
+    
+    low_prices = lows[local_lows_idx]
+    
+    # Linear regression on lows
+    if len(local_lows_idx) >= 3:
+        slope, intercept, r_value, _, _ = linregress(local_lows_idx, low_prices)
+        
+        # Slope should be positive (rising lows) with decent fit
+        if slope > 0 and r_value > 0.5:
+            # Calculate target (height of triangle added to breakout)
+            triangle_height = resistance - low_prices[0]
+            target = resistance + triangle_height
+            
+            return {
+                'resistance': round(resistance, 2),
+                'support_slope': round(slope, 4),
+                'target': round(target, 2),
+                'r_squared': round(r_value ** 2, 3),
+                'touches': len(local_highs_idx),
+                'local_highs_idx': local_highs_idx.tolist(),
+                'local_lows_idx': local_lows_idx.tolist(),
+            }
+    
+    return None
+
+
+# ════════════════════════════════════════════════════════════════
+# BULL FLAG / PENNANT
+# ════════════════════════════════════════════════════════════════
+
+@timed('detect_bull_flag')
+def detect_bull_flag(df, lookback=40):
+    """
+    Detect bull flag: strong pole (surge) + consolidation.
+    Returns dict with pole gain, flag details if found.
+    """
+    from scipy.stats import linregress
+
+    if len(df) < lookback:
+        return None
+    
+    recent = df.tail(lookback)
+    closes = recent['Close'].values
+    highs = recent['High'].values
+    lows = recent['Low'].values
+    
+    # Find the pole: sharp rise in first portion
+    pole_period = lookback // 2
+    pole_data = closes[:pole_period]
+    
+    if len(pole_data) < 5:
+        return None
+    
+    pole_low_idx = np.argmin(pole_data[:len(pole_data)//2])
+    pole_low = pole_data[pole_low_idx]
+    pole_high_idx = np.argmax(pole_data)
+    pole_high = pole_data[pole_high_idx]
+    
+    # Pole should go up (low before high)
+    if pole_low_idx >= pole_high_idx:
+        return None
+    
+    pole_gain = (pole_high - pole_low) / pole_low * 100
+    
+    # Pole should be significant (at least 10% gain)
+    if pole_gain < 10:
+        return None
+    
+    # Flag portion: consolidation
+    flag_data = closes[pole_period:]
+    flag_highs = highs[pole_period:]
+    flag_lows = lows[pole_period:]
+    
+    if len(flag_data) < 5:
+        return None
+    
+    flag_high = max(flag_highs)
+    flag_low = min(flag_lows)
+    flag_range = (flag_high - flag_low) / pole_high * 100
+    
+    # Flag should be tight (less than 15% range)
+    if flag_range > 15:
+        return None
+    
+    # Flag should not give back more than 50% of pole gains
+    flag_pullback = (pole_high - flag_low) / (pole_high - pole_low) * 100
+    if flag_pullback > 50:
+        return None
+    
+    # Calculate flag slope (should be slightly down or flat)
+    flag_indices = np.arange(len(flag_data))
+    slope, _, _, _, _ = linregress(flag_indices, flag_data)
+    
+    # Target: pole height added to breakout
+    target = flag_high + (pole_high - pole_low)
+    
+    return {
+        'pole_gain': round(pole_gain, 1),
+        'pole_low': round(pole_low, 2),
+        'pole_high': round(pole_high, 2),
+        'pole_days': pole_high_idx - pole_low_idx,
+        'flag_high': round(flag_high, 2),
+        'flag_low': round(flag_low, 2),
+        'flag_range_pct': round(flag_range, 1),
+        'flag_days': len(flag_data),
+        'flag_slope': round(slope, 4),
+        'target': round(target, 2),
+        'pole_start_idx': pole_low_idx,
+        'pole_end_idx': pole_high_idx,
+    }
+
+
+# ════════════════════════════════════════════════════════════════
+# GOLDEN CROSS
+# ════════════════════════════════════════════════════════════════
+
+@timed('detect_golden_cross')
+def detect_golden_cross(df, lookback_days=20):
+    """
+    Detect golden cross (50 SMA crosses above 200 SMA) within lookback period.
+    Also detects death cross (50 crosses below 200).
+    Returns dict with cross info or None.
+    """
+    if len(df) < 200:
+        return None
+    
+    sma50 = sma(df['Close'], 50).to_numpy(dtype=float)
+    sma200 = sma(df['Close'], 200).to_numpy(dtype=float)
+    
+    # Get recent bars where both SMAs exist
+    both = ~(np.isnan(sma50) | np.isnan(sma200))
+    sma50 = sma50[both][-(lookback_days + 1):]
+    sma200 = sma200[both][-(lookback_days + 1):]
+    dates = df.index[both][-(lookback_days + 1):]
+    
+    if len(dates) < 2:
+        return None
+    
+    # Most recent crossover of each kind in the lookback period
+    golden, death = sma_crossovers(sma50, sma200)
+    golden_cross_date = dates[np.flatnonzero(golden)[-1]] if golden.any() else None
+    death_cross_date = dates[np.flatnonzero(death)[-1]] if death.any() else None
+    
+    # Current state
+    sma50_above_200 = sma50[-1] > sma200[-1]
+    
+    # Days since cross
+    days_since_golden = None
+    days_since_death = None
+    
+    if golden_cross_date is not None:
+        days_since_golden = (dates[-1] - golden_cross_date).days
+    if death_cross_date is not None:
+        days_since_death = (dates[-1] - death_cross_date).days
+    
+    return {
+        'golden_cross': golden_cross_date is not None,
+        'golden_cross_date': golden_cross_date,
+        'days_since_golden': days_since_golden,
+        'death_cross': death_cross_date is not None,
+        'death_cross_date': death_cross_date,
+        'days_since_death': days_since_death,
+        'sma50_above_200': sma50_above_200,
+    }
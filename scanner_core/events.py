@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+# scanner_core/events.py
+# Change events between consecutive scans of a market (new / upgraded /
+# downgraded / dropped / breakout), kept in an append-only NDJSON log
+
+import json
+import os
+import struct
+import time
+
+from scanner_core.cache import file_lock, get_cache_dir
+from scanner_core.scan import STATUS_ORDER
+from scanner_core.serialize import json_safe
+
+# Status ladder as rank (higher = stronger), from the results sort order so the
+# two can't disagree: STRONG BUY 4 ... WATCH 0
+STATUS_RANK = {status: len(STATUS_ORDER) - 1 - order for status, order in STATUS_ORDER.items()}
+EVENT_TYPES = ('new', 'upgraded', 'downgraded', 'dropped', 'breakout')
+# Offset index record: (first seq of an appended batch, byte offset of its first line)
+_INDEX_RECORD = struct.Struct('<QQ')
+
+
+def _breakout_confirmed(r):
+    criterion = (r.get('criteria') or {}).get('breakout_confirmed')
+    if criterion is not None:
+        return bool(criterion.get('passed'))
+    return r.get('current_price') is not None and r['current_price'] >= r.get('buy_point', float('inf'))
+
+
+def _event(kind, symbol, current=None, previous=None):
+    event = {'type': kind, 'symbol': symbol}
+    if current is not None:
+        event.update(status=current.get('status'), signal_score=current.get('signal_score'),
+                     current_price=current.get('current_price'), buy_point=current.get('buy_point'))
+    if previous is not None:
+        event.update(prev_status=previous.get('status'), prev_signal_score=previous.get('signal_score'))
+    return event
+
+
+def diff_scans(previous, current):
+    """
+    Events turning the previous scan's results into the current one, by symbol.
+
+    new/dropped: the symbol appeared in / left the results. upgraded/downgraded:
+    its status moved up / down STATUS_RANK. breakout: the breakout_confirmed
+    criterion passed now but not before (in addition to any status change).
+    Dropped symbols come last; otherwise events follow the current scan's order.
+    """
+    before = {r['symbol']: r for r in previous or ()}
+    after = {r['symbol']: r for r in current or ()}
+    events = []
+    for symbol, r in after.items():
+        old = before.get(symbol)
+        if old is None:
+            events.append(_event('new', symbol, r))
+            continue
+        change = STATUS_RANK.get(r.get('status'), -1) - STATUS_RANK.get(old.get('status'), -1)
+        if change:
+            events.append(_event('upgraded' if change > 0 else 'downgraded', symbol, r, old))
+        if _breakout_confirmed(r) and not _breakout_confirmed(old):
+            events.append(_event('breakout', symbol, r, old))
+    for symbol, old in before.items():
+        if symbol not in after:
+            events.append(_event('dropped', symbol, previous=old))
+    return events
+
+
+class EventLog:
+    """
+    Append-only NDJSON event log (<cache dir>/events/<name>.ndjson) shared by
+    every process. Each event gets an increasing `seq` and a `ts`, so consumers
+    poll with since=<last seq seen> and only ever read the new deltas. A side
+    index (<name>.idx) maps each appended batch's first seq to its byte offset,
+    so a poll seeks past the history instead of re-reading it.
+    """
+
+    def __init__(self, name='scan_events'):
+        self.name = name
+
+    @property
+    def path(self):
+        return os.path.join(get_cache_dir(), 'events', self.name + '.ndjson')
+
+    @property
+    def index_path(self):
+        return os.path.join(get_cache_dir(), 'events', self.name + '.idx')
+
+    def last_seq(self):
+        """seq of the newest event (0 for an empty log)."""
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(0, f.tell() - 4096))
+                lines = f.read().splitlines()
+        except OSError:
+            return 0
+        for line in reversed(lines):
+            try:
+                return json.loads(line)['seq']
+            except (ValueError, KeyError):
+                continue
+        return 0
+
+    def _rebuild_index(self):
+        """Index a log written before the index existed (one record per line). Call under the lock."""
+        records = []
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for line in f:
+                try:
+                    records.append(_INDEX_RECORD.pack(json.loads(line)['seq'], offset))
+                except (ValueError, KeyError):
+                    pass
+                offset += len(line)
+        with open(self.index_path, 'wb') as f:
+            f.write(b''.join(records))
+
+    def append(self, events, **common):
+        """Stamp events with seq/ts (plus common fields, e.g. market) and append them."""
+        if not events:
+            return []
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with file_lock(f'events-{self.name}'):
+            seq = self.last_seq()
+            ts = time.time()
+            stamped = []
+            for event in events:
+                seq += 1
+                stamped.append({'seq': seq, 'ts': round(ts, 3), **common, **event})
+            payload = ''.join(json.dumps(json_safe(e), separators=(',', ':')) + '\n' for e in stamped)
+            if not os.path.exists(self.path):
+                # A fresh log (or one deleted to reset it) starts a fresh index
+                open(self.index_path, 'wb').close()
+            elif not os.path.exists(self.index_path):
+                self._rebuild_index()
+            with open(self.path, 'ab') as f:
+                offset = f.tell()
+                f.write(payload.encode('utf-8'))
+            # Written after the events: a crash in between only leaves the index a batch behind
+            with open(self.index_path, 'ab') as f:
+                f.write(_INDEX_RECORD.pack(stamped[0]['seq'], offset))
+        return stamped
+
+    def _start_offset(self, since):
+        """Byte offset of the last indexed batch starting at or before seq since + 1 (0 if unknown)."""
+        try:
+            with open(self.index_path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                lo, hi = 0, f.tell() // _INDEX_RECORD.size
+                offset = 0
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    f.seek(mid * _INDEX_RECORD.size)
+                    first_seq, batch_offset = _INDEX_RECORD.unpack(f.read(_INDEX_RECORD.size))
+                    if first_seq <= since + 1:
+                        offset, lo = batch_offset, mid + 1
+                    else:
+                        hi = mid
+                return offset
+        except (OSError, struct.error):
+            return 0
+
+    def read(self, since=0, market=None, types=None, symbols=None, limit=None):
+        """Events with seq > since, oldest first, optionally filtered."""
+        events = []
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self._start_offset(since) if since else 0)
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue  # a torn line from a crashed writer
+                    if event['seq'] <= since:
+                        continue
+                    if market and event.get('market') != market:
+                        continue
+                    if types and event['type'] not in types:
+                        continue
+                    if symbols and event['symbol'] not in symbols:
+                        continue
+                    events.append(event)
+                    if limit and len(events) >= limit:
+                        break
+        except OSError:
+            pass
+        return events
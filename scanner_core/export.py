@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+# scanner_core/export.py
+# Streaming export of scan results as flat CSV, NDJSON or typed Parquet
+# (nested criteria / pattern dicts become dotted columns)
+#
+#     python -m scanner_core export --market sp500 --format parquet -o sp500.parquet
+
+import csv
+import io
+import json
+import sys
+from datetime import date, datetime
+
+import numpy as np
+
+from scanner_core.dcf import NEGATIVE_FCF
+from scanner_core.serialize import json_safe
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+# Rows per CSV/NDJSON chunk and per Parquet row group
+EXPORT_BATCH_SIZE = 500
+
+
+def flatten_result(result, prefix='', out=None):
+    """
+    One scan result as a flat {column: scalar} dict: nested dicts become
+    dotted columns (criteria.breakout_confirmed.passed, asc_triangle.target),
+    lists are stored as JSON text, numpy scalars become Python ones and
+    timestamps stay datetimes. A '-FCF' dcf_value becomes empty, with the
+    boolean negative_fcf column set instead.
+    """
+    out = {} if out is None else out
+    for key, value in result.items():
+        column = f"{prefix}{key}"
+        if column == 'dcf_value':
+            # The '-FCF' sentinel would make the whole column text; keep it numeric plus a flag
+            negative_fcf = isinstance(value, str) and value == NEGATIVE_FCF
+            out[column] = None if negative_fcf else json_safe(value)
+            out['negative_fcf'] = negative_fcf
+            continue
+        if isinstance(value, dict):
+            flatten_result(value, column + '.', out)
+        elif isinstance(value, (list, tuple, np.ndarray)):
+            out[column] = json.dumps(json_safe(value), separators=(',', ':'))
+        elif value is None or isinstance(value, (str, datetime, date)):
+            out[column] = value
+        else:
+            out[column] = json_safe(value)
+    return out
+
+
+def _kind(value):
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        return 'int'
+    if isinstance(value, float):
+        return 'float'
+    if isinstance(value, (datetime, date)):
+        return 'timestamp'
+    return 'string'
+
+
+def export_schema(rows):
+    """
+    [(column, kind)] over every row: symbol first, then columns in order of first
+    appearance. kind is bool/int/float/timestamp/string; ints mixed with floats
+    widen to float, any other mix (or a column that is always empty) is string.
+    A field that is a dict in some rows and None in others (asc_triangle,
+    bull_flag) only gets its dotted columns, left empty where it was None.
+    """
+    kinds = {'symbol': None}
+    for row in rows:
+        for column, value in flatten_result(row).items():
+            if value is None:
+                kinds.setdefault(column, None)
+                continue
+            kind, seen = _kind(value), kinds.get(column)
+            if seen is None or seen == kind:
+                kinds[column] = kind
+            elif {seen, kind} == {'int', 'float'}:
+                kinds[column] = 'float'
+            else:
+                kinds[column] = 'string'
+    parents = {column[:i] for column in kinds for i, char in enumerate(column) if char == '.'}
+    return [(column, kind or 'string') for column, kind in kinds.items()
+            if not (kind is None and column in parents)]
+
+
+def _batches(rows, size=EXPORT_BATCH_SIZE):
+    for i in range(0, len(rows), size):
+        yield [flatten_result(row) for row in rows[i:i + size]]
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(rows, schema):
+    columns = [column for column, _ in schema]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in _batches(rows):
+        for flat in batch:
+            writer.writerow([_text(flat.get(column)) for column in columns])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def iter_ndjson(rows, schema):
+    columns = [column for column, _ in schema]
+    for batch in _batches(rows):
+        yield ''.join(json.dumps(json_safe({column: flat.get(column) for column in columns}),
+                                 separators=(',', ':')) + '\n' for flat in batch).encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that keeps what was written until drain(), for streaming a ParquetWriter."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_value(value, kind):
+    if value is None:
+        return None
+    if kind == 'timestamp' and not isinstance(value, datetime):
+        return datetime(value.year, value.month, value.day)
+    if kind != 'string':
+        return value
+    return _text(value) if isinstance(value, (datetime, date)) else str(value)
+
+
+def iter_parquet(rows, schema):
+    """One Parquet row group per EXPORT_BATCH_SIZE rows, yielded as soon as it is written."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {'bool': pa.bool_(), 'int': pa.int64(), 'float': pa.float64(),
+             'timestamp': pa.timestamp('us', tz='UTC'), 'string': pa.string()}
+    arrow_schema = pa.schema([(column, types[kind]) for column, kind in schema])
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, arrow_schema) as writer:
+        for batch in _batches(rows):
+            arrays = [pa.array([_arrow_value(flat.get(column), kind) for flat in batch], type=types[kind])
+                      for column, kind in schema]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=arrow_schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def export_stream(rows, fmt):
+    """
+    Iterator of encoded chunks for rows (scan result dicts) in fmt (EXPORT_FORMATS).
+
+    Only the schema pass touches every row up front; rows are then flattened and
+    encoded one batch at a time. Raises ValueError for an unknown format and
+    ImportError when Parquet is asked for without pyarrow - before anything is
+    streamed, so callers can still answer with an error.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r} (expected {', '.join(EXPORT_FORMATS)})")
+    if fmt == 'parquet':
+        import pyarrow.parquet  # noqa: F401  (fail now, not mid-stream)
+    schema = export_schema(rows)
+    writer = {'csv': iter_csv, 'ndjson': iter_ndjson, 'parquet': iter_parquet}[fmt]
+    return (chunk for chunk in writer(rows, schema) if chunk)
+
+
+def write_export(rows, fmt, path=None):
+    """Stream rows in fmt to path (None or '-' for stdout); returns the bytes written."""
+    chunks = export_stream(rows, fmt)
+    to_stdout = path in (None, '-')
+    out = sys.stdout.buffer if to_stdout else open(path, 'wb')
+    written = 0
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if to_stdout:
+            out.flush()
+        else:
+            out.close()
+    return written
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# scanner_core/fetch.py
+# Concurrent per-symbol fetching for network-bound lookups (fundamentals, info, ...)
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+FETCH_WORKERS = int(os.environ.get('FETCH_WORKERS', 8))
+
+
+def fetch_many(func, symbols, max_workers=FETCH_WORKERS):
+    """
+    Call func(symbol) for every symbol on a thread pool; return {symbol: result}.
+
+    The calls are I/O bound (HTTP to Yahoo), so threads overlap the round trips.
+    An exception for one symbol maps that symbol to None instead of failing the batch.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+
+    def safe_call(symbol):
+        try:
+            return func(symbol)
+        except Exception as e:
+            print(f"Fetch error for {symbol}: {e}")
+            return None
+
+    if max_workers <= 1 or len(symbols) == 1:
+        return {symbol: safe_call(symbol) for symbol in symbols}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(symbols))) as pool:
+        return dict(zip(symbols, pool.map(safe_call, symbols)))
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+# scanner_core/indicators.py
+# Technical indicators used by breakout scoring (SMA, RSI, ADX, MACD) and
+# cross-sectional ones computed over the whole scanned universe (RS rating, crosses)
+
+import numpy as np
+import pandas as pd
+
+from scanner_core.panel import PricePanel
+
+# IBD-style relative strength: (lookback in trading days, weight) - 3/6/9/12 months
+RS_WEIGHTS = ((63, 0.4), (126, 0.2), (189, 0.2), (252, 0.2))
+
+
+def sma(close, length):
+    """Simple moving average of a close series."""
+    return close.rolling(length).mean()
+
+
+def sma_crossovers(fast, slow):
+    """
+    Golden/death crosses of two aligned averages as one sign-change pass.
+
+    Works on 1-D series or date x symbol panels (crosses are along axis 0).
+    Returns (golden, death) boolean arrays shaped like the input: golden is True
+    on the bar where fast closes above slow after being at or below it, death
+    where it closes below after being at or above. Bars where either side of the
+    pair is NaN never cross.
+    """
+    diff = np.asarray(fast, dtype=float) - np.asarray(slow, dtype=float)
+    prev, curr = diff[:-1], diff[1:]
+    first = np.zeros((min(len(diff), 1),) + diff.shape[1:], dtype=bool)
+    with np.errstate(invalid='ignore'):
+        golden = np.concatenate([first, (prev <= 0) & (curr > 0)])
+        death = np.concatenate([first, (prev >= 0) & (curr < 0)])
+    return golden, death
+
+
+def add_indicators(df):
+    """
+    Return a copy of an OHLCV frame with SMA50, SMA200, RSI, ADX, MACD and
+    MACD_signal columns (None-filled when pandas_ta can't compute them).
+    """
+    import pandas_ta as ta
+
+    df_calc = df.copy()
+    df_calc['SMA50'] = sma(df_calc['Close'], 50)
+    df_calc['SMA200'] = sma(df_calc['Close'], 200)
+    df_calc['RSI'] = ta.rsi(df_calc['Close'], length=14)
+
+    # ADX
+    adx_data = ta.adx(df_calc['High'], df_calc['Low'], df_calc['Close'], length=14)
+    if adx_data is not None and 'ADX_14' in adx_data.columns:
+        df_calc['ADX'] = adx_data['ADX_14']
+    else:
+        df_calc['ADX'] = None
+
+    # MACD
+    macd = ta.macd(df_calc['Close'], fast=12, slow=26, signal=9)
+    if macd is not None:
+        df_calc['MACD'] = macd['MACD_12_26_9']
+        df_calc['MACD_signal'] = macd['MACDs_12_26_9']
+    else:
+        df_calc['MACD'] = None
+        df_calc['MACD_signal'] = None
+
+    return df_calc
+
+
+def field_panels(price_data, fields=('Close',)):
+    """
+    {symbol: OHLCV frame} -> {field: date x symbol frame}, built in one pass.
+
+    Each frame is converted with a single to_numpy() into a preallocated
+    date x field x symbol cube. Frames covering the full (union) date index are
+    copied straight in; shorter histories are placed by date and left NaN elsewhere.
+    A PricePanel already is that cube, so its fields are returned as views.
+    """
+    if not price_data:
+        return {field: pd.DataFrame() for field in fields}
+    if isinstance(price_data, PricePanel):
+        return {field: price_data.field(field) for field in fields}
+    symbols = list(price_data)
+    frames = [price_data[symbol] for symbol in symbols]
+    index, columns = frames[0].index, frames[0].columns
+    if not all(df.index.equals(index) for df in frames):
+        index = index.append([df.index for df in frames[1:]]).unique().sort_values()
+
+    positions = [columns.get_loc(field) for field in fields]
+    cube = np.full((len(index), len(fields), len(frames)), np.nan)
+    for j, df in enumerate(frames):
+        cols = positions if df.columns.equals(columns) else [df.columns.get_loc(field) for field in fields]
+        values = df.to_numpy(dtype=float)[:, cols]
+        if df.index.equals(index):
+            cube[:, :, j] = values
+        else:
+            cube[index.get_indexer(df.index), :, j] = values
+    return {field: pd.DataFrame(cube[:, k, :], index=index, columns=symbols) for k, field in enumerate(fields)}
+
+
+def field_panel(price_data, field='Close'):
+    """{symbol: OHLCV frame} -> one date x symbol frame of a single field."""
+    return field_panels(price_data, (field,))[field]
+
+
+def close_panel(price_data):
+    """{symbol: OHLCV frame} -> one date x symbol frame of closes."""
+    return field_panel(price_data, 'Close')
+
+
+def rs_scores(closes, weights=RS_WEIGHTS):
+    """
+    Raw relative strength score for every column of a close panel, in one pass:
+    score = sum(weight * return over lookback). Lookbacks longer than the panel
+    use its first bar, and a symbol with a shorter history uses its own first bar.
+    Returns a Series; symbols without a price are left out.
+    """
+    if closes.empty:
+        return pd.Series(dtype=float)
+    values = closes.to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    n, columns = values.shape
+    cols = np.arange(columns)
+
+    # Latest price per symbol (last valid row)
+    last = values[n - 1 - valid[::-1].argmax(axis=0), cols]
+
+    score = np.zeros(columns)
+    for lookback, weight in weights:
+        # Base price: first valid bar at or after the lookback row
+        start = max(n - 1 - lookback, 0)
+        base = values[start + valid[start:].argmax(axis=0), cols]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            score += weight * (last / base - 1)
+
+    score[~valid.any(axis=0)] = np.nan
+    return pd.Series(score, index=closes.columns).replace([np.inf, -np.inf], np.nan).dropna()
+
+
+def rank_rs(scores):
+    """Raw scores (Series or {symbol: score}) -> {symbol: rating 1-99}, percentile-ranked (99 = top 1%)."""
+    scores = pd.Series(scores, dtype=float).dropna()
+    if scores.empty:
+        return {}
+    ratings = np.clip(np.ceil(scores.rank(pct=True) * 99), 1, 99).astype(int)
+    return ratings.to_dict()
+
+
+def rs_ratings(closes, weights=RS_WEIGHTS):
+    """
+    Relative strength rating 1-99 for every column of a close panel: rs_scores()
+    percentile-ranked across the panel. Returns {symbol: rating}.
+    """
+    return rank_rs(rs_scores(closes, weights))
+
+
+def recent_golden_crosses(closes, lookback_days=20):
+    """
+    Universe-wide golden-cross screen over a close panel.
+
+    Returns {symbol: days since the cross} for every column whose SMA50 crossed
+    above its SMA200 within the last lookback_days bars and is still above it,
+    counted in calendar days from the panel's last date like detect_golden_cross.
+    A symbol with a gap inside the panel has no average until 200 bars after it.
+    """
+    if len(closes) < 201:
+        return {}
+    # Only the averages over the last lookback_days + 1 bars matter
+    tail = closes.iloc[-(lookback_days + 200):]
+    sma50 = sma(tail, 50).to_numpy(dtype=float)[-(lookback_days + 1):]
+    sma200 = sma(tail, 200).to_numpy(dtype=float)[-(lookback_days + 1):]
+    golden, _ = sma_crossovers(sma50, sma200)
+    recent = golden[1:]
+    with np.errstate(invalid='ignore'):
+        hits = recent.any(axis=0) & (sma50[-1] > sma200[-1])
+
+    # Row of the latest cross per symbol, then calendar days to the panel's last date
+    rows = len(closes) - 1 - recent[::-1].argmax(axis=0)
+    days = (closes.index[-1] - closes.index[rows]).days
+    return {symbol: int(d) for symbol, d, hit in zip(closes.columns, days, hits) if hit}
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# scanner_core/metadata.py
+# Per-symbol company metadata harvested from the screener snapshot, so scans and
+# company pages don't need a ticker.info request for name/sector/market cap
+
+import sys
+import threading
+import time
+
+from scanner_core.universe import load_screener_snapshot, snapshot_version
+
+METADATA_FIELDS = ('name', 'exchange', 'market_cap', 'sector', 'industry', 'country', 'last_price')
+# A stale snapshot is re-requested at most this often (so a failing API isn't retried per call)
+METADATA_RECHECK = 15 * 60
+
+
+class MetadataTable:
+    """
+    Columnar symbol -> metadata table: one list per field plus a symbol -> row map.
+    Repeated strings (exchange, sector, industry, country) are interned, so the
+    ~7,000-symbol universe costs little more than its distinct values.
+    """
+
+    def __init__(self, rows):
+        self._rows = {}
+        self._columns = {field: [] for field in METADATA_FIELDS}
+        for row in rows:
+            symbol = row['symbol']
+            if symbol in self._rows:
+                continue
+            self._rows[symbol] = len(self._rows)
+            for field, column in self._columns.items():
+                value = row.get(field)
+                if isinstance(value, str) and field != 'name':
+                    value = sys.intern(value)
+                column.append(value)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, symbol):
+        return symbol in self._rows
+
+    def get(self, symbol):
+        """{field: value} for the fields the snapshot has for symbol, or None."""
+        i = self._rows.get(symbol)
+        if i is None:
+            return None
+        return {field: column[i] for field, column in self._columns.items() if column[i] not in (None, '')}
+
+    def field(self, symbol, field, default=None):
+        i = self._rows.get(symbol)
+        value = self._columns[field][i] if i is not None else None
+        return default if value in (None, '') else value
+
+    def sectors(self):
+        """Distinct sectors, sorted."""
+        return sorted({s for s in self._columns['sector'] if s})
+
+
+_table = MetadataTable([])
+_table_version = None
+_checked = 0.0
+_lock = threading.Lock()
+
+
+def get_metadata():
+    """
+    Process-wide MetadataTable over the screener snapshot.
+
+    Rebuilt whenever a new snapshot is written (by any process). The snapshot's
+    daily refresh is checked at most every METADATA_RECHECK seconds; without any
+    snapshot the table is empty and callers fall back to per-symbol lookups.
+    """
+    global _table, _table_version, _checked
+    with _lock:
+        now = time.time()
+        if now - _checked < METADATA_RECHECK and snapshot_version() == _table_version:
+            return _table
+        _checked = now
+        rows = load_screener_snapshot()
+        version = snapshot_version()
+        if version != _table_version or not len(_table):
+            _table, _table_version = MetadataTable(rows), version
+        return _table
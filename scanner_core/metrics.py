@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+# scanner_core/metrics.py
+# Lightweight in-process timers and counters, exported in Prometheus text format
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Latency buckets (seconds) - detectors run in ms, chunk downloads and full scans in minutes
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(label_names, label_values)]
+    if extra:
+        pairs.extend(f'{n}="{_escape(v)}"' for n, v in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    metric_type = 'untyped'
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._series = {}
+        self._registry = None
+
+    def _key(self, labels):
+        try:
+            return tuple(str(labels[n]) for n in self.label_names)
+        except KeyError as e:
+            raise ValueError(f"{self.name}: missing label {e}") from None
+
+    def _changed(self):
+        if self._registry is not None:
+            self._registry._changed()
+
+    def snapshot(self):
+        with self._lock:
+            return {key: self._copy_value(value) for key, value in self._series.items()}
+
+    def _copy_value(self, value):
+        return value
+
+    def render(self, series=None):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.metric_type}']
+        series = self.snapshot() if series is None else series
+        for key, value in sorted(series.items()):
+            lines.extend(self._render_series(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic counter with optional labels."""
+    metric_type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+        self._changed()
+
+    def merge_values(self, a, b):
+        return a + b
+
+    def _render_series(self, key, value):
+        return [f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}']
+
+
+class Gauge(_Metric):
+    """Point-in-time value (last scan size, last scan duration, ...)."""
+    metric_type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = [value, time.time()]
+        self._changed()
+
+    def _copy_value(self, value):
+        return list(value)
+
+    def merge_values(self, a, b):
+        # Most recently written value wins across processes
+        return a if a[1] >= b[1] else b
+
+    def _render_series(self, key, value):
+        return [f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value[0])}']
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram, one bucket set per label combination."""
+    metric_type = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+        self._changed()
+
+    def _copy_value(self, value):
+        return {'counts': list(value['counts']), 'sum': value['sum'], 'count': value['count']}
+
+    def merge_values(self, a, b):
+        return {
+            'counts': [x + y for x, y in zip(a['counts'], b['counts'])],
+            'sum': a['sum'] + b['sum'],
+            'count': a['count'] + b['count'],
+        }
+
+    def _render_series(self, key, series):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, series['counts']):
+            cumulative += count
+            labels = _format_labels(self.label_names, key, [('le', _format_value(bound))])
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.label_names, key, [('le', '+Inf')])
+        lines.append(f'{self.name}_bucket{labels} {series["count"]}')
+        base = _format_labels(self.label_names, key)
+        lines.append(f'{self.name}_sum{base} {_format_value(series["sum"])}')
+        lines.append(f'{self.name}_count{base} {series["count"]}')
+        return lines
+
+
+class Registry:
+    """
+    Holds every metric so /metrics can render them in one pass.
+
+    With enable_multiprocess() each process also flushes its series to
+    <dir>/<pid>.json (at most once per FLUSH_INTERVAL) and render() merges
+    every process's file, so any gunicorn worker can answer a scrape for all.
+    """
+
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self):
+        self._metrics = []
+        self._shared_dir = None
+        self._flush_lock = threading.Lock()
+        self._last_flush = 0.0
+        self._dirty = False
+        self._flusher_pid = None
+
+    def _add(self, metric):
+        metric._registry = self
+        self._metrics.append(metric)
+        return metric
+
+    def enable_multiprocess(self, directory, clear=False):
+        """Share metrics between forked workers through files in directory."""
+        os.makedirs(directory, exist_ok=True)
+        if clear:
+            for name in os.listdir(directory):
+                if name.endswith('.json'):
+                    try:
+                        os.unlink(os.path.join(directory, name))
+                    except OSError:
+                        pass
+        self._shared_dir = directory
+
+    @property
+    def shared_dir(self):
+        """Directory set by enable_multiprocess(), or None."""
+        return self._shared_dir
+
+    def _changed(self):
+        if self._shared_dir is None:
+            return
+        self._dirty = True
+        if self._flusher_pid != os.getpid():
+            # Threads do not survive fork, so each worker starts its own flusher
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._flush_loop, daemon=True).start()
+        if time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL:
+            self.flush()
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._flusher_pid == pid:
+            time.sleep(self.FLUSH_INTERVAL)
+            if self._dirty:
+                self.flush()
+
+    def flush(self):
+        if self._shared_dir is None:
+            return
+        with self._flush_lock:
+            self._dirty = False
+            self._last_flush = time.monotonic()
+            payload = {m.name: [[list(k), v] for k, v in m.snapshot().items()] for m in self._metrics}
+            path = os.path.join(self._shared_dir, f'{os.getpid()}.json')
+            tmp_path = path + '.tmp'
+            try:
+                with open(tmp_path, 'w') as f:
+                    json.dump(payload, f)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Metrics flush error: {e}")
+
+    def _load_other_processes(self):
+        merged = {}
+        own = f'{os.getpid()}.json'
+        try:
+            names = os.listdir(self._shared_dir)
+        except OSError:
+            return merged
+        for name in names:
+            if not name.endswith('.json') or name == own:
+                continue
+            try:
+                with open(os.path.join(self._shared_dir, name)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for metric_name, series in data.items():
+                merged.setdefault(metric_name, []).extend(series)
+        return merged
+
+    def counter(self, name, help_text, label_names=()):
+        return self._add(Counter(name, help_text, label_names))
+
+    def gauge(self, name, help_text, label_names=()):
+        return self._add(Gauge(name, help_text, label_names))
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help_text, label_names, buckets))
+
+    def render(self):
+        others = self._load_other_processes() if self._shared_dir else {}
+        lines = []
+        for metric in self._metrics:
+            series = metric.snapshot()
+            for key, value in others.get(metric.name, []):
+                key = tuple(key)
+                series[key] = metric.merge_values(series[key], value) if key in series else value
+            lines.extend(metric.render(series))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'scanner_stage_seconds', 'Wall time spent in each scan / page stage.', ('stage',))
+STAGE_ERRORS = REGISTRY.counter(
+    'scanner_stage_errors_total', 'Exceptions raised out of a timed stage.', ('stage',))
+EXTERNAL_REQUESTS = REGISTRY.counter(
+    'scanner_external_requests_total', 'Calls to external data providers by outcome.', ('provider', 'outcome'))
+EXTERNAL_SECONDS = REGISTRY.histogram(
+    'scanner_external_request_seconds', 'Latency of calls to external data providers.', ('provider',))
+PROVIDER_CIRCUIT_OPEN = REGISTRY.gauge(
+    'scanner_provider_circuit_open', '1 while calls to a provider are failing fast (breaker open).', ('provider',))
+SCANS = REGISTRY.counter(
+    'scanner_scans_total', 'Completed market scans.', ('market',))
+SCAN_SYMBOLS = REGISTRY.counter(
+    'scanner_scan_symbols_total', 'Symbols reaching each phase of a scan.', ('phase',))
+LAST_SCAN_SECONDS = REGISTRY.gauge(
+    'scanner_last_scan_seconds', 'Duration of the most recent scan.', ('market',))
+LAST_SCAN_RESULTS = REGISTRY.gauge(
+    'scanner_last_scan_results', 'Patterns found by the most recent scan.', ('market',))
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@contextmanager
+def stage_timer(stage):
+    """Time a block of code under scanner_stage_seconds{stage=...}."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def timed(stage):
+    """Decorator form of stage_timer."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _RequestOutcome:
+    __slots__ = ('outcome',)
+
+    def __init__(self):
+        self.outcome = 'ok'
+
+    def error(self, reason='error'):
+        """Mark a call that returned without raising (e.g. HTTP 429) as failed."""
+        self.outcome = reason
+
+    def check_status(self, status_code):
+        if status_code != 200:
+            self.outcome = f'http_{status_code}'
+
+
+@contextmanager
+def track_request(provider):
+    """
+    Count and time one call to an external provider (yahoo, nasdaq, reddit, ...).
+    Fetch code goes through providers.provider_call, which adds rate limiting
+    and circuit breaking around this.
+    """
+    call = _RequestOutcome()
+    start = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        call.outcome = 'error'
+        raise
+    finally:
+        EXTERNAL_SECONDS.observe(time.perf_counter() - start, provider=provider)
+        EXTERNAL_REQUESTS.inc(provider=provider, outcome=call.outcome)
+
+
+def render_prometheus():
+    return REGISTRY.render()
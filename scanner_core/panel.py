@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+# scanner_core/panel.py
+# Compact float32 price panel for whole-universe scans, shareable between
+# processes as a read-only memory-mapped file
+
+import json
+import os
+import tempfile
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+from scanner_core.cache import _atomic_write, get_cache_dir
+
+PANEL_FIELDS = ('Open', 'High', 'Low', 'Close', 'Volume')
+PANEL_DTYPE = np.float32
+
+
+def panel_path(name):
+    """Base path (without .npy/.json) of a named panel in the shared cache directory."""
+    return os.path.join(get_cache_dir(), 'panels', name)
+
+
+def remove_panel(name):
+    """Delete a named panel's files (a no-op if it was never saved)."""
+    for suffix in ('.npy', '.json'):
+        try:
+            os.unlink(panel_path(name) + suffix)
+        except OSError:
+            pass
+
+
+class PricePanel(Mapping):
+    """
+    Price history for a whole universe in one contiguous (symbols x days x fields)
+    float32 array, with a shared date index and a symbol -> row map.
+
+    It stands in for the {symbol: OHLCV DataFrame} dict the scanners pass around:
+    panel[symbol] is a DataFrame over a view of that symbol's row, trimmed to the
+    bars it actually has (a symbol with gaps mid-history gets a filtered copy).
+    float32 keeps ~7 significant digits, plenty for prices and share volumes.
+    save()/open() share one panel between processes as a read-only memory map.
+    """
+
+    def __init__(self, values, index, symbols, fields=PANEL_FIELDS, start=None, gaps=None):
+        self.values = values
+        self.index = index
+        self.fields = list(fields)
+        self.symbols = list(symbols)
+        self._rows = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+        if start is None or gaps is None:
+            # Bars a symbol has = no field missing (matches dropna() on the source frames)
+            has_bar = ~np.isnan(values).any(axis=2)
+            start = has_bar.argmax(axis=1) if has_bar.size else np.zeros(len(self.symbols), dtype=int)
+            gaps = (~has_bar & (np.arange(len(index)) >= start[:, None])).any(axis=1)
+        self._start = start
+        self._gaps = gaps
+
+    @classmethod
+    def from_frames(cls, price_data, fields=PANEL_FIELDS, dtype=PANEL_DTYPE):
+        """Build a panel from {symbol: OHLCV DataFrame}."""
+        builder = PanelBuilder(list(price_data), fields, dtype)
+        for symbol, df in price_data.items():
+            builder.add(symbol, df)
+        return builder.build()
+
+    def save(self, path):
+        """
+        Write the panel to <path>.npy (the raw array) and <path>.json (dates,
+        symbols, fields) for open(). Each file is replaced atomically, and a
+        process that already mapped the previous array keeps reading it.
+        """
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.npy')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.ascontiguousarray(self.values))
+            os.replace(tmp_path, path + '.npy')
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        meta = {
+            'shape': list(self.values.shape),
+            'fields': self.fields,
+            'symbols': self.symbols,
+            'dates': [d.isoformat() for d in self.index],
+            'tz': str(self.index.tz) if self.index.tz is not None else None,
+            'start': self._start.tolist(),
+            'gaps': np.flatnonzero(self._gaps).tolist(),
+        }
+        _atomic_write(path + '.json', json.dumps(meta).encode('utf-8'))
+        return path
+
+    @classmethod
+    def open(cls, path):
+        """
+        Map a saved panel read-only. Nothing is copied or unpickled: every process
+        that opens the same file reads the same pages from the OS page cache.
+        """
+        with open(path + '.json') as f:
+            meta = json.load(f)
+        values = np.load(path + '.npy', mmap_mode='r')
+        if list(values.shape) != meta['shape']:
+            raise ValueError(f"Panel {path}: array and sidecar do not match (replaced while opening?)")
+        index = pd.to_datetime(meta['dates'], utc=meta['tz'] is not None)
+        if meta['tz'] is not None:
+            index = index.tz_convert(meta['tz'])
+        gaps = np.zeros(len(meta['symbols']), dtype=bool)
+        gaps[meta['gaps']] = True
+        return cls(values, pd.DatetimeIndex(index), meta['symbols'], meta['fields'],
+                   start=np.array(meta['start'], dtype=int), gaps=gaps)
+
+    def __getitem__(self, symbol):
+        i = self._rows[symbol]
+        block = np.asarray(self.values[i, self._start[i]:])
+        index = self.index[self._start[i]:]
+        if self._gaps[i]:
+            keep = ~np.isnan(block).any(axis=1)
+            block, index = block[keep], index[keep]
+        return pd.DataFrame(block, index=index, columns=self.fields, copy=False)
+
+    def __contains__(self, symbol):
+        return symbol in self._rows
+
+    def __iter__(self):
+        return iter(self.symbols)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    def field(self, name):
+        """One field as a date x symbol frame (a view, NaN where a symbol has no bar)."""
+        k = self.fields.index(name)
+        return pd.DataFrame(np.asarray(self.values[:, :, k]).T, index=self.index, columns=self.symbols, copy=False)
+
+
+class PanelBuilder:
+    """
+    Fills a PricePanel one frame at a time, so a download never holds every
+    symbol's float64 DataFrame at once.
+
+    The array is allocated for all expected symbols on the first frame, using its
+    dates; a later frame with dates outside them widens the index (one copy).
+    """
+
+    def __init__(self, symbols, fields=PANEL_FIELDS, dtype=PANEL_DTYPE):
+        self.symbols = list(dict.fromkeys(symbols))
+        self.fields = list(fields)
+        self.dtype = dtype
+        self._rows = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._present = np.zeros(len(self.symbols), dtype=bool)
+        self.index = None
+        self.values = None
+
+    def _widen(self, dates):
+        index = self.index.union(dates)
+        values = np.full((len(self.symbols), len(index), len(self.fields)), np.nan, dtype=self.dtype)
+        values[:, index.get_indexer(self.index)] = self.values
+        self.index, self.values = index, values
+
+    def add(self, symbol, df):
+        row = self._rows.get(symbol)
+        if row is None or df is None or df.empty:
+            return
+        if self.index is None:
+            self.index = df.index.sort_values()
+            self.values = np.full((len(self.symbols), len(self.index), len(self.fields)), np.nan,
+                                  dtype=self.dtype)
+        elif not df.index.equals(self.index) and not df.index.isin(self.index).all():
+            self._widen(df.index)
+
+        block = df.to_numpy(dtype=self.dtype)[:, [df.columns.get_loc(field) for field in self.fields]]
+        if df.index.equals(self.index):
+            self.values[row] = block
+        else:
+            self.values[row, self.index.get_indexer(df.index)] = block
+        self._present[row] = True
+
+    def build(self):
+        """PricePanel of the symbols that were added, in the order they were expected."""
+        if self.values is None:
+            return PricePanel(np.empty((0, 0, len(self.fields)), dtype=self.dtype),
+                              pd.DatetimeIndex([]), [], self.fields)
+        rows = np.flatnonzero(self._present)
+        # Close up rows of symbols that never arrived in place, instead of copying the array
+        for new, old in enumerate(rows):
+            if new != old:
+                self.values[new] = self.values[old]
+        values = self.values[:len(rows)]
+        return PricePanel(values, self.index, [self.symbols[i] for i in rows], self.fields)
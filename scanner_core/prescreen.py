@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# scanner_core/prescreen.py
+# Cheap whole-universe filters run as array operations before the pattern detectors
+
+import json
+import os
+
+import numpy as np
+
+from scanner_core.indicators import field_panels
+
+# Each key is one funnel stage; set a value to None/False to switch that stage off.
+# min_bars and max_below_high_pct are loose enough to keep every cup the detector
+# can accept (cups are at most 35% deep and the handle sits near the right rim).
+# above_sma200, min_dollar_volume and max_volatility_pct are deliberate policy
+# filters: they do remove detector hits, e.g. FORMING cups still below the
+# 200-day line.
+PRESCREEN_DEFAULTS = {
+    'min_bars': 150,                  # enough history for detect_cup_and_handle
+    'above_sma200': True,             # last close above the 200-day average
+    'max_below_high_pct': 40.0,       # within 40% of the 52-week high
+    'min_dollar_volume': 2_000_000,   # 50-day average close x volume
+    'max_volatility_pct': 6.0,        # 50-day stdev of daily returns
+}
+
+
+def prescreen_config_from_env(value=None):
+    """
+    SCAN_PRESCREEN: unset -> defaults, "0"/"off" -> disabled (None),
+    JSON object -> defaults overridden per key, e.g. {"min_dollar_volume": 1e7}.
+    """
+    value = os.environ.get('SCAN_PRESCREEN', '') if value is None else value
+    if value.strip().lower() in ('0', 'off', 'false', 'no'):
+        return None
+    config = dict(PRESCREEN_DEFAULTS)
+    if value.strip():
+        try:
+            config.update(json.loads(value))
+        except ValueError as e:
+            print(f"Ignoring invalid SCAN_PRESCREEN ({e}); using defaults")
+    return config
+
+
+def _last_valid(values, valid):
+    n, columns = values.shape
+    return values[n - 1 - valid[::-1].argmax(axis=0), np.arange(columns)]
+
+
+def _window_mean(values, rows, min_count):
+    window = values[-rows:]
+    count = np.sum(~np.isnan(window), axis=0)
+    with np.errstate(invalid='ignore'):
+        mean = np.nansum(window, axis=0) / count
+    return np.where(count >= min_count, mean, np.nan)
+
+
+def prescreen(price_data, config=PRESCREEN_DEFAULTS):
+    """
+    Evaluate every stage in `config` for the whole universe at once.
+
+    Returns (survivors, funnel): survivors keeps the input order, funnel is a
+    list of (stage label, symbols remaining) starting with the downloaded count.
+    A stage a symbol can't be measured on (e.g. <200 bars for the SMA200) passes.
+    """
+    symbols = list(price_data)
+    funnel = [('downloaded', len(symbols))]
+    if not symbols or not config:
+        return symbols, funnel
+
+    panels = field_panels(price_data, ('Close', 'High', 'Volume'))
+    closes = panels['Close'].to_numpy()
+    valid = ~np.isnan(closes)
+    last = _last_valid(closes, valid)
+    keep = valid.any(axis=0)
+
+    def stage(label, passed):
+        nonlocal keep
+        keep = keep & passed
+        funnel.append((label, int(keep.sum())))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if config.get('min_bars'):
+            stage(f"≥{config['min_bars']} bars", valid.sum(axis=0) >= config['min_bars'])
+
+        if config.get('above_sma200'):
+            sma200 = _window_mean(closes, 200, 200)
+            stage('above SMA200', np.isnan(sma200) | (last > sma200))
+
+        if config.get('max_below_high_pct'):
+            highs = panels['High'].to_numpy()[-252:]
+            high_52w = np.nanmax(np.where(np.isnan(highs), -np.inf, highs), axis=0)
+            below_high = (1 - last / high_52w) * 100
+            stage(f"within {config['max_below_high_pct']:g}% of 52w high",
+                  ~(below_high > config['max_below_high_pct']))
+
+        if config.get('min_dollar_volume'):
+            volumes = panels['Volume'].to_numpy()
+            dollar_volume = _window_mean(closes * volumes, 50, 20)
+            stage(f"≥${config['min_dollar_volume'] / 1e6:,.1f}M daily $ volume",
+                  ~(dollar_volume < config['min_dollar_volume']))
+
+        if config.get('max_volatility_pct'):
+            returns = closes[-51:][1:] / closes[-51:][:-1] - 1
+            volatility = np.nanstd(returns, axis=0) * 100
+            stage(f"volatility ≤{config['max_volatility_pct']:g}%/day",
+                  ~(volatility > config['max_volatility_pct']))
+
+    return [symbol for symbol, ok in zip(symbols, keep) if ok], funnel
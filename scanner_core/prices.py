@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# scanner_core/prices.py
+# Batched price-history download backed by a shared on-disk per-symbol cache
+
+import os
+
+import pandas as pd
+
+from scanner_core.cache import DiskCache
+from scanner_core.metrics import stage_timer
+from scanner_core.panel import PanelBuilder
+from scanner_core.providers import ProviderUnavailable, provider_call
+from scanner_core.schedule import quiet_max_age
+
+PRICE_CACHE_TTL = int(os.environ.get('PRICE_CACHE_TTL', 15 * 60))
+DOWNLOAD_CHUNK_SIZE = 100
+
+price_cache = DiskCache('prices', ttl=PRICE_CACHE_TTL)
+
+
+def _split_download(data, chunk):
+    """Split a yf.download frame into {symbol: OHLCV frame}."""
+    frames = {}
+    if isinstance(data.columns, pd.MultiIndex):
+        available = set(data.columns.get_level_values(0))
+        for symbol in chunk:
+            if symbol in available:
+                frames[symbol] = data[symbol].dropna()
+    elif len(chunk) == 1:
+        frames[chunk[0]] = data.dropna()
+    return frames
+
+
+def download_history(tickers, period="1y", chunk_size=DOWNLOAD_CHUNK_SIZE, progress_callback=None,
+                     use_cache=True, compact=False):
+    """
+    Return {symbol: OHLCV DataFrame} for tickers, in ticker order.
+
+    Symbols with a fresh cached copy (PRICE_CACHE_TTL, or anything saved since the
+    last close while the market is shut) skip the network; the rest
+    are fetched with one yf.download call per chunk and written back to the cache
+    so other processes and apps reuse them.
+
+    While Yahoo's circuit breaker is open (scanner_core/providers.py) chunks are
+    not requested at all; symbols fall back to their last cached copy of any age.
+
+    compact=True returns a float32 PricePanel (scanner_core/panel.py) instead,
+    filled frame by frame as they arrive, so the full set of DataFrames is never
+    held at once.
+    """
+    import yfinance as yf
+
+    if compact:
+        builder = PanelBuilder(tickers)
+        store = builder.add
+    else:
+        all_data = {}
+        store = all_data.__setitem__
+
+    missing = []
+    max_age = quiet_max_age(PRICE_CACHE_TTL)
+    for symbol in tickers:
+        df = price_cache.get((symbol, period), max_age=max_age) if use_cache else None
+        if df is not None:
+            store(symbol, df)
+        else:
+            missing.append(symbol)
+
+    total = len(tickers)
+    cached = total - len(missing)
+    if cached:
+        print(f"Price cache: {cached}/{total} symbols fresh, downloading {len(missing)}")
+
+    for i in range(0, len(missing), chunk_size):
+        chunk = missing[i:i + chunk_size]
+        try:
+            with stage_timer('chunk_download'), provider_call('yahoo') as call:
+                data = yf.download(' '.join(chunk), period=period, group_by='ticker',
+                                   progress=False, threads=True)
+                if data is None or data.empty:
+                    call.error('empty')  # yf.download reports throttling as an empty frame, not an error
+            for symbol, df in _split_download(data, chunk).items():
+                if not df.empty:
+                    store(symbol, df)
+                    price_cache.set((symbol, period), df)
+        except ProviderUnavailable as e:
+            # Yahoo is failing fast: scan on the last cached copy of these symbols, however old
+            stale = 0
+            for symbol in chunk:
+                df = price_cache.get((symbol, period), max_age=float('inf')) if use_cache else None
+                if df is not None:
+                    store(symbol, df)
+                    stale += 1
+            print(f"Chunk download skipped ({e}); {stale}/{len(chunk)} symbols from stale cache")
+        except Exception as e:
+            print(f"Chunk download error: {e}")
+
+        if progress_callback:
+            done = cached + min(i + chunk_size, len(missing))
+            progress_callback(done, total, f"Downloaded {done}/{total}")
+
+    if compact:
+        return builder.build()
+    return {symbol: all_data[symbol] for symbol in tickers if symbol in all_data}
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+# scanner_core/providers.py
+# Per-provider rate limiting (token bucket) and circuit breaking for every call
+# to an external data source, so one throttled provider fails fast instead of
+# stalling a scan or a page on timeouts
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from scanner_core import metrics
+from scanner_core.cache import DiskCache
+from scanner_core.metrics import track_request
+
+# rate: tokens/second, burst: bucket size, max_wait: longest a call queues for a token,
+# failures: consecutive failed calls that open the breaker, cooldown: seconds it stays open
+PROVIDER_DEFAULTS = {
+    'yahoo': {'rate': 8.0, 'burst': 16, 'max_wait': 30.0, 'failures': 8, 'cooldown': 120},
+    'nasdaq': {'rate': 0.5, 'burst': 2, 'max_wait': 10.0, 'failures': 3, 'cooldown': 300},
+    'github': {'rate': 0.5, 'burst': 2, 'max_wait': 10.0, 'failures': 3, 'cooldown': 300},
+    'reddit': {'rate': 0.5, 'burst': 2, 'max_wait': 2.0, 'failures': 3, 'cooldown': 600},
+    'stocktwits': {'rate': 1.0, 'burst': 3, 'max_wait': 2.0, 'failures': 3, 'cooldown': 600},
+}
+FALLBACK_LIMITS = {'rate': 2.0, 'burst': 4, 'max_wait': 10.0, 'failures': 5, 'cooldown': 120}
+# How often a process looks for a breaker opened by another process
+SHARED_CHECK_SECONDS = 2.0
+# Exceptions (by class name, so yfinance needn't be imported) that count against a provider
+# besides OSErrors; see _provider_fault
+_PROVIDER_ERRORS = ('YFRateLimitError',)
+# Longest a half-open trial call holds the slot before another caller may try
+TRIAL_SECONDS = 60.0
+
+
+class ProviderUnavailable(RuntimeError):
+    """Raised instead of calling a provider whose breaker is open or whose rate budget is spent."""
+
+    def __init__(self, provider, reason, retry_after=None):
+        self.provider = provider
+        self.reason = reason
+        self.retry_after = retry_after
+        detail = f", retry in {retry_after:.0f}s" if retry_after else ''
+        super().__init__(f"{provider} unavailable ({reason}{detail})")
+
+
+def provider_limits_from_env(value=None):
+    """
+    PROVIDER_LIMITS: JSON object of per-provider overrides on PROVIDER_DEFAULTS,
+    e.g. {"yahoo": {"rate": 2, "cooldown": 300}}.
+    """
+    value = os.environ.get('PROVIDER_LIMITS', '') if value is None else value
+    defaults = {name: dict(config) for name, config in PROVIDER_DEFAULTS.items()}
+    if not value.strip():
+        return defaults
+    limits = {name: dict(config) for name, config in PROVIDER_DEFAULTS.items()}
+    try:
+        for name, overrides in json.loads(value).items():
+            limits.setdefault(name, dict(FALLBACK_LIMITS)).update(overrides)
+    except (ValueError, TypeError, AttributeError) as e:
+        print(f"Ignoring invalid PROVIDER_LIMITS ({e}); using defaults")
+        return defaults
+    return limits
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` calls/second sustained, bursts of up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait=None):
+        """
+        Take a token, sleeping until one is due. Returns False without waiting if
+        that would take longer than max_wait (callers queued ahead count too).
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if max_wait is not None and wait > max_wait:
+                return False
+            self._tokens -= 1  # reserved now, so later callers queue behind this one
+        if wait:
+            time.sleep(wait)
+        return True
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive failed calls and rejects calls for
+    `cooldown` seconds. It is then half-open: one caller gets the trial call
+    while everyone else is still rejected; the trial's success closes the
+    breaker, its failure reopens it at once. Open state and trial claims are
+    written to the shared disk cache, so every worker process stops calling the
+    provider and, give or take a SHARED_CHECK_SECONDS race, only one process
+    runs the trial.
+    """
+
+    _shared = DiskCache('breakers')
+
+    def __init__(self, provider, failures, cooldown):
+        self.provider = provider
+        self.threshold = max(1, int(failures))
+        self.cooldown = float(cooldown)
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial_until = 0.0
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _sync(self, now):
+        """Adopt an open (or trial) window, or a close, written by another process."""
+        if now - self._checked <= SHARED_CHECK_SECONDS:
+            return
+        self._checked = now
+        shared = self._shared.get(self.provider, max_age=float('inf'))
+        with self._lock:
+            if shared and shared > max(now, self.open_until):
+                self.open_until = shared
+                self.failures = self.threshold - 1
+            elif shared == 0 and self.open_until and now >= max(self.open_until, self.trial_until):
+                # Another process's trial succeeded
+                self.open_until = 0.0
+                self.failures = 0
+
+    def acquire(self):
+        """
+        Admit one call: returns (0, is_trial) when it may go ahead, or
+        (seconds until the next try, False) while open or while another
+        caller's trial is in flight.
+        """
+        now = time.time()
+        self._sync(now)
+        with self._lock:
+            if not self.open_until:
+                return 0.0, False
+            if now < max(self.open_until, self.trial_until):
+                return max(self.open_until, self.trial_until) - now, False
+            # Half-open: this caller takes the trial slot (held for at most TRIAL_SECONDS)
+            self.trial_until = now + TRIAL_SECONDS
+        self._shared.set(self.provider, self.trial_until)
+        return 0.0, True
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            was_open, self.open_until, self.trial_until = bool(self.open_until), 0.0, 0.0
+        if was_open:
+            self._shared.set(self.provider, 0.0)
+            metrics.PROVIDER_CIRCUIT_OPEN.set(0, provider=self.provider)
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_until = 0.0
+            if self.failures < self.threshold:
+                return
+            self.failures = self.threshold - 1
+            self.open_until = time.time() + self.cooldown
+        self._shared.set(self.provider, self.open_until)
+        metrics.PROVIDER_CIRCUIT_OPEN.set(1, provider=self.provider)
+        print(f"Circuit open for {self.provider}: failing fast for {self.cooldown:.0f}s")
+
+    def release(self):
+        """Give back the trial slot without a verdict (the trial call failed on the caller's side)."""
+        now = time.time()
+        with self._lock:
+            self.trial_until = 0.0
+            self.open_until = min(self.open_until, now) if self.open_until else 0.0
+            reopen = self.open_until
+        if reopen:
+            self._shared.set(self.provider, reopen)
+
+
+class ProviderGuard:
+    """The rate limiter and circuit breaker for one provider."""
+
+    def __init__(self, provider, rate, burst, max_wait, failures, cooldown):
+        self.provider = provider
+        self.max_wait = max_wait
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(provider, failures, cooldown)
+
+    def admit(self):
+        """Returns True if this call is the breaker's half-open trial."""
+        retry_after, trial = self.breaker.acquire()
+        if retry_after:
+            metrics.EXTERNAL_REQUESTS.inc(provider=self.provider, outcome='circuit_open')
+            raise ProviderUnavailable(self.provider, 'circuit open', retry_after)
+        if not self.bucket.acquire(self.max_wait):
+            if trial:
+                self.breaker.release()
+            metrics.EXTERNAL_REQUESTS.inc(provider=self.provider, outcome='rate_limited')
+            raise ProviderUnavailable(self.provider, 'rate limited')
+        return trial
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+_limits = None
+
+
+def get_guard(provider):
+    """Process-wide ProviderGuard for provider (limits from PROVIDER_LIMITS)."""
+    global _limits
+    guard = _guards.get(provider)
+    if guard is None:
+        with _guards_lock:
+            if _limits is None:
+                _limits = provider_limits_from_env()
+            guard = _guards.get(provider)
+            if guard is None:
+                config = {**FALLBACK_LIMITS, **_limits.get(provider, {})}
+                guard = _guards[provider] = ProviderGuard(provider, **{k: config[k] for k in FALLBACK_LIMITS})
+    return guard
+
+
+def _healthy(outcome):
+    # 4xx other than 429 is our request's fault (unknown symbol ...), not the provider's
+    return outcome == 'ok' or (outcome.startswith('http_4') and outcome != 'http_429')
+
+
+def _provider_fault(exc):
+    """
+    Whether an exception raised inside a provider call is the provider's fault:
+    connection errors, timeouts and HTTP error statuses (requests and curl_cffi
+    exceptions are OSErrors), or yfinance's rate-limit error. Anything else - a
+    parse error on one response, a delisted symbol - is the caller's problem
+    and must not open the breaker for every process.
+    """
+    if any(cls.__name__ in _PROVIDER_ERRORS for cls in type(exc).__mro__):
+        return True
+    # requests' JSONDecodeError is an OSError too, but a bad body is one response's problem
+    if not isinstance(exc, OSError) or isinstance(exc, ValueError):
+        return False
+    status_code = getattr(getattr(exc, 'response', None), 'status_code', None)
+    return status_code is None or not _healthy(f'http_{status_code}')
+
+
+@contextmanager
+def provider_call(provider):
+    """
+    Guarded, tracked call to an external provider: waits for a rate-limit token,
+    raises ProviderUnavailable at once while the provider's breaker is open, and
+    feeds the outcome (call.check_status / call.error, or a transport / HTTP
+    error raised in the body) back to it.
+    Yields the same call object as metrics.track_request.
+    """
+    guard = get_guard(provider)
+    trial = guard.admit()
+    try:
+        with track_request(provider) as call:
+            yield call
+    except Exception as e:
+        if _provider_fault(e):
+            guard.breaker.failure()
+        elif trial:
+            guard.breaker.release()
+        raise
+    if _healthy(call.outcome):
+        guard.breaker.success()
+    else:
+        guard.breaker.failure()
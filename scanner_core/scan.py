@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+# scanner_core/scan.py
+# The full market scan pipeline (download -> pre-screen -> RS -> detectors ->
+# metadata and DCF), shared by the Flask app, the scheduler and the CLI
+
+from scanner_core import metrics
+from scanner_core.analysis import analyze_universe
+from scanner_core.dcf import dcf_monte_carlo, dcf_sensitivity, dcf_valuation, get_fundamentals
+from scanner_core.fetch import fetch_many
+from scanner_core.indicators import close_panel, rank_rs, recent_golden_crosses, rs_scores
+from scanner_core.metadata import get_metadata
+from scanner_core.metrics import stage_timer
+from scanner_core.prescreen import PRESCREEN_DEFAULTS, prescreen
+from scanner_core.prices import download_history
+from scanner_core.universe import SP500_TICKERS, market_tickers
+
+# Result order: status (best first), then signal score, then pattern count
+STATUS_ORDER = {"STRONG BUY": 0, "BUY": 1, "FORMING - NEAR BREAKOUT": 2, "FORMING": 3, "WATCH": 4}
+
+
+def sort_results(results):
+    """Sort hits in place: status (best first), then score (highest first), then pattern count."""
+    results.sort(key=lambda x: (STATUS_ORDER.get(x['status'], 5), -x['signal_score'], -x['pattern_count']))
+    return results
+
+
+def scan_for_patterns(tickers=None, progress_callback=None, min_rs=0, stats=None,
+                      prescreen_config=PRESCREEN_DEFAULTS, compact=False, workers=1, panel_name='scan',
+                      raw_rs=None):
+    """
+    Download, pre-screen, rate and analyze tickers; return the cup & handle hits, best first.
+
+    prescreen_config selects the vectorized pre-screen stages (scanner_core/prescreen.py;
+    None disables them). min_rs then skips symbols whose relative strength rating
+    (1-99, ranked across everything downloaded) is below it. Both run before any
+    pattern detection. If a stats dict is passed it is filled with per-phase symbol
+    counts, the funnel as (stage, symbols remaining) pairs and golden_crosses:
+    [symbol, days since, RS] for every downloaded symbol whose SMA50 crossed above
+    its SMA200 in the last 20 bars, freshest first. A raw_rs dict is filled with
+    every downloaded symbol's unranked RS score, so shards of one universe can be
+    re-ranked together (scanner_core/shard.py).
+
+    compact=True holds the downloaded prices as one float32 PricePanel
+    (scanner_core/panel.py) and runs the detectors on views of it. workers > 1
+    saves that panel as panel_name in the shared cache and analyzes on a
+    process pool that memory-maps it read-only (scanner_core/analysis.py).
+    """
+    if tickers is None:
+        tickers = market_tickers('sp500', fallback=SP500_TICKERS)
+
+    total = len(tickers)
+    
+    # Batch download all data at once - MUCH faster than individual calls.
+    # Chunks of 100 avoid timeouts; symbols in the shared price cache skip the network.
+    print(f"Batch downloading {len(tickers)} stocks...")
+    all_data = download_history(tickers, period="1y", progress_callback=progress_callback, compact=compact)
+    
+    print(f"Download complete. Analyzing {len(all_data)} stocks...")
+    metrics.SCAN_SYMBOLS.inc(total, phase='requested')
+    metrics.SCAN_SYMBOLS.inc(len(all_data), phase='downloaded')
+    
+    # Cheap whole-universe filters as array operations: only survivors reach the detectors
+    with stage_timer('prescreen'):
+        survivors, funnel = prescreen(all_data, prescreen_config)
+    metrics.SCAN_SYMBOLS.inc(len(survivors), phase='prescreened')
+    
+    # Relative strength across the whole downloaded universe, one vectorized pass
+    closes = close_panel(all_data)
+    with stage_timer('rs_rating'):
+        scores = rs_scores(closes)
+        rs = rank_rs(scores)
+    if raw_rs is not None:
+        raw_rs.update(scores.to_dict())
+    # Recent golden crosses over the same panel - every downloaded symbol, not only cup hits
+    with stage_timer('golden_cross_screen'):
+        golden_crosses = recent_golden_crosses(closes)
+    prescreened = len(survivors)
+    if min_rs:
+        survivors = [symbol for symbol in survivors if rs.get(symbol, 0) >= min_rs]
+        funnel.append((f"RS ≥ {min_rs}", len(survivors)))
+    rs_skipped = prescreened - len(survivors)
+
+    # Detectors + breakout scoring per survivor (on worker processes sharing a mapped panel if workers > 1)
+    results, analyzed = analyze_universe(all_data, survivors, rs, workers=workers, panel_name=panel_name,
+                                         progress_callback=progress_callback)
+    metrics.SCAN_SYMBOLS.inc(analyzed, phase='analyzed')
+
+    # Company name/sector/industry from the screener metadata table - no per-symbol ticker.info
+    metadata = get_metadata()
+    for analysis in results:
+        for field in ('name', 'sector', 'industry'):
+            analysis[field] = metadata.field(analysis['symbol'], field)
+
+    # Calculate DCF for stocks with patterns - the fundamentals fetch is network bound, so
+    # it runs concurrently; point value and sensitivity grid are then pure numpy on that data
+    fundamentals = fetch_many(get_fundamentals, [r['symbol'] for r in results])
+    for analysis in results:
+        data = fundamentals.get(analysis['symbol']) or {'status': 'error'}
+        with stage_timer('dcf'):
+            dcf_result = dcf_valuation(data)
+            sensitivity = dcf_sensitivity(data)
+            simulated = dcf_monte_carlo(data)
+        analysis['dcf_value'] = dcf_result.get('dcf_value')
+        analysis['margin_of_safety'] = dcf_result.get('margin')
+        analysis['dcf_min'] = sensitivity.get('min')
+        analysis['dcf_median'] = sensitivity.get('median')
+        analysis['dcf_max'] = sensitivity.get('max')
+        analysis['dcf_p10'] = simulated.get('p10')
+        analysis['dcf_p50'] = simulated.get('p50')
+        analysis['dcf_p90'] = simulated.get('p90')
+        analysis['prob_undervalued'] = simulated.get('prob_undervalued')
+
+    print(f"Analysis complete. Found {len(results)} patterns.")
+    metrics.SCAN_SYMBOLS.inc(rs_skipped, phase='rs_filtered')
+    metrics.SCAN_SYMBOLS.inc(len(results), phase='matched')
+    if stats is not None:
+        stats.update({
+            'requested': total,
+            'downloaded': len(all_data),
+            'prescreened': prescreened,
+            'rs_filtered': rs_skipped,
+            'analyzed': analyzed,
+            'matched': len(results),
+            'funnel': funnel + [('analyzed', analyzed), ('matched', len(results))],
+            'golden_crosses': sorted(([symbol, days, rs.get(symbol)] for symbol, days in golden_crosses.items()),
+                                     key=lambda g: (g[1], -(g[2] or 0))),
+        })
+    
+    return sort_results(results)
+
+
+
+
+def record_scan(store, market, results, meta, events=None):
+    """
+    Save a finished scan to store (a ScanStore) for every process, first appending
+    its changes against the previous stored scan of that market to `events` (an
+    EventLog), if given. meta gains 'events' and 'last_event_seq'; returns the events.
+    """
+    from scanner_core.events import diff_scans  # events imports STATUS_ORDER from here
+
+    appended = []
+    if events is not None:
+        previous = store.load(market, max_age=float('inf'))
+        if previous:
+            appended = events.append(diff_scans(previous['results'], results), market=market,
+                                     scanned_at=meta.get('scanned_at'),
+                                     prev_scanned_at=previous['meta'].get('scanned_at'))
+            if appended:
+                print(f"Scan events: {len(appended)} changes since {previous['meta'].get('scanned_at')}")
+        meta['events'] = len(appended)
+        meta['last_event_seq'] = appended[-1]['seq'] if appended else events.last_seq()
+    store.save(market, results, meta)
+    return appended
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# scanner_core/schedule.py
+# US market-hours helpers and a small cross-process scheduler for off-hours jobs
+# (the scan/cache warm-up that runs after the close and before the open)
+
+import threading
+import time as _time
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from scanner_core.cache import DiskCache, file_lock
+
+MARKET_TZ = ZoneInfo('America/New_York')
+MARKET_OPEN = time(9, 30)
+MARKET_CLOSE = time(16, 0)
+# Yahoo's daily bars take a few minutes after the close to settle
+CLOSE_SETTLE = 15 * 60
+
+SCHEDULE_POLL = 30
+# A slot missed (process down) by more than this is skipped rather than run late
+SCHEDULE_GRACE = 2 * 3600
+
+
+def market_now(now=None):
+    """now (default: the current time) as an aware datetime in the market timezone."""
+    if now is None:
+        return datetime.now(MARKET_TZ)
+    if now.tzinfo is None:
+        now = now.astimezone()
+    return now.astimezone(MARKET_TZ)
+
+
+def market_is_open(now=None):
+    """True during the regular Monday-Friday session (exchange holidays are not modelled)."""
+    now = market_now(now)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+
+def last_close(now=None):
+    """The most recent regular-session close at or before now."""
+    now = market_now(now)
+    day = now.date()
+    if now.time() < MARKET_CLOSE:
+        day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return datetime.combine(day, MARKET_CLOSE, tzinfo=MARKET_TZ)
+
+
+def quiet_max_age(ttl, now=None):
+    """
+    Cache max_age that accounts for market hours.
+
+    During the session this is just ttl. While the market is closed prices don't
+    move, so anything written after the last close (plus CLOSE_SETTLE) stays
+    fresh until the next open: a scan warmed at 16:30 or 08:00 still serves the
+    first request of the morning instead of being re-run on the spot.
+    """
+    now = market_now(now)
+    if market_is_open(now):
+        return ttl
+    since_close = (now - last_close(now)).total_seconds() - CLOSE_SETTLE
+    return max(ttl, since_close)
+
+
+def parse_schedule(spec):
+    """
+    Parse "HH:MM=market,market;HH:MM=market" (market-timezone times, weekdays)
+    into a sorted [(time, (markets...))]. Malformed entries are reported and skipped.
+    """
+    slots = []
+    for entry in (spec or '').split(';'):
+        entry = entry.strip()
+        if not entry:
+            continue
+        try:
+            at, markets = entry.split('=', 1)
+            hour, minute = at.strip().split(':')
+            markets = tuple(m.strip().lower() for m in markets.split(',') if m.strip())
+            if not markets:
+                raise ValueError('no markets')
+            slots.append((time(int(hour), int(minute)), markets))
+        except ValueError as e:
+            print(f"Ignoring schedule entry {entry!r}: {e}")
+    return sorted(slots)
+
+
+class Scheduler:
+    """
+    Runs job(markets) at each scheduled (time, markets) slot, Monday to Friday.
+
+    Every worker process may start one: a non-blocking file lock elects the
+    process that actually polls (another takes over if it exits), and each
+    finished slot is recorded in the shared disk cache so a restart doesn't run
+    it twice. Slots missed by more than SCHEDULE_GRACE are skipped.
+    """
+
+    def __init__(self, schedule, job, name='scheduler', poll=SCHEDULE_POLL):
+        self.schedule = list(schedule)
+        self.job = job
+        self.name = name
+        self.poll = poll
+        self.done = DiskCache(name)
+        self._thread = None
+
+    def due(self, now=None):
+        """[(slot key, markets)] of today's slots that are due and not done yet."""
+        now = market_now(now)
+        if now.weekday() >= 5:
+            return []
+        pending = []
+        for at, markets in self.schedule:
+            slot_time = datetime.combine(now.date(), at, tzinfo=MARKET_TZ)
+            lateness = (now - slot_time).total_seconds()
+            key = (now.date().isoformat(), at.strftime('%H:%M'))
+            if 0 <= lateness <= SCHEDULE_GRACE and self.done.get(key, max_age=float('inf')) is None:
+                pending.append((key, markets))
+        return pending
+
+    def run_pending(self, now=None):
+        for key, markets in self.due(now):
+            print(f"Scheduled job {key[0]} {key[1]}: {', '.join(markets)}")
+            started = _time.perf_counter()
+            try:
+                self.job(markets)
+            except Exception as e:
+                print(f"Scheduled job {key[1]} failed: {e}")
+            # Recorded even on failure, so a broken job isn't retried every poll
+            self.done.set(key, {'markets': markets, 'seconds': round(_time.perf_counter() - started, 1)})
+
+    def _loop(self):
+        while True:
+            with file_lock(self.name, blocking=False) as leader:
+                while leader:
+                    self.run_pending()
+                    _time.sleep(self.poll)
+            _time.sleep(self.poll)
+
+    def start(self):
+        """Start the daemon thread (once per process); no-op without a schedule."""
+        if self.schedule and self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+            self._thread.start()
+        return self
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+# scanner_core/search.py
+# In-memory prefix index over symbols and company names for typeahead search
+
+import heapq
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from scanner_core.universe import UNIVERSE_TTL, load_screener_snapshot, snapshot_version
+
+_TOKEN = re.compile(r'[A-Z0-9]+')
+
+
+def _tokens(text):
+    return _TOKEN.findall(text.upper())
+
+
+def _prefix_range(keys, prefix):
+    """[lo, hi) slice of a sorted key list whose entries start with prefix."""
+    lo = bisect_left(keys, prefix)
+    hi = bisect_left(keys, prefix + '\uffff')
+    return lo, hi
+
+
+class SymbolIndex:
+    """
+    Sorted-key prefix index: one sorted list for symbols and one for name words,
+    each searched with bisect, so a lookup costs O(log n + matches).
+    """
+
+    def __init__(self, rows):
+        # Row position doubles as rank (largest market cap first), so ordering hits is an int compare
+        self.rows = sorted({row['symbol']: row for row in rows}.values(),
+                           key=lambda row: (-(row.get('market_cap') or 0), row['symbol']))
+        symbols = sorted((row['symbol'], i) for i, row in enumerate(self.rows))
+        self._symbol_keys = [s for s, _ in symbols]
+        self._symbol_rows = [i for _, i in symbols]
+        words = sorted({(token, i) for i, row in enumerate(self.rows) for token in _tokens(row['name'])})
+        self._word_keys = [w for w, _ in words]
+        self._word_rows = [i for _, i in words]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def search(self, query, limit=10):
+        """
+        Symbols starting with the query first (exact match on top, then larger
+        market caps), then companies with a name word starting with each query
+        word (e.g. "micro" -> Microsoft, "bank am" -> Bank of America).
+        """
+        query = query.strip().upper()
+        if not query:
+            return []
+
+        lo, hi = _prefix_range(self._symbol_keys, query)
+        symbol_hits = heapq.nsmallest(limit, self._symbol_rows[lo:hi])
+        if lo < hi and self._symbol_keys[lo] == query:
+            exact = self._symbol_rows[lo]
+            symbol_hits = [exact] + [i for i in symbol_hits if i != exact][:limit - 1]
+
+        name_hits = None
+        for word in _tokens(query):
+            lo, hi = _prefix_range(self._word_keys, word)
+            matched = set(self._word_rows[lo:hi])
+            name_hits = matched if name_hits is None else name_hits & matched
+            if not name_hits:
+                break
+
+        seen = set(symbol_hits)
+        ordered = symbol_hits + heapq.nsmallest(limit, (i for i in (name_hits or ()) if i not in seen))
+        return [self.rows[i] for i in ordered[:limit]]
+
+
+_index = None
+_index_version = None
+_index_built = 0.0
+_index_rebuilding = False
+_index_lock = threading.Lock()
+
+
+def _build(fallback_symbols):
+    global _index, _index_version, _index_built, _index_rebuilding
+    try:
+        rows = load_screener_snapshot()
+        if not rows and fallback_symbols:
+            rows = [{'symbol': s, 'name': s, 'exchange': 'Unknown', 'market_cap': 0} for s in fallback_symbols]
+        index = SymbolIndex(rows)
+        with _index_lock:
+            _index, _index_version, _index_built = index, snapshot_version(), time.time()
+        print(f"Symbol index built: {len(index)} symbols")
+    finally:
+        _index_rebuilding = False
+
+
+def get_symbol_index(fallback_symbols=()):
+    """
+    Process-wide SymbolIndex over the cached screener snapshot.
+
+    The first call builds it (downloading the snapshot if none is cached);
+    afterwards a stale or replaced snapshot is rebuilt on a background thread
+    while searches keep using the current index.
+    """
+    global _index_rebuilding
+    if _index is None:
+        with _index_lock:
+            needs_build = _index is None
+        if needs_build:
+            _build(fallback_symbols)
+    elif not _index_rebuilding and (snapshot_version() != _index_version
+                                    or time.time() - _index_built > UNIVERSE_TTL):
+        with _index_lock:
+            # One rebuild at a time: set until _build finishes, however long the snapshot download takes
+            start, _index_rebuilding = not _index_rebuilding, True
+        if start:
+            threading.Thread(target=_build, args=(fallback_symbols,), daemon=True).start()
+    return _index
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# scanner_core/serialize.py
+# JSON-safe conversion and compact columnar layout for scan results
+
+import math
+from datetime import date, datetime
+
+import numpy as np
+
+
+def json_safe(value):
+    """Recursively convert numpy/pandas scalars, NaN and timestamps into plain JSON types."""
+    if value is None or isinstance(value, (str, bool)):
+        return value
+    if isinstance(value, dict):
+        return {str(k): json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(v) for v in value]
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, np.float32):
+        value = float(str(value))  # shortest repr: 123.45, not 123.44999694824219
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        return None if math.isnan(value) or math.isinf(value) else value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, 'isoformat'):  # pandas.Timestamp
+        return value.isoformat()
+    if isinstance(value, np.ndarray):
+        return json_safe(value.tolist())
+    return str(value)
+
+
+def _golden(r, key):
+    gc = r.get('golden_cross')
+    return gc.get(key) if gc else None
+
+
+# Flat per-result fields for the columnar API: name -> extractor
+SCAN_FIELDS = {
+    'symbol': lambda r: r['symbol'],
+    'name': lambda r: r.get('name'),
+    'sector': lambda r: r.get('sector'),
+    'industry': lambda r: r.get('industry'),
+    'status': lambda r: r['status'],
+    'signal_score': lambda r: r['signal_score'],
+    'pattern_count': lambda r: r['pattern_count'],
+    'current_price': lambda r: r['current_price'],
+    'buy_point': lambda r: r['buy_point'],
+    'resistance': lambda r: r.get('resistance'),
+    'stop_loss': lambda r: r['stop_loss'],
+    'target': lambda r: r['target'],
+    'rr_ratio': lambda r: r['rr_ratio'],
+    'rs_rating': lambda r: r.get('rs_rating'),
+    'rsi': lambda r: r.get('rsi'),
+    'adx': lambda r: r.get('adx'),
+    'volume_ratio': lambda r: r.get('volume_ratio'),
+    'sma50': lambda r: r.get('sma50'),
+    'sma200': lambda r: r.get('sma200'),
+    'cup_depth': lambda r: r.get('cup_depth'),
+    'cup_days': lambda r: r.get('cup_days'),
+    'handle_pullback': lambda r: r.get('handle_pullback'),
+    'u_shape': lambda r: r.get('u_shape'),
+    'symmetry': lambda r: r.get('symmetry'),
+    'dcf_value': lambda r: r.get('dcf_value'),
+    'margin_of_safety': lambda r: r.get('margin_of_safety'),
+    'dcf_min': lambda r: r.get('dcf_min'),
+    'dcf_median': lambda r: r.get('dcf_median'),
+    'dcf_max': lambda r: r.get('dcf_max'),
+    'dcf_p10': lambda r: r.get('dcf_p10'),
+    'dcf_p50': lambda r: r.get('dcf_p50'),
+    'dcf_p90': lambda r: r.get('dcf_p90'),
+    'prob_undervalued': lambda r: r.get('prob_undervalued'),
+    'asc_triangle': lambda r: r.get('asc_triangle') is not None,
+    'bull_flag': lambda r: r.get('bull_flag') is not None,
+    'golden_cross': lambda r: bool(_golden(r, 'golden_cross')),
+    'days_since_golden': lambda r: _golden(r, 'days_since_golden'),
+    'sma50_above_200': lambda r: _golden(r, 'sma50_above_200'),
+}
+
+
+def scan_columns(rows, fields=None, include_criteria=False):
+    """
+    Columnar layout: {field: [value per row]}.
+
+    Repeating keys once per field instead of once per row keeps large
+    result sets small on the wire (and compresses far better).
+    """
+    fields = [f for f in (fields or SCAN_FIELDS) if f in SCAN_FIELDS]
+    columns = {name: [json_safe(SCAN_FIELDS[name](r)) for r in rows] for name in fields}
+    if include_criteria:
+        columns['criteria'] = [json_safe(r.get('criteria')) for r in rows]
+    return columns
+
+
+def history_columns(df, decimals=None):
+    """
+    OHLCV frame -> {column: list} for the React chart, converted a whole column
+    at a time (vectorized strftime/astype) instead of per row.
+    decimals rounds prices for the compact encoding.
+    """
+    index = df.index
+    prices = {name: df[column].to_numpy(dtype=float) for name, column in
+              (('price', 'Close'), ('high', 'High'), ('low', 'Low'), ('open', 'Open'))}
+    if decimals is not None:
+        prices = {name: np.round(values, decimals) for name, values in prices.items()}
+    return {
+        'date': index.strftime('%b %d').tolist(),
+        'fullDate': index.strftime('%Y-%m-%d').tolist(),
+        'price': prices['price'].tolist(),
+        'volume': df['Volume'].fillna(0).to_numpy(dtype=np.int64).tolist(),
+        'high': prices['high'].tolist(),
+        'low': prices['low'].tolist(),
+        'open': prices['open'].tolist(),
+        'index': list(range(len(df))),
+    }
+
+
+def column_records(columns):
+    """{column: list} -> [{column: value} per row]."""
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
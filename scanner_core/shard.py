@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+# scanner_core/shard.py
+# Sharded scans across machines: a coordinator splits a universe into shards on
+# a SQLite work queue, worker nodes claim and scan them, and the coordinator
+# merges the shard results back into one scan
+
+import json
+import os
+import pickle
+import socket
+import sqlite3
+import time
+import uuid
+
+from scanner_core.cache import get_cache_dir
+from scanner_core.indicators import rank_rs
+from scanner_core.prescreen import PRESCREEN_DEFAULTS
+from scanner_core.scan import scan_for_patterns, sort_results
+
+# A claimed shard whose worker hasn't finished within this long is handed out again
+SHARD_LEASE = 30 * 60
+SHARD_MAX_ATTEMPTS = 3
+SHARD_POLL = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    label TEXT,
+    params TEXT,
+    created REAL
+);
+CREATE TABLE IF NOT EXISTS shards (
+    job_id TEXT,
+    shard INTEGER,
+    tickers TEXT,
+    status TEXT DEFAULT 'pending',
+    worker TEXT,
+    attempts INTEGER DEFAULT 0,
+    claimed_at REAL,
+    finished_at REAL,
+    seconds REAL,
+    result BLOB,
+    error TEXT,
+    PRIMARY KEY (job_id, shard)
+);
+CREATE INDEX IF NOT EXISTS shards_status ON shards (status, claimed_at);
+"""
+
+
+def queue_path():
+    """Default queue database in the cache directory (point every node at one shared path)."""
+    return os.path.join(get_cache_dir(), 'shards', 'queue.sqlite')
+
+
+def split_shards(tickers, shards):
+    """
+    Deal tickers round-robin into at most `shards` lists. Universes come largest
+    market cap first, so dealing (rather than cutting) keeps shards alike in size
+    and history length.
+    """
+    shards = max(1, min(int(shards), len(tickers)))
+    return [tickers[i::shards] for i in range(shards)]
+
+
+class WorkQueue:
+    """
+    Shard queue in one SQLite file. Claims run in an IMMEDIATE transaction, so
+    each pending shard goes to exactly one worker; a shard not finished within
+    its lease (a worker died) is claimed again, up to SHARD_MAX_ATTEMPTS times.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or queue_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return _Transaction(db)
+
+    def submit(self, tickers, shards, label='scan', params=None):
+        """Queue tickers as `shards` shards of one job; returns the job id."""
+        job_id = f"{label}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("INSERT INTO jobs VALUES (?, ?, ?, ?)", (job_id, label, json.dumps(params or {}), time.time()))
+            db.executemany("INSERT INTO shards (job_id, shard, tickers) VALUES (?, ?, ?)",
+                           [(job_id, i, json.dumps(chunk)) for i, chunk in enumerate(split_shards(tickers, shards))])
+        return job_id
+
+    def claim(self, worker, job_id=None, lease=SHARD_LEASE):
+        """
+        Claim the next pending (or expired) shard: returns (job_id, shard, tickers,
+        params) or None when there is nothing to do. Expired shards that have used
+        up their attempts (their worker keeps dying) are marked failed instead.
+        """
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("UPDATE shards SET status = 'failed', error = 'lease expired on the last attempt' "
+                       "WHERE status = 'running' AND claimed_at < ? AND attempts >= ?",
+                       (now - lease, SHARD_MAX_ATTEMPTS))
+            row = db.execute(
+                "SELECT s.job_id, s.shard, s.tickers, j.params FROM shards s JOIN jobs j USING (job_id) "
+                "WHERE (s.status = 'pending' OR (s.status = 'running' AND s.claimed_at < ? AND s.attempts < ?)) "
+                "AND (? IS NULL OR s.job_id = ?) ORDER BY j.created, s.shard LIMIT 1",
+                (now - lease, SHARD_MAX_ATTEMPTS, job_id, job_id)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE shards SET status = 'running', worker = ?, claimed_at = ?, attempts = attempts + 1 "
+                       "WHERE job_id = ? AND shard = ?", (worker, now, row['job_id'], row['shard']))
+        return row['job_id'], row['shard'], json.loads(row['tickers']), json.loads(row['params'])
+
+    def complete(self, job_id, shard, worker, payload, seconds):
+        """
+        Store a shard's payload. Only the worker holding the claim may: returns
+        False (and stores nothing) if the lease expired and the shard moved on.
+        """
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE shards SET status = 'done', finished_at = ?, seconds = ?, result = ?, error = NULL "
+                "WHERE job_id = ? AND shard = ? AND worker = ? AND status = 'running'",
+                (time.time(), seconds, pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL), job_id, shard, worker))
+        return cursor.rowcount == 1
+
+    def fail(self, job_id, shard, worker, error):
+        """
+        Record a failed attempt by the claiming worker; the shard goes back to
+        pending until it runs out of attempts. Returns False if the claim was lost.
+        """
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE shards SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ? "
+                "WHERE job_id = ? AND shard = ? AND worker = ? AND status = 'running'",
+                (SHARD_MAX_ATTEMPTS, str(error), job_id, shard, worker))
+        return cursor.rowcount == 1
+
+    def status(self, job_id):
+        """{'pending': n, 'running': n, 'done': n, 'failed': n, 'total': n, 'workers': [...]}"""
+        with self._connect() as db:
+            rows = db.execute("SELECT status, worker FROM shards WHERE job_id = ?", (job_id,)).fetchall()
+        counts = {'pending': 0, 'running': 0, 'done': 0, 'failed': 0}
+        for row in rows:
+            counts[row['status']] = counts.get(row['status'], 0) + 1
+        counts['total'] = len(rows)
+        counts['workers'] = sorted({row['worker'] for row in rows if row['worker']})
+        return counts
+
+    def job(self, job_id):
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row, params=json.loads(row['params'])) if row else None
+
+    def results(self, job_id):
+        """Payloads of the finished shards, in shard order."""
+        with self._connect() as db:
+            rows = db.execute("SELECT result FROM shards WHERE job_id = ? AND status = 'done' ORDER BY shard",
+                              (job_id,)).fetchall()
+        return [pickle.loads(row['result']) for row in rows]
+
+
+class _Transaction:
+    """Connection context: COMMIT on success, ROLLBACK on error, always closed."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self.db.in_transaction:
+                self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.db.close()
+
+
+# ════════════════════════════════════════════════════════════════
+# WORKER / COORDINATOR
+# ════════════════════════════════════════════════════════════════
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_shard(queue, claimed, workers=1, compact=False, worker=None):
+    """
+    Scan one claimed shard and store its payload (results, stats, raw RS scores).
+    worker must be the name the shard was claimed under.
+    """
+    job_id, shard, tickers, params = claimed
+    worker = worker or worker_name()
+    print(f"Shard {job_id}#{shard}: {len(tickers)} tickers")
+    started = time.perf_counter()
+    try:
+        stats, raw_rs = {}, {}
+        # min_rs needs ratings across the whole universe, so it is applied at merge time
+        results = scan_for_patterns(tickers=tickers, stats=stats,
+                                    prescreen_config=params.get('prescreen', PRESCREEN_DEFAULTS),
+                                    compact=compact, workers=workers, raw_rs=raw_rs,
+                                    panel_name=f"shard-{os.getpid()}")
+    except Exception as e:
+        print(f"Shard {job_id}#{shard} failed: {e}")
+        queue.fail(job_id, shard, worker, e)
+        return False
+    seconds = time.perf_counter() - started
+    payload = {'results': results, 'stats': stats, 'raw_rs': raw_rs, 'worker': worker, 'seconds': seconds}
+    if not queue.complete(job_id, shard, worker, payload, seconds):
+        print(f"Shard {job_id}#{shard}: lease expired and the shard was handed on; result discarded")
+        return False
+    print(f"Shard {job_id}#{shard} done: {len(results)} hits in {seconds:.1f}s")
+    return True
+
+
+def run_worker(queue, job_id=None, workers=1, compact=False, exit_when_idle=False, poll=SHARD_POLL):
+    """Claim and scan shards until the queue is empty (exit_when_idle) or forever. Returns shards run."""
+    name = worker_name()
+    done = 0
+    while True:
+        claimed = queue.claim(name, job_id=job_id)
+        if claimed is None:
+            if exit_when_idle:
+                return done
+            time.sleep(poll)
+            continue
+        done += run_shard(queue, claimed, workers=workers, compact=compact, worker=name)
+
+
+def merge_shards(payloads, min_rs=0):
+    """
+    Merge shard payloads into (results, stats) as if one scan had run: RS is
+    re-ranked over every shard's raw scores, min_rs is applied to the hits,
+    counts and funnel stages are summed, and the results re-sorted.
+    """
+    raw_rs = {}
+    for payload in payloads:
+        raw_rs.update(payload['raw_rs'])
+    rs = rank_rs(raw_rs)
+
+    results = []
+    for payload in payloads:
+        for r in payload['results']:
+            r['rs_rating'] = rs.get(r['symbol'])
+            results.append(r)
+    matched = len(results)
+    if min_rs:
+        results = [r for r in results if (r['rs_rating'] or 0) >= min_rs]
+
+    stats = {key: sum(p['stats'].get(key, 0) for p in payloads)
+             for key in ('requested', 'downloaded', 'prescreened', 'analyzed')}
+    funnel = {}
+    for payload in payloads:
+        for stage, count in payload['stats'].get('funnel', ()):
+            if stage not in ('analyzed', 'matched'):
+                funnel[stage] = funnel.get(stage, 0) + count
+    funnel = list(funnel.items()) + [('analyzed', stats['analyzed'])]
+    if min_rs:
+        funnel.append((f"RS ≥ {min_rs}", len(results)))
+    stats.update({
+        'rs_filtered': matched - len(results),
+        'matched': len(results),
+        'funnel': funnel + [('matched', len(results))],
+        'golden_crosses': sorted(([g[0], g[1], rs.get(g[0])] for p in payloads
+                                  for g in p['stats'].get('golden_crosses', ())),
+                                 key=lambda g: (g[1], -(g[2] or 0))),
+        'shards': len(payloads),
+        'shard_seconds': [round(p['seconds'], 1) for p in payloads],
+    })
+    return sort_results(results), stats
+
+
+def coordinate(queue, tickers, shards, label='scan', min_rs=0, prescreen_config=None, work=False,
+               workers=1, compact=False, timeout=None, poll=SHARD_POLL, progress=print):
+    """
+    Submit tickers as shards, wait for the workers (also scanning shards here if
+    work=True) and return (results, stats) merged. Raises RuntimeError if a shard
+    fails for good, TimeoutError after timeout seconds.
+    """
+    job_id = queue.submit(tickers, shards, label=label, params={'prescreen': prescreen_config})
+    progress(f"Job {job_id}: {len(tickers)} tickers in {min(shards, len(tickers))} shards on {queue.path}")
+    started = time.time()
+    last = None
+    while True:
+        state = queue.status(job_id)
+        if state['failed']:
+            raise RuntimeError(f"Job {job_id}: {state['failed']} shard(s) failed after {SHARD_MAX_ATTEMPTS} attempts")
+        if state['done'] == state['total']:
+            break
+        if (state['done'], state['running']) != last:
+            last = state['done'], state['running']
+            progress(f"Job {job_id}: {state['done']}/{state['total']} shards done, {state['running']} running "
+                     f"({len(state['workers'])} workers)")
+        if timeout and time.time() - started > timeout:
+            raise TimeoutError(f"Job {job_id}: {state['done']}/{state['total']} shards after {timeout:.0f}s")
+        claimed = queue.claim(worker_name(), job_id=job_id) if work else None
+        if claimed:
+            run_shard(queue, claimed, workers=workers, compact=compact)
+        else:
+            time.sleep(poll)
+
+    results, stats = merge_shards(queue.results(job_id), min_rs=min_rs)
+    stats['job_id'] = job_id
+    progress(f"Job {job_id}: merged {stats['shards']} shards, {len(results)} hits in {time.time() - started:.1f}s")
+    return results, stats
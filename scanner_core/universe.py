@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+# scanner_core/universe.py
+# Market universes (S&P 500 / NASDAQ / NYSE / all US) built from screener and
+# S&P 500 constituent snapshots that are downloaded at most once a day
+
+import os
+import re
+
+from scanner_core.cache import DiskCache, file_lock
+from scanner_core.providers import provider_call
+
+SCREENER_URL = "https://api.nasdaq.com/api/screener/stocks?tableonly=true&limit=5000&exchange={exchange}&download=true"
+SCREENER_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+SCREENER_EXCHANGES = ('NASDAQ', 'NYSE')
+SP500_CSV_URL = "https://raw.githubusercontent.com/datasets/s-and-p-500-companies/main/data/constituents.csv"
+UNIVERSE_TTL = 24 * 3600
+MARKETS = ('sp500', 'nasdaq', 'nyse', 'all')
+MARKET_NAMES = {
+    'sp500': "S&P 500",
+    'nasdaq': "NASDAQ ($1B+)",
+    'nyse': "NYSE ($1B+)",
+    'all': "All US ($1B+)",
+}
+MIN_MARKET_CAP = 1_000_000_000
+
+universe_cache = DiskCache('universe', ttl=UNIVERSE_TTL)
+
+# Hardcoded S&P 500 list (reliable fallback, updated Jan 2026)
+SP500_TICKERS = [
+    "AAPL", "ABBV", "ABT", "ACN", "ADBE", "ADI", "ADM", "ADP", "ADSK", "AEE", "AEP", "AES", "AFL", "AIG", "AIZ",
+    "AJG", "AKAM", "ALB", "ALGN", "ALL", "ALLE", "AMAT", "AMCR", "AMD", "AME", "AMGN", "AMP", "AMT", "AMZN",
+    "ANET", "ANSS", "AON", "AOS", "APA", "APD", "APH", "APTV", "ARE", "ATO", "AVB", "AVGO", "AVY", "AWK", "AXON",
+    "AXP", "AZO", "BA", "BAC", "BALL", "BAX", "BBWI", "BBY", "BDX", "BEN", "BF.B", "BG", "BIIB", "BIO", "BK",
+    "BKNG", "BKR", "BLDR", "BLK", "BMY", "BR", "BRK.B", "BRO", "BSX", "BWA", "BX", "BXP", "C", "CAG", "CAH",
+    "CARR", "CAT", "CB", "CBOE", "CBRE", "CCI", "CCL", "CDNS", "CDW", "CE", "CEG", "CF", "CFG", "CHD", "CHRW",
+    "CHTR", "CI", "CINF", "CL", "CLX", "CMA", "CMCSA", "CME", "CMG", "CMI", "CMS", "CNC", "CNP", "COF", "COO",
+    "COP", "COR", "COST", "CPAY", "CPB", "CPRT", "CPT", "CRL", "CRM", "CSCO", "CSGP", "CSX", "CTAS", "CTLT",
+    "CTRA", "CTSH", "CTVA", "CVS", "CVX", "CZR", "D", "DAL", "DD", "DE", "DECK", "DFS", "DG", "DGX", "DHI",
+    "DHR", "DIS", "DLR", "DLTR", "DOC", "DOV", "DOW", "DPZ", "DRI", "DTE", "DUK", "DVA", "DVN", "DXCM", "EA",
+    "EBAY", "ECL", "ED", "EFX", "EG", "EIX", "EL", "ELV", "EMN", "EMR", "ENPH", "EOG", "EPAM", "EQIX", "EQR",
+    "EQT", "ES", "ESS", "ETN", "ETR", "ETSY", "EVRG", "EW", "EXC", "EXPD", "EXPE", "EXR", "F", "FANG", "FAST",
+    "FCX", "FDS", "FDX", "FE", "FFIV", "FI", "FICO", "FIS", "FITB", "FLT", "FMC", "FOX", "FOXA", "FRT", "FSLR",
+    "FTNT", "FTV", "GD", "GDDY", "GE", "GEHC", "GEN", "GEV", "GILD", "GIS", "GL", "GLW", "GM", "GNRC", "GOOG",
+    "GOOGL", "GPC", "GPN", "GRMN", "GS", "GWW", "HAL", "HAS", "HBAN", "HCA", "HD", "HES", "HIG", "HII", "HLT",
+    "HOLX", "HON", "HPE", "HPQ", "HRL", "HSIC", "HST", "HSY", "HUBB", "HUM", "HWM", "IBM", "ICE", "IDXX", "IEX",
+    "IFF", "ILMN", "INCY", "INTC", "INTU", "INVH", "IP", "IPG", "IQV", "IR", "IRM", "ISRG", "IT", "ITW", "IVZ",
+    "J", "JBHT", "JBL", "JCI", "JKHY", "JNJ", "JNPR", "JPM", "K", "KDP", "KEY", "KEYS", "KHC", "KIM", "KKR",
+    "KLAC", "KMB", "KMI", "KMX", "KO", "KR", "KVUE", "L", "LDOS", "LEN", "LH", "LHX", "LIN", "LKQ", "LLY",
+    "LMT", "LNT", "LOW", "LRCX", "LULU", "LUV", "LVS", "LW", "LYB", "LYV", "MA", "MAA", "MAR", "MAS", "MCD",
+    "MCHP", "MCK", "MCO", "MDLZ", "MDT", "MET", "META", "MGM", "MHK", "MKC", "MKTX", "MLM", "MMC", "MMM", "MNST",
+    "MO", "MOH", "MOS", "MPC", "MPWR", "MRK", "MRNA", "MRO", "MS", "MSCI", "MSFT", "MSI", "MTB", "MTCH", "MTD",
+    "MU", "NCLH", "NDAQ", "NDSN", "NEE", "NEM", "NFLX", "NI", "NKE", "NOC", "NOW", "NRG", "NSC", "NTAP", "NTRS",
+    "NUE", "NVDA", "NVR", "NWS", "NWSA", "NXPI", "O", "ODFL", "OKE", "OMC", "ON", "ORCL", "ORLY", "OTIS", "OXY",
+    "PANW", "PARA", "PAYC", "PAYX", "PCAR", "PCG", "PEG", "PEP", "PFE", "PFG", "PG", "PGR", "PH", "PHM", "PKG",
+    "PLD", "PLTR", "PM", "PNC", "PNR", "PNW", "PODD", "POOL", "PPG", "PPL", "PRU", "PSA", "PSX", "PTC", "PWR",
+    "PYPL", "QCOM", "QRVO", "RCL", "REG", "REGN", "RF", "RJF", "RL", "RMD", "ROK", "ROL", "ROP", "ROST", "RSG",
+    "RTX", "RVTY", "SBAC", "SBUX", "SCHW", "SHW", "SJM", "SLB", "SMCI", "SNA", "SNPS", "SO", "SOLV", "SPG",
+    "SPGI", "SRE", "STE", "STLD", "STT", "STX", "STZ", "SWK", "SWKS", "SYF", "SYK", "SYY", "T", "TAP", "TDG",
+    "TDY", "TECH", "TEL", "TER", "TFC", "TFX", "TGT", "TJX", "TMO", "TMUS", "TPR", "TRGP", "TRMB", "TROW",
+    "TRV", "TSCO", "TSLA", "TSN", "TT", "TTWO", "TXN", "TXT", "TYL", "UAL", "UBER", "UDR", "UHS", "ULTA", "UNH",
+    "UNP", "UPS", "URI", "USB", "V", "VICI", "VLO", "VLTO", "VMC", "VRSK", "VRSN", "VRTX", "VST", "VTR", "VTRS",
+    "VZ", "WAB", "WAT", "WBA", "WBD", "WDC", "WEC", "WELL", "WFC", "WM", "WMB", "WMT", "WRB", "WST", "WTW", "WY",
+    "WYNN", "XEL", "XOM", "XYL", "YUM", "ZBH", "ZBRA", "ZTS"
+]
+
+# "Apple Inc. Common Stock" -> "Apple Inc."
+_NAME_SUFFIX = re.compile(
+    r'\s+(Class [A-Z]\s+)?(Common Stock|Common Shares|Ordinary Shares|American Depositary Shares)\b.*$',
+    re.IGNORECASE)
+
+
+def _parse_market_cap(value):
+    try:
+        return int(float(str(value).replace(',', '').replace('$', ''))) if value else 0
+    except ValueError:
+        return 0
+
+
+def _parse_price(value):
+    try:
+        return float(str(value).replace(',', '').replace('$', '')) if value else None
+    except ValueError:
+        return None
+
+
+def _screener_rows(payload):
+    data = (payload or {}).get('data') or {}
+    if 'rows' in data:
+        return data['rows'] or []
+    return (data.get('table') or {}).get('rows') or []
+
+
+def fetch_screener(exchange):
+    """Download one exchange's screener table as a list of normalized rows."""
+    import requests
+
+    with provider_call('nasdaq') as call:
+        response = requests.get(SCREENER_URL.format(exchange=exchange), headers=SCREENER_HEADERS, timeout=30)
+        call.check_status(response.status_code)
+        payload = response.json()
+
+    rows = []
+    for row in _screener_rows(payload):
+        symbol = (row.get('symbol') or '').strip().upper()
+        if not symbol or '^' in symbol or '/' in symbol:
+            continue
+        rows.append({
+            'symbol': symbol,
+            'name': _NAME_SUFFIX.sub('', (row.get('name') or symbol).strip()),
+            'exchange': exchange,
+            'market_cap': _parse_market_cap(row.get('marketCap')),
+            'sector': row.get('sector') or None,
+            'industry': row.get('industry') or None,
+            'country': row.get('country') or None,
+            'last_price': _parse_price(row.get('lastsale')),
+        })
+    return rows
+
+
+def fetch_sp500():
+    """Download the S&P 500 constituents CSV as a list of symbols."""
+    import csv
+    import io
+
+    import requests
+
+    with provider_call('github') as call:
+        response = requests.get(SP500_CSV_URL, timeout=10)
+        call.check_status(response.status_code)
+    response.raise_for_status()
+    return [row['Symbol'].strip() for row in csv.DictReader(io.StringIO(response.text)) if row.get('Symbol')]
+
+
+def _load_snapshot(key, download, max_age, refresh):
+    """
+    Cached snapshot `key`, re-downloaded by one process (under a file lock) once
+    older than max_age. If the download fails or comes back empty the last good
+    snapshot is returned regardless of age, and [] if there has never been one.
+    """
+    if not refresh:
+        rows = universe_cache.get(key, max_age=max_age)
+        if rows is not None:
+            return rows
+
+    with file_lock(f'universe-{key}'):
+        if not refresh:
+            rows = universe_cache.get(key, max_age=max_age)
+            if rows is not None:
+                return rows
+        try:
+            rows = download()
+        except Exception as e:
+            print(f"{key} snapshot download failed: {e}")
+            rows = []
+        if rows:
+            universe_cache.set(key, rows)
+            print(f"{key} snapshot: {len(rows)} symbols")
+            return rows
+
+    stale = universe_cache.get(key, max_age=float('inf'))
+    if stale:
+        age_h = (universe_cache.age(key) or 0) / 3600
+        print(f"Using last good {key} snapshot ({age_h:.0f}h old)")
+    return stale or []
+
+
+def load_screener_snapshot(max_age=UNIVERSE_TTL, refresh=False):
+    """Combined NASDAQ + NYSE screener rows, each tagged with its exchange."""
+    def download():
+        rows = []
+        for exchange in SCREENER_EXCHANGES:
+            rows.extend(fetch_screener(exchange))
+        return rows
+    return _load_snapshot('screener', download, max_age, refresh)
+
+
+def load_sp500_snapshot(max_age=UNIVERSE_TTL, refresh=False):
+    """S&P 500 constituent symbols."""
+    return _load_snapshot('sp500', fetch_sp500, max_age, refresh)
+
+
+def market_tickers(market, min_market_cap=MIN_MARKET_CAP, fallback=(), max_age=UNIVERSE_TTL):
+    """
+    Symbols for one of MARKETS, built from the cached snapshots.
+
+    nasdaq/nyse/all keep screener symbols of up to 5 letters with at least
+    min_market_cap, largest first; 'all' is NASDAQ and NYSE together. When no
+    snapshot has ever been downloaded the `fallback` list is returned instead.
+    """
+    if market == 'sp500':
+        return list(load_sp500_snapshot(max_age) or fallback)
+
+    exchanges = SCREENER_EXCHANGES if market == 'all' else (market.upper(),)
+    rows = [row for row in load_screener_snapshot(max_age)
+            if row['exchange'] in exchanges and len(row['symbol']) <= 5
+            and row['market_cap'] >= min_market_cap]
+    rows.sort(key=lambda row: -row['market_cap'])
+    tickers = list(dict.fromkeys(row['symbol'] for row in rows))
+    return tickers or list(fallback)
+
+
+def snapshot_age():
+    """Seconds since the screener snapshot was saved, or None."""
+    return universe_cache.age('screener')
+
+
+def snapshot_version():
+    """Changes whenever a new snapshot is written (used to rebuild in-memory indexes)."""
+    try:
+        return os.path.getmtime(universe_cache.path('screener'))
+    except OSError:
+        return None
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# wsgi.py
+# Production entry point for the standalone scanner:
+#     gunicorn -c gunicorn.conf.py wsgi:app
+#
+# With preload_app=True this module is imported once in the gunicorn master,
+# so the heavy scientific stack is loaded before forking and shared
+# copy-on-write by every worker.
+
+import os
+
+from scanner_core import metrics
+from scanner_core.cache import get_cache_dir
+
+
+def preload_heavy_modules():
+    """Import pandas/scipy/matplotlib/yfinance once, before workers fork."""
+    import numpy  # noqa: F401
+    import pandas  # noqa: F401
+    import scipy.signal  # noqa: F401
+    import scipy.stats  # noqa: F401
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot  # noqa: F401  (builds the font cache here, not per worker)
+    import pandas_ta  # noqa: F401
+    import yfinance  # noqa: F401
+
+
+# API-only deployments (cached pages/JSON) can skip the preload: SCANNER_PRELOAD=0
+if os.environ.get('SCANNER_PRELOAD', '1') != '0':
+    preload_heavy_modules()
+
+# Workers flush their metrics to a shared directory so any worker can answer /metrics
+metrics.REGISTRY.enable_multiprocess(os.path.join(get_cache_dir(), 'metrics'), clear=True)
+
+from cup_handle_scanner_2 import app  # noqa: E402
+
+application = app